@@ -1,5 +1,5 @@
 from pygame import locals as const
-from functools import wraps
+from functools import partial
 
 
 class Context(dict):
@@ -35,6 +35,10 @@ class EventManager(object):
         self.on_keyup = {}
         self.on_mouseclick = {}
 
+        # All the handlers, keyed by (event type, modifiers, key or button)
+        # Rebuilt whenever a handler is added
+        self._table = None
+
         if context is None:
             context = Context()
 
@@ -43,29 +47,21 @@ class EventManager(object):
     #######################################################
     # EVENT REGISTRATIONS
     #######################################################
-    @staticmethod
-    def _append_wrapper_with_const(loc, key, const=None):
+    def _append_wrapper_with_const(self, loc, key, const=None):
         '''
         HELPER: returns a wrapper that will append a func to the given loc
-            with the given key. Also adds an extra const wrapper if that is provided
+            with the given key. Also binds the constants to it if they are provided
         '''
         def wrapper(func):
-            # If we have constants, we call the function with a closure
+            # The constants are bound once, keyword args still overwrite them
             if const is not None:
-                @wraps(func)
-                def closure(*args, **kwargs):
-                    # we use the const values first, but they get overwritten by keyword args
-                    input_kwargs = dict(**const)
-                    input_kwargs.update(**kwargs)
-
-                    return func(*args, **input_kwargs)
-
-                handler = closure
+                handler = partial(func, **const)
             else:
                 handler = func
 
             # Add it to the callbacks
             loc[key].append(handler)
+            self._table = None
 
             # Always return the original
             # That lets us chain different events with differing constants in one line
@@ -78,6 +74,7 @@ class EventManager(object):
         Adds a handler for the QUIT event (clicking the x button)
         '''
         self.on_quit.append(handler)
+        self._table = None
         return handler
 
     def shortcut(self, modifiers, key, const=None):
@@ -96,7 +93,7 @@ class EventManager(object):
             self.on_shortcut[modifiers][key] = []
 
         loc = self.on_shortcut[modifiers]
-        return EventManager._append_wrapper_with_const(loc, key, const)
+        return self._append_wrapper_with_const(loc, key, const)
 
     def keyup(self, key, const=None):
         '''
@@ -107,7 +104,7 @@ class EventManager(object):
             self.on_keyup[key] = []
 
         loc = self.on_keyup
-        return EventManager._append_wrapper_with_const(loc, key, const)
+        return self._append_wrapper_with_const(loc, key, const)
 
     def keydown(self, key, const=None):
         '''
@@ -118,7 +115,7 @@ class EventManager(object):
             self.on_keydown[key] = []
 
         loc = self.on_keydown
-        return EventManager._append_wrapper_with_const(loc, key, const)
+        return self._append_wrapper_with_const(loc, key, const)
 
     def mouseclick(self, key, const=None):
         handlers = self.on_mouseclick.get(key, False)
@@ -126,7 +123,7 @@ class EventManager(object):
             self.on_mouseclick[key] = []
 
         loc = self.on_mouseclick
-        return EventManager._append_wrapper_with_const(loc, key, const)
+        return self._append_wrapper_with_const(loc, key, const)
 
     def event(self, key, const=None):
         '''
@@ -137,7 +134,7 @@ class EventManager(object):
             self.on_generic[key] = []
 
         loc = self.on_generic
-        return EventManager._append_wrapper_with_const(loc, key, const)
+        return self._append_wrapper_with_const(loc, key, const)
 
     def tick(self, time=1000):
         '''
@@ -158,18 +155,85 @@ class EventManager(object):
     # Main Functions
     #######################################################
 
+    # pygame modifier flags already transformed into EventManager modifiers
+    _MODIFIERS = {}
+
     def _get_modifiers(self, flag):
         '''
         HELPER: Transforms the pygame modifiers into EventManager modifiers
         '''
-        modifiers = 0
+        modifiers = EventManager._MODIFIERS.get(flag)
+        if modifiers is not None:
+            return modifiers
 
+        modifiers = 0
         for key, value in Mods.MAP.iteritems():
             if flag & key:
                 modifiers |= value
 
+        EventManager._MODIFIERS[flag] = modifiers
         return modifiers
 
+    def _compile(self):
+        '''
+        HELPER: Flattens every registration into one table, each entry holding
+        all the handlers for that event in the order they get called
+        '''
+        table = {}
+
+        def add(key, handlers):
+            table.setdefault(key, []).extend(handlers)
+
+        # Each specific entry also needs the less specific handlers after it
+        for modifiers, keys in self.on_shortcut.iteritems():
+            for key, handlers in keys.iteritems():
+                add((const.KEYDOWN, modifiers, key), handlers)
+                add((const.KEYDOWN, modifiers, key), self.on_keydown.get(key, []))
+
+        for key, handlers in self.on_keydown.iteritems():
+            add((const.KEYDOWN, None, key), handlers)
+
+        for key, handlers in self.on_keyup.iteritems():
+            add((const.KEYUP, None, key), handlers)
+
+        for button, handlers in self.on_mouseclick.iteritems():
+            add((const.MOUSEBUTTONDOWN, None, button), handlers)
+
+        add((const.QUIT, None, None), self.on_quit)
+
+        # generic events go last, for every entry of their type
+        for event_type, handlers in self.on_generic.iteritems():
+            table.setdefault((event_type, None, None), [])
+
+            for key in table.keys():
+                if key[0] == event_type:
+                    add(key, handlers)
+
+        self._table = dict((key, tuple(handlers)) for key, handlers in table.iteritems())
+
+    def _lookup(self, event):
+        '''
+        HELPER: Returns the handlers for the given event
+        '''
+        table = self._table
+        event_type = event.type
+
+        if event_type == const.KEYDOWN:
+            handlers = table.get((event_type, self._get_modifiers(event.mod), event.key))
+            if handlers is None:
+                handlers = table.get((event_type, None, event.key))
+        elif event_type == const.KEYUP:
+            handlers = table.get((event_type, None, event.key))
+        elif event_type == const.MOUSEBUTTONDOWN:
+            handlers = table.get((event_type, None, event.button))
+        else:
+            handlers = None
+
+        if handlers is None:
+            handlers = table.get((event_type, None, None))
+
+        return handlers
+
     def _call_handlers(self, handlers):
         '''
         HELPER: calls a list of handlers
@@ -190,32 +254,12 @@ class EventManager(object):
         '''
         Handles each of the given events
         '''
+        if self._table is None:
+            self._compile()
+
         self.context.handler = self
         context = self.context
 
         for event in events:
             context.event = event
-
-            if event.type == const.QUIT:
-                self._call_handlers(self.on_quit)
-            elif event.type == const.KEYDOWN:
-                mod = self._get_modifiers(event.mod)
-                handlers = self.on_shortcut.get(mod, False)
-                if handlers:
-                    handlers = handlers.get(event.key, False)
-                    self._call_handlers(handlers)
-
-                handlers = self.on_keydown.get(event.key, False)
-                self._call_handlers(handlers)
-            elif event.type == const.KEYUP:
-                handlers = self.on_keyup.get(event.key, False)
-                self._call_handlers(handlers)
-            elif event.type == const.MOUSEBUTTONDOWN:
-                handlers = self.on_mouseclick.get(event.button, False)
-                self._call_handlers(handlers)
-
-            # generic events
-            handlers = self.on_generic.get(event.type, False)
-            self._call_handlers(handlers)
-
-
+            self._call_handlers(self._lookup(event))
@@ -22,13 +22,13 @@ class BaseLoadMediator(Mediator):
     def _tick(self, screen):
         # Set up the preloader
         if self._loader is None:
-            self._loader = mediator.preload(screen)
+            self._loader = self._mediator.preload(screen)
 
         load_event = self._load_next()
         if load_event is not None:
             self._load_msg(load_event)
 
-        super(BaseLoadMediator, self)._run(self, screen)
+        super(BaseLoadMediator, self)._tick(screen)
 
     def _load_next(self):
         '''
@@ -40,18 +40,15 @@ class BaseLoadMediator(Mediator):
         except StopIteration:
             self._loader = None
 
-            # When we close we also close our saved mediator,
-            # We don't want that so we set it to None instead
-            mediator = self._mediator_cls(self._kwargs)
-
-            raise Mediator.SwapForEvent(mediator, pop=True)
+            # The swap happens at the end of this tick, so we never load again
+            self.post(Mediator.SwapForEvent(self._mediator, pop=True))
 
 
     #######################################################
     # Sub class Methods
     #######################################################
 
-    def _load_msg(self):
+    def _load_msg(self, msg):
         '''
         Occurs when a load message comes in from the loading Mediator
         '''
@@ -1,10 +1,20 @@
-from time import time
+from collections import deque
+from time import sleep
+
+try:
+    from time import perf_counter as timer
+except ImportError:
+    # Python 2 has no monotonic clock, this is its highest resolution one
+    from timeit import default_timer as timer
 
 
 class BaseMediatorEvent(Exception):
     '''
     A wrapper for an event that tells the mediators to do something at the end
     of the current tick
+
+    Events should be posted to a mediator, raising them still works but unwinds
+    the whole tick
     '''
 
 class MediatorParentEvent(BaseMediatorEvent):
@@ -15,7 +25,7 @@ class MediatorParentEvent(BaseMediatorEvent):
 class MediatorEvent(BaseMediatorEvent):
     '''
     A MediatorEvent that can only be processed by the currently active mediator
-    (The one that raises this exception)
+    (The one it was posted to)
     '''
 
 
@@ -27,11 +37,20 @@ class MediatorException(Exception):
 
 class Clock(object):
     '''
-    A simple clock that finds out how much time passed since its last call
+    A clock that finds out how much time passed since its last call,
+    and paces the calls to a given number of frames per second
     '''
 
+    # Sleeping can overshoot by a millisecond or two, so the last stretch
+    # before a frame's deadline is spun through instead (in seconds)
+    SPIN = 0.002
+
+    # How many of the latest frames the statistics cover
+    WINDOW = 120
+
     def __init__(self, fps=None):
         self.fps = fps
+        self._frame_times = deque(maxlen=self.WINDOW)
 
         self.reset()
 
@@ -39,20 +58,19 @@ class Clock(object):
         '''
         Returns the time in milliseconds since the last call of this method
         '''
-        now = time()
+        now = timer()
 
         # If we have no time, then the first time we call delta is the starting time
         # aka delta == 0 as no time passed
         if self._time is None:
             delta = 0
         else:
-            delta = now - self._time
+            delta = (now - self._time) * 1000
+            self._frame_times.append(delta)
 
         # Make sure to update the current time
         self._time = now
 
-        # TODO: update the FPS average
-
         return delta
 
     def fps_sleep(self):
@@ -63,19 +81,56 @@ class Clock(object):
         '''
         if self.fps is None:
             return
-        # TODO
 
-    def get_average_fps(self):
+        period = 1.0 / self.fps
+        now = timer()
+
+        if self._deadline is None or now - self._deadline > period:
+            # Just started, or so far behind that catching up would mean
+            # rushing through several frames, so start counting from now
+            self._deadline = now
+        else:
+            remaining = self._deadline - now
+            if remaining > self.SPIN:
+                sleep(remaining - self.SPIN)
+
+            while timer() < self._deadline:
+                pass
+
+        # Deadlines are spaced evenly, so a late frame is made up for by the next one
+        self._deadline += period
+
+    def get_average_fps(self, percentiles=None):
         '''
-        Returns the current FPS average
+        Returns the current FPS average, over the last few frames
+
+        percentiles `tuple`
+            e.g. (50, 95, 99), if given returns (fps, {percentile: frame time in ms})
+            as the average alone hides the odd slow frame
         '''
-        # TODO
+        fps = None
+        total = sum(self._frame_times)
+        if total:
+            fps = 1000.0 * len(self._frame_times) / total
+
+        if percentiles is None:
+            return fps
+
+        times = sorted(self._frame_times)
+        last = len(times) - 1
+
+        return fps, dict(
+            (point, times[int(round(last * point / 100.0))])
+            for point in percentiles
+            if times
+        )
 
     def reset(self):
         '''
         Resets the clock, using the next delta() call to syncronize it
         '''
         self._time = None
+        self._deadline = None
 
 class BaseController(object):
     def __call__(self, events):
@@ -97,6 +152,17 @@ class Mediator(object):
         Controller: EventManager
     '''
 
+    # The most frames drawn per second, None draws as fast as it can
+    FRAME_RATE = None
+
+    # How many fixed simulation steps run per second
+    # None runs a single update per frame with the frame's delta instead
+    STEP_RATE = None
+
+    # The most steps run in one frame, any time left past that is dropped
+    # so a slow frame can't snowball into even slower frames
+    MAX_STEPS = 5
+
     def __init__(self, clock=None):
         '''
         This should set defaults for required instance variables, _preload should
@@ -107,10 +173,18 @@ class Mediator(object):
         self.has_started = False
 
         self._child = None
+        self._parent = None
+
+        # (sender, event) for the events posted this tick, handled once the tick is over
+        self._transitions = []
 
         if clock is None:
-            clock = Clock()
+            clock = Clock(self.FRAME_RATE)
         self.clock = clock
+        self._accumulator = 0
+
+        # A FrameProfiler, when set every frame gets timed
+        self.profiler = None
 
         self.views = []
         self.models = []
@@ -137,6 +211,7 @@ class Mediator(object):
         Mediator Event Handler for the PutEvent.
         '''
         self._child = event.mediator
+        self._child._parent = self
 
     class PopEvent(MediatorParentEvent):
         '''
@@ -184,8 +259,9 @@ class Mediator(object):
         else:
             self._child.freeze()
 
-        # Start up the new mediator
+        # Start up the new mediator, it might be one frozen earlier
         self._child = event.mediator
+        self._child._parent = self
         self._child.unfreeze()
 
 
@@ -244,28 +320,35 @@ class Mediator(object):
         '''
         Run the current Mediator until it quits
         '''
-        try:
-            while True:
-                self._run(screen)
-        except BaseMediatorEvent:
-            pass
+        while self.is_alive:
+            self._run(screen)
 
-    def draw(self, screen):
+    def post(self, event):
+        '''
+        Queues up a MediatorEvent, it gets handled once the current tick is over
+        '''
+        if not isinstance(event, BaseMediatorEvent):
+            raise MediatorException("We can't post a non MediatorEvent")
+
+        self._transitions.append((self, event))
+
+    def draw(self, screen, alpha=1.0):
         '''
         Draws the view unto the given screen without doing any updates
+        alpha is how far along the time is between the last update and the next one
         '''
         for view in self.views:
-            view.draw(screen)
+            self._measure(view, 'draw', view.draw, screen, alpha)
 
     def update(self, delta_time):
         '''
         Updates the models, then the views with the new time delta
         '''
         for model in self.models:
-            model.update(delta_time)
+            self._measure(model, 'update', model.update, delta_time)
 
         for view in self.views:
-            view.update(delta_time)
+            self._measure(view, 'update', view.update, delta_time)
 
     def handle_events(self, events):
         '''
@@ -285,23 +368,51 @@ class Mediator(object):
 
     def _run(self, screen):
         '''
-        Starts up either you or your child
+        Runs one tick of either you or your child, then handles the posted events
         '''
         # Remember to run your child code instead if you have a child
         if self._child:
-            method = self._child._run
-            exception_type = MediatorParentEvent
+            self._child._run(screen)
         else:
-            method = self._loop
-            exception_type = MediatorEvent
+            self._loop(screen)
+
+        self._drain()
 
-        # Run the tick code, catching any of the raised MediatorEvents
+    def _loop(self, screen):
+        '''
+        Runs one iteration of the main loop for this Mediator, starting it up first if needed
+        '''
         try:
-            method(screen)
+            # Start up, throwing out the loading messages
+            if not self.has_started:
+                [msg for msg in self.preload(screen)]
+
+            if self.is_frozen:
+                self.unfreeze()
+
+            self._tick(screen)
         except BaseMediatorEvent as event:
-            # Any events not of the valid type get sent to the parent
-            if not isinstance(event, exception_type):
-                raise event
+            self.post(event)
+
+    def _drain(self):
+        '''
+        HELPER: Handles the events posted during the tick, in order
+        Parent events get passed on, to be handled once the parent's tick is over
+        '''
+        while self._transitions:
+            sender, event = self._transitions.pop(0)
+
+            if sender is self and isinstance(event, MediatorParentEvent):
+                if self._parent is not None:
+                    self._parent._transitions.append((self, event))
+                elif isinstance(event, Mediator.PopEvent):
+                    # Nobody is left to pop us, so we're done running
+                    self.finish()
+                else:
+                    raise MediatorException(
+                        'No parent to handle the Mediator Event: %s' % event.HANDLER
+                    )
+                continue
 
             handler = getattr(self, event.HANDLER, False)
             if not handler:
@@ -310,38 +421,69 @@ class Mediator(object):
                 )
             handler(event)
 
-    def _loop(self, screen):
-        '''
-        Called to begin the main loop for this Mediator
-        '''
-        # Start up, throwing out the loading messages
-        if not self.has_started:
-            [msg for msg in self.preload(screen)]
-
-        if self.is_frozen:
-            self.unfreeze()
-
-        while True:
-            self._tick(screen)
-
     def _tick(self, screen):
         '''
         Runs throught one iteration of the main loop for this Mediator
         '''
+        if self.profiler is not None:
+            self.profiler.begin_frame()
+
         # Calculate how long its been since the last call
         delta_time = self.clock.delta()
 
         # Process the events
-        self.handle_events(self.get_events())
+        self._measure('events', 'phase', self._handle_new_events)
 
         # Re-draw the view
-        self._clear_screen(screen)
-        self.update(delta_time)
-        self.draw(screen)
-        self._draw_screen(screen)
+        self._measure('clear', 'phase', self._clear_screen, screen)
+        alpha = self._measure('update', 'phase', self._step, delta_time)
+        self._measure('draw', 'phase', self.draw, screen, alpha)
+        self._measure('display', 'phase', self._draw_screen, screen)
 
         # ensure we run with a proper FPS
-        self.clock.fps_sleep()
+        self._measure('sleep', 'phase', self.clock.fps_sleep)
+
+        if self.profiler is not None:
+            self.profiler.end_frame()
+
+    def _handle_new_events(self):
+        self.handle_events(self.get_events())
+
+    def _measure(self, name, category, func, *args):
+        '''
+        HELPER: Calls the function, timing it if there is a profiler
+        Models and views are recorded under their class name
+        '''
+        if self.profiler is None:
+            return func(*args)
+
+        if not isinstance(name, basestring):
+            name = type(name).__name__
+        return self.profiler.measure(name, category, func, *args)
+
+    def _step(self, delta_time):
+        '''
+        Runs the updates that fit in delta_time milliseconds, returning how far
+        along the time is towards the next step
+        '''
+        if self.STEP_RATE is None:
+            self.update(delta_time)
+            return 1.0
+
+        step = 1000.0 / self.STEP_RATE
+        self._accumulator += delta_time
+
+        steps = 0
+        while self._accumulator >= step:
+            if steps == self.MAX_STEPS:
+                self._accumulator %= step
+                break
+
+            self.update(step)
+            self._accumulator -= step
+            steps += 1
+
+        return self._accumulator / step
 
     #######################################################
     # Events (Not for Public use)
@@ -357,6 +499,7 @@ class Mediator(object):
 
         # Restart the timer to now
         self.clock.reset()
+        self._accumulator = 0
 
         self.is_frozen = False
         self._unfreeze()
@@ -395,7 +538,8 @@ class Mediator(object):
 
     def finish(self):
         '''
-        Calls the finish handler for the current mediator
+        Calls the finish handler for the current mediator, returning what it
+        returns, which a parent popping us gets in _on_return
 
         NOT for public use
         '''
@@ -403,7 +547,7 @@ class Mediator(object):
             raise MediatorException("Mediator already finished")
 
         self.is_alive = False
-        self._finish()
+        return self._finish()
 
     #######################################################
     # Sub class Methods
@@ -456,6 +600,7 @@ class Mediator(object):
     def _finish(self):
         '''
         Called when the current mediator is popped, meaning it will never be re-started
+        Whatever this returns gets passed to the parent's _on_return
         '''
 
     def _on_return(self, value):
@@ -32,25 +32,20 @@ class BasePauseMediator(Mediator):
         '''
         Mediator Event Handler for the ResumeEvent
         '''
-        # When we close we also close our saved mediator,
-        # We don't want that so we set it to None instead
-        mediator = self._mediator
-        self._mediator = None
-
-        raise Mediator.SwapForEvent(mediator, pop=True)
+        # We only get frozen, so pausing again can reuse this mediator
+        self.post(Mediator.SwapForEvent(self._mediator, pop=False))
 
 
 
     def finish(self):
         # Note: as an abstract Mediator, we don't touch the _finish method,
         # that is only for a concrete Mediator
+        value = super(BasePauseMediator, self).finish()
 
         # We need to ensure when we close, we also close the saved mediator
-        # unless we don't have one (as we're resuming it)
-        if self._mediator is not None:
-            self._mediator.finish()
-            self._mediator = None
-
-        super(BasePauseMediator, self).finish()
-
+        # unless it already closed (and closed us along with it)
+        # Quitting from the pause screen quits what was paused, so that's what we return
+        if self._mediator.is_alive:
+            value = self._mediator.finish()
 
+        return value
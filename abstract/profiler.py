@@ -0,0 +1,75 @@
+from collections import deque
+from timeit import default_timer as timer
+
+import json
+
+
+class FrameProfiler(object):
+    '''
+    Records how long every phase of each frame took, along with each model
+    and view inside them. Only the last few frames are kept
+    '''
+
+    def __init__(self, frames=300):
+        self.frames = deque(maxlen=frames)
+
+        self._frame = None
+        self._origin = timer()
+
+    def begin_frame(self):
+        self._frame = []
+
+    def end_frame(self):
+        if self._frame is not None:
+            self.frames.append(self._frame)
+        self._frame = None
+
+    def measure(self, name, category, func, *args):
+        '''
+        Calls the function, recording how long it took as part of the current frame
+        '''
+        start = timer()
+        try:
+            return func(*args)
+        finally:
+            if self._frame is not None:
+                self._frame.append((name, category, start, timer() - start))
+
+    def totals(self, category, frame=-1):
+        '''
+        Returns how long each name in the category took in seconds during the
+        given frame, the last finished one by default
+        '''
+        totals = {}
+        if not self.frames:
+            return totals
+
+        for name, event_category, start, duration in self.frames[frame]:
+            if event_category == category:
+                totals[name] = totals.get(name, 0) + duration
+
+        return totals
+
+    def trace(self):
+        '''
+        Returns the recorded frames as a Chrome trace (chrome://tracing)
+        '''
+        events = []
+        for frame in self.frames:
+            for name, category, start, duration in frame:
+                events.append({
+                    'name': name,
+                    'cat': category,
+                    'ph': 'X',
+                    # Chrome wants microseconds
+                    'ts': (start - self._origin) * 1000000,
+                    'dur': duration * 1000000,
+                    'pid': 0,
+                    'tid': 0,
+                })
+
+        return {'traceEvents': events}
+
+    def dump(self, filename):
+        with open(filename, 'w') as output:
+            json.dump(self.trace(), output)
@@ -8,9 +8,15 @@ class View(object):
         has passed
         '''
 
-    def draw(self, screen):
+    def draw(self, screen, alpha=1.0, offset=(0, 0)):
         '''
         Draws the view unto the given screen
+        alpha is how far along the time is between the last update and the next one,
+        moving views can use it to interpolate their position
+        offset is added to world coordinates to get screen ones, views placed
+        on the screen itself can ignore it
+
+        Returns the area (or a list of areas) that was drawn to, if known
         '''
 
 
@@ -18,5 +24,11 @@ class ImageView(View):
     def __init__(self, image):
         self.image = image
 
-    def draw(self, screen):
-        screen.blit(self.image, self.image.get_rect())
+    def draw(self, screen, alpha=1.0, offset=(0, 0)):
+        return screen.blit(self.image, self.image.get_rect())
+
+    def restore(self, screen, rect):
+        '''
+        Re-draws only the given area of the image
+        '''
+        return screen.blit(self.image, rect, rect)
@@ -0,0 +1,293 @@
+'''
+Bots flying ships, for bot matches and for loading up a sector
+
+Every bot's decision comes out of the same few array operations, so adding
+bots mostly makes the arrays longer instead of adding Python work per ship
+'''
+from math import pi
+
+import numpy
+
+from gravity import pull
+from ship import Ship
+from weapons import Ammo
+
+
+class PilotSystem(object):
+    '''
+    Steers the bots' ships towards the nearest other ship, away from incoming
+    projectiles and out of strong gravity, firing when lined up
+
+    Each bot only decides again every cadence steps, a different share of the
+    bots on each step, and keeps doing what it decided in between
+
+    Bots fly their ships directly as part of the simulation, which keeps them
+    the same on every peer and in replays
+    '''
+
+    # Steps between each bot's decisions
+    CADENCE = 6
+
+    # Radians off the wanted heading a ship can be before it turns, or before it stops thrusting
+    TURN_TOLERANCE = 0.1
+    THRUST_ANGLE = pi / 4
+
+    # Ships slow down past this speed (pixels per step), and stop closing in at this distance
+    MAX_SPEED = 3.0
+    KEEP_DISTANCE = 150
+
+    # Shots are only taken this close to the target, this well lined up, this often (in steps)
+    FIRE_RANGE = 300
+    FIRE_ANGLE = 0.15
+    FIRE_COOLDOWN = 15
+
+    # Projectiles headed this way from within this range get dodged
+    EVADE_RANGE = 120
+    EVADE_WEIGHT = 2.0
+
+    # The pull (change in speed per step) from a single well that is as strong as the urge to seek
+    AVOID_PULL = 0.1
+
+    # How far inside the edges of the world bots start turning back
+    WORLD_MARGIN = 100
+
+    def __init__(self, mediator, cadence=None):
+        '''
+        mediator `GameMediator`
+            whose players, celestials and projectiles the bots see
+        '''
+        if cadence is None:
+            cadence = self.CADENCE
+        self.cadence = cadence
+
+        self.mediator = mediator
+
+        # Player numbers of the bots
+        self._bots = []
+        self._cooldown = numpy.zeros(0, dtype=int)
+        self._steps = 0
+
+    def add(self, number):
+        self._bots.append(number)
+        self._cooldown = numpy.append(self._cooldown, 0)
+
+    def remove(self, number):
+        index = self._bots.index(number)
+        del self._bots[index]
+        self._cooldown = numpy.delete(self._cooldown, index)
+
+    def get_state(self):
+        '''
+        Returns which step the bots are on and how long until each can fire, for set_state
+        '''
+        return (self._steps, self._cooldown.copy())
+
+    def set_state(self, state):
+        self._steps, cooldown = state
+        self._cooldown[:] = cooldown
+
+    def update(self, delta_time):
+        if not self._bots:
+            return
+
+        self._cooldown -= 1
+        self._steps += 1
+
+        group = numpy.flatnonzero(numpy.arange(len(self._bots)) % self.cadence == self._steps % self.cadence)
+        if len(group):
+            self._decide(group)
+
+    def _decide(self, group):
+        '''
+        HELPER: Works out and applies what the bots at the given indexes do next
+        '''
+        mediator = self.mediator
+        players = mediator.players
+        numbers = sorted(players)
+        bots = [self._bots[index] for index in group.tolist()]
+
+        # Everything is in screen axes, speeds are per step
+        poses = numpy.array([players[number].get_pose() for number in numbers], dtype=float)
+        x, y, prev_x, prev_y, direction = poses[:, :5].T
+        speed_x = x - prev_x
+        speed_y = y - prev_y
+
+        rows = numpy.searchsorted(numbers, bots)
+        bot_x = x[rows]
+        bot_y = y[rows]
+
+        target_x, target_y, distance, nearest = self._aim(rows, x, y, speed_x, speed_y)
+        seek_x, seek_y = _unit(target_x - bot_x, target_y - bot_y)
+
+        # Matching the target's speed keeps a chase from running off together
+        match_x = (speed_x[nearest] - speed_x[rows]) / self.MAX_SPEED
+        match_y = (speed_y[nearest] - speed_y[rows]) / self.MAX_SPEED
+
+        evade_x, evade_y, threatened = self._evade(bots, bot_x, bot_y)
+        avoid_x, avoid_y, avoiding = self._avoid(bot_x, bot_y)
+        return_x, return_y, returning = self._return(bot_x, bot_y)
+
+        # Turn around and thrust against the speed when going too fast
+        speed = numpy.hypot(speed_x[rows], speed_y[rows])
+        braking = speed > self.MAX_SPEED
+        brake_x, brake_y = _unit(-speed_x[rows], -speed_y[rows])
+        brake_x *= braking
+        brake_y *= braking
+
+        want_x = seek_x + match_x + evade_x * self.EVADE_WEIGHT + avoid_x + return_x + brake_x
+        want_y = seek_y + match_y + evade_y * self.EVADE_WEIGHT + avoid_y + return_y + brake_y
+
+        # A ship faces (sin(direction), cos(direction)) on screen, see Ship.fire
+        facing = direction[rows]
+        error = _wrap(numpy.arctan2(want_x, want_y) - facing)
+        aim_error = _wrap(numpy.arctan2(seek_x, seek_y) - facing)
+
+        rotate = numpy.where(
+            error > self.TURN_TOLERANCE, Ship.ROT_LEFT,
+            numpy.where(error < -self.TURN_TOLERANCE, Ship.ROT_RIGHT, Ship.ROT_STOP)
+        )
+        move = numpy.where(
+            (numpy.abs(error) < self.THRUST_ANGLE)
+            & ((distance > self.KEEP_DISTANCE) | threatened | avoiding | returning | braking),
+            Ship.MOV_FORWARDS, Ship.MOV_STOP,
+        )
+        fire = (
+            (distance < self.FIRE_RANGE)
+            & (numpy.abs(aim_error) < self.FIRE_ANGLE)
+            & (self._cooldown[group] <= 0)
+        )
+        self._cooldown[group[fire]] = self.FIRE_COOLDOWN
+
+        for number, turn, thrust, shoot in zip(bots, rotate.tolist(), move.tolist(), fire.tolist()):
+            ship = players[number]
+            ship.rotate(turn)
+            ship.move(thrust)
+            if shoot:
+                mediator.fire(number)
+
+    def _aim(self, rows, x, y, speed_x, speed_y):
+        '''
+        HELPER: Returns where each bot (at the given rows of the positions)
+        should aim to hit the nearest other ship, how far away that ship is
+        and which row it is at
+        Bots alone in the sector aim at themselves, infinitely far away
+        '''
+        dx = x[numpy.newaxis, :] - x[rows, numpy.newaxis]
+        dy = y[numpy.newaxis, :] - y[rows, numpy.newaxis]
+        distance2 = dx ** 2 + dy ** 2
+        distance2[numpy.arange(len(rows)), rows] = numpy.inf
+
+        nearest = numpy.argmin(distance2, axis=1)
+        distance = numpy.sqrt(distance2[numpy.arange(len(rows)), nearest])
+        alone = numpy.isinf(distance)
+        nearest[alone] = rows[alone]
+
+        # Leads the target by how long a shot takes to get there
+        flight = numpy.where(alone, 0, distance) / Ammo.KINDS[self.mediator.WEAPON][1]
+        target_x = x[nearest] + speed_x[nearest] * flight
+        target_y = y[nearest] + speed_y[nearest] * flight
+
+        return target_x, target_y, distance, nearest
+
+    def _evade(self, bots, bot_x, bot_y):
+        '''
+        HELPER: Returns which way each bot should dodge, sideways out of the
+        path of the projectiles closing in on it, and whether there were any
+        '''
+        pool = self.mediator.projectiles
+        live = numpy.flatnonzero(pool.alive)
+
+        evade_x = numpy.zeros(len(bots))
+        evade_y = numpy.zeros(len(bots))
+        if not len(live):
+            return evade_x, evade_y, evade_x > 0
+
+        # One row per bot, one column per projectile, from the bot to the projectile
+        rx = pool.x[live][numpy.newaxis, :] - bot_x[:, numpy.newaxis]
+        ry = pool.y[live][numpy.newaxis, :] - bot_y[:, numpy.newaxis]
+        ux = pool.speed_x[live][numpy.newaxis, :]
+        uy = pool.speed_y[live][numpy.newaxis, :]
+
+        distance = numpy.hypot(rx, ry)
+        closing = rx * ux + ry * uy
+        threats = (
+            (closing < 0) & (distance < self.EVADE_RANGE)
+            & (pool.owner[live][numpy.newaxis, :] != numpy.array(bots)[:, numpy.newaxis])
+        )
+
+        # Away from the projectile, less the part along its path
+        along = closing / numpy.maximum(ux ** 2 + uy ** 2, 1e-9)
+        away_x = along * ux - rx
+        away_y = along * uy - ry
+
+        # Dead on its path either side will do
+        dead = numpy.hypot(away_x, away_y) < 1e-6
+        away_x = numpy.where(dead, -uy, away_x)
+        away_y = numpy.where(dead, ux, away_y)
+        away_x, away_y = _unit(away_x, away_y)
+        weight = threats * (1 - distance / self.EVADE_RANGE)
+
+        evade_x = (away_x * weight).sum(axis=1)
+        evade_y = (away_y * weight).sum(axis=1)
+        return evade_x, evade_y, threats.any(axis=1)
+
+    def _avoid(self, bot_x, bot_y):
+        '''
+        HELPER: Returns which way each bot should head to get out of the
+        celestials' pull, as strong as the pull is, and whether it needs to
+        '''
+        celestials = self.mediator.celestials
+        count = len(celestials)
+        if not count:
+            zeros = numpy.zeros(len(bot_x))
+            return zeros, zeros, zeros > 0
+
+        well_x = numpy.fromiter((celestial.x for celestial in celestials), float, count)
+        well_y = numpy.fromiter((celestial.y for celestial in celestials), float, count)
+        mass = numpy.fromiter((celestial.mass for celestial in celestials), float, count)
+
+        # One row per bot, one column per celestial, from the celestial to the bot
+        dx = bot_x[:, numpy.newaxis] - well_x[numpy.newaxis, :]
+        dy = bot_y[:, numpy.newaxis] - well_y[numpy.newaxis, :]
+
+        strength = numpy.hypot(*pull(dx, dy, mass[numpy.newaxis, :])) / self.AVOID_PULL
+        away_x, away_y = _unit(dx, dy)
+
+        avoid_x = (away_x * strength).sum(axis=1)
+        avoid_y = (away_y * strength).sum(axis=1)
+        return avoid_x, avoid_y, strength.max(axis=1) > 1
+
+    def _return(self, bot_x, bot_y):
+        '''
+        HELPER: Returns which way each bot should head to get back from the
+        edges of the world, stronger the further past the margin it is, and whether it needs to
+        '''
+        world = self.mediator.camera.world
+        margin = self.WORLD_MARGIN
+
+        return_x = (
+            numpy.maximum(world.left + margin - bot_x, 0)
+            - numpy.maximum(bot_x - (world.right - margin), 0)
+        ) / margin
+        return_y = (
+            numpy.maximum(world.top + margin - bot_y, 0)
+            - numpy.maximum(bot_y - (world.bottom - margin), 0)
+        ) / margin
+
+        return return_x, return_y, (return_x != 0) | (return_y != 0)
+
+
+def _unit(x, y):
+    '''
+    HELPER: Returns the arrays of vectors scaled to a length of 1, zero ones stay zero
+    '''
+    length = numpy.hypot(x, y)
+    length[length == 0] = 1
+    return x / length, y / length
+
+
+def _wrap(angle):
+    '''
+    HELPER: Returns the angles wrapped into [-pi, pi)
+    '''
+    return (angle + pi) % (2 * pi) - pi
@@ -0,0 +1,128 @@
+from ai import PilotSystem
+from math import pi
+from pygame import Rect
+from ship import Ship
+from unittest import TestCase
+from weapons import FIREBALL, ProjectilePool
+import unittest
+
+
+class Pilotless(object):
+    def __init__(self, x, y, direction):
+        self.pose = (x, y, x, y, direction, 0, 0)
+        self.rotation = None
+        self.movement = None
+
+    def get_pose(self):
+        return self.pose
+
+    def rotate(self, direction):
+        self.rotation = direction
+
+    def move(self, direction):
+        self.movement = direction
+
+
+class Arena(object):
+    '''
+    Just enough of a GameMediator for the bots to look around
+    '''
+    WEAPON = FIREBALL
+
+    def __init__(self, players):
+        self.players = players
+        self.celestials = []
+        self.projectiles = ProjectilePool(30, capacity=8)
+        self.camera = type('Camera', (object,), {'world': Rect(0, 0, 1000, 1000)})()
+        self.fired = []
+
+    def fire(self, player):
+        self.fired.append(player)
+
+
+class PilotSystemTest(TestCase):
+
+    def setUp(self):
+        # Facing straight down the screen, with a target off to its right
+        self.arena = Arena({
+            1: Pilotless(500.0, 500.0, 0.0),
+            2: Pilotless(700.0, 500.0, 0.0),
+        })
+        self.pilots = PilotSystem(self.arena, cadence=1)
+        self.pilots.add(1)
+
+    def test_update__turns_to_target(self):
+        self.pilots.update(1000.0 / 30)
+
+        bot = self.arena.players[1]
+        self.assertEqual(bot.rotation, Ship.ROT_LEFT)
+        # Too far off to be worth thrusting yet
+        self.assertEqual(bot.movement, Ship.MOV_STOP)
+        self.assertEqual(self.arena.players[2].rotation, None)
+
+    def test_update__fires_when_lined_up(self):
+        self.arena.players[1].pose = (500.0, 500.0, 500.0, 500.0, pi / 2, 0, 0)
+
+        self.pilots.update(1000.0 / 30)
+        self.pilots.update(1000.0 / 30)
+
+        self.assertEqual(self.arena.players[1].rotation, Ship.ROT_STOP)
+        # Only once, until the cooldown is over
+        self.assertEqual(self.arena.fired, [1])
+
+    def test_update__dodges(self):
+        # Headed straight up the screen towards the bot, from just below it
+        self.arena.projectiles.fire(500.0, 560.0, 0.0, -6.0, FIREBALL, 2)
+        self.arena.players[2].pose = (500.0, 900.0, 500.0, 900.0, 0.0, 0, 0)
+
+        self.pilots.update(1000.0 / 30)
+
+        # Sideways, instead of towards the target right behind the projectile
+        bot = self.arena.players[1]
+        self.assertNotEqual(bot.rotation, Ship.ROT_STOP)
+
+
+class RollbackTest(TestCase):
+    '''
+    Going back to a saved state with bots in the match replays just like the first time
+    '''
+
+    SEED = 3
+    TICKS = 40
+
+    def setUp(self):
+        from bench import init_headless
+        from menu.mediators import GameMediator
+
+        class Sector(GameMediator):
+            BOTS = 2
+        screen = init_headless((320, 240))
+
+        self.mediator = Sector(seed=self.SEED, deterministic=True)
+        for msg in self.mediator.preload(screen):
+            pass
+        self.mediator.unfreeze()
+        self.step = 1000.0 / self.mediator.STEP_RATE
+
+    def simulate(self, ticks):
+        for _ in range(ticks):
+            self.mediator.simulate(self.step)
+
+    def test_set_state(self):
+        from netplay import checksum
+
+        # Past the first few decisions, so the bots are midway through their cooldowns
+        self.simulate(self.TICKS)
+        state = self.mediator.get_state()
+
+        self.simulate(self.TICKS)
+        expected = checksum(self.mediator)
+
+        self.mediator.set_state(state)
+        self.simulate(self.TICKS)
+
+        self.assertEqual(checksum(self.mediator), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+'''
+Packs a batch of sprites into one surface, handing out subsurfaces of it
+
+The packed pixels and a small index of where each sprite went are kept in
+the scale_cache folder, so the next start up reads a single file instead
+of opening and decoding every sprite on its own
+'''
+from hashlib import sha1
+from math import ceil, sqrt
+
+import json
+import loader
+import os
+import pygame
+import scale_cache
+
+
+# Space left between sprites, so nothing sampling a sprite's edge picks up its neighbour
+PADDING = 1
+
+
+def pack(sizes):
+    '''
+    Works out where to put rects of the given {key: (width, height)} sizes,
+    filling shelves from the tallest rect down
+
+    Returns the (width, height) needed and the {key: (x, y)} of each rect
+    '''
+    if not sizes:
+        return (0, 0), {}
+
+    area = sum((width + PADDING) * (height + PADDING) for width, height in sizes.values())
+    widest = max(width for width, height in sizes.values()) + PADDING
+    # Roughly square, shelves always waste a little
+    limit = max(widest, int(ceil(sqrt(area) * 1.1)))
+
+    positions = {}
+    x = y = shelf = used = 0
+    for key in sorted(sizes, key=lambda key: (-sizes[key][1], key)):
+        width, height = sizes[key]
+
+        if x + width > limit:
+            y += shelf + PADDING
+            x = shelf = 0
+
+        positions[key] = (x, y)
+        x += width + PADDING
+        shelf = max(shelf, height)
+        used = max(used, x - PADDING)
+
+    return (used, y + shelf), positions
+
+
+def build(images):
+    '''
+    Packs the {key: Surface} images into one surface with per pixel alpha,
+    returning it and the {key: Rect} each image was put at
+    '''
+    sizes = dict((key, image.get_size()) for key, image in images.iteritems())
+    size, positions = pack(sizes)
+
+    surface = pygame.Surface(size, pygame.SRCALPHA, 32)
+    surface.fill((0, 0, 0, 0))
+
+    rects = {}
+    for key, image in images.iteritems():
+        rects[key] = surface.blit(image, positions[key])
+
+    return surface, rects
+
+
+def subsurfaces(surface, rects):
+    '''
+    Returns the {key: Surface} views into the surface for each of the rects
+    '''
+    return dict((key, surface.subsurface(rect)) for key, rect in rects.iteritems())
+
+
+def load_images(paths):
+    '''
+    Loads the {key: path} images as subsurfaces of one atlas, packing and
+    storing the atlas if it isn't stored already
+
+    Returns the {key: Surface} images
+    '''
+    key = _key('images', paths)
+
+    cached = _read(key)
+    if cached is None:
+        images = dict(loader.load_images(paths))
+        cached = build(images)
+        _write(key, *cached)
+
+    surface, rects = cached
+    return subsurfaces(loader.convert(surface), rects)
+
+
+def scale_images(paths, images, sizes):
+    '''
+    Smoothscales each of the {key: Surface} images, loaded from the {key: path}
+    paths, to its size in {key: (width, height)}, packing them into one atlas
+
+    Returns the {key: Surface} scaled images
+    '''
+    key = _key('scaled %s' % sorted(sizes.items()), paths)
+
+    cached = _read(key)
+    if cached is None:
+        scaled = dict(
+            (name, pygame.transform.smoothscale(images[name], size))
+            for name, size in sizes.iteritems()
+        )
+        cached = build(scaled)
+        _write(key, *cached)
+
+    surface, rects = cached
+    return subsurfaces(loader.convert(surface), rects)
+
+
+def _key(kind, paths):
+    '''
+    HELPER: Returns the cache key for an atlas of the given files, which
+    changes whenever one of them does
+    '''
+    files = sorted(
+        (name, os.path.abspath(path), os.stat(path).st_mtime)
+        for name, path in paths.iteritems()
+    )
+    return sha1('atlas|%s|%r' % (kind, files)).hexdigest()
+
+
+def _index_filename(key):
+    return os.path.join(scale_cache.CACHE_PATH, '%s.json' % key)
+
+
+def _read(key):
+    '''
+    HELPER: Returns the stored (surface, rects) of an atlas, or None if it isn't stored
+    '''
+    try:
+        with open(_index_filename(key)) as index_file:
+            index = json.load(index_file)
+    except (IOError, OSError, ValueError):
+        return None
+
+    surface = scale_cache.read(key, tuple(index['size']))
+    if surface is None:
+        return None
+
+    # json hands the names back as unicode
+    rects = dict(
+        (name.encode('utf-8'), pygame.Rect(rect))
+        for name, rect in index['rects'].iteritems()
+    )
+    return surface, rects
+
+
+def _write(key, surface, rects):
+    '''
+    HELPER: Stores the atlas, the pixels first so an index never points at missing ones
+    '''
+    scale_cache.write(key, surface)
+
+    index = {
+        'size': surface.get_size(),
+        'rects': dict((name, tuple(rect)) for name, rect in rects.iteritems()),
+    }
+
+    filename = _index_filename(key)
+    partial = '%s.%d' % (filename, os.getpid())
+    try:
+        with open(partial, 'w') as index_file:
+            json.dump(index, index_file)
+        os.rename(partial, filename)
+    except (IOError, OSError):
+        pass
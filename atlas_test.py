@@ -0,0 +1,25 @@
+from atlas import PADDING, pack
+from pygame import Rect
+from unittest import TestCase
+import unittest
+
+
+class PackTest(TestCase):
+
+    def test_pack__no_overlap(self):
+        sizes = dict((key, (10 + key * 7 % 40, 5 + key * 13 % 30)) for key in range(30))
+        (width, height), positions = pack(sizes)
+
+        rects = [Rect(positions[key], sizes[key]) for key in sizes]
+        bounds = Rect(0, 0, width, height)
+        for index, rect in enumerate(rects):
+            self.assertTrue(bounds.contains(rect))
+            # Padding counts as part of the sprite, so neighbours never touch
+            self.assertEqual(rect.inflate(PADDING, PADDING).collidelist(rects[index + 1:]), -1)
+
+    def test_pack__empty(self):
+        self.assertEqual(pack({}), ((0, 0), {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
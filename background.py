@@ -1,5 +1,8 @@
+from abstract.view import View
 from random import choice as randchoice
+from random import Random
 
+import loader
 import os
 import pygame
 
@@ -11,7 +14,10 @@ IMAGE_PATH = os.path.join('Resources', 'backgrounds')
     STRETCH,
 ) = range(2)
 
-def load(image=None, options=KEEP, resolution=None):
+def choose(image=None):
+    '''
+    Returns the path to the given background, or a random one if it doesn't exist
+    '''
     images = {}
     for key in os.listdir(IMAGE_PATH):
         # ignore hidden files
@@ -23,19 +29,193 @@ def load(image=None, options=KEEP, resolution=None):
     if image is None or image not in images.keys():
         image = randchoice(images.keys())
 
-    image = pygame.image.load(images[image])
+    return images[image]
 
+def prepare(image, options=KEEP, resolution=None):
+    '''
+    Gets an already loaded background ready for the screen
+    '''
     # scale if needed
     if options == STRETCH and resolution is not None:
         image = pygame.transform.smoothscale(image, resolution)
 
     return image
 
+def load_async(image=None):
+    '''
+    Starts decoding the background in the background, returning a PendingImage
+    Pass its result into prepare once it's needed
+    '''
+    return loader.load_async(choose(image))
 
-
-
-
-
-
-
-
+def load(image=None, options=KEEP, resolution=None):
+    image = loader.convert(pygame.image.load(choose(image)))
+
+    return prepare(image, options, resolution)
+
+
+def stars(size, count, seed=0, color=(255, 255, 255)):
+    '''
+    Returns an image of scattered stars, see-through everywhere else
+    It is used as a tile, so the stars stay clear of its edges
+    '''
+    width, height = size
+    # Its own generator, so the sector's random numbers don't depend on the background
+    random = Random(seed)
+
+    image = pygame.Surface(size)
+    image.set_colorkey((0, 0, 0))
+    for _ in xrange(count):
+        x = random.randrange(1, width - 1)
+        y = random.randrange(1, height - 1)
+        brightness = random.uniform(0.4, 1.0)
+        image.set_at((x, y), [int(channel * brightness) for channel in color])
+
+    return loader.convert(image)
+
+
+def _tile_starts(start, length, image_length, tile):
+    '''
+    HELPER: Yields where each tile touching [start, start + length) begins,
+    along one axis of an image repeating every image_length
+    '''
+    repeat = start - start % image_length
+    while repeat < start + length:
+        for x in xrange(repeat, repeat + image_length, tile):
+            if start - tile < x < start + length:
+                yield x
+        repeat += image_length
+
+
+class _Layer(object):
+    '''
+    One image repeated across the whole world, keeping what it last drew
+    so moving it only has to draw the strips that came into view
+    '''
+
+    def __init__(self, image, parallax, size, tile_size):
+        self.parallax = parallax
+        self.image_size = image.get_size()
+        self.tile_size = tile_size
+
+        # Split up so filling a thin strip only blits the few tiles it crosses
+        self.tiles = {}
+        for x in xrange(0, self.image_size[0], tile_size):
+            for y in xrange(0, self.image_size[1], tile_size):
+                rect = pygame.Rect(x, y, tile_size, tile_size).clip(image.get_rect())
+                self.tiles[x / tile_size, y / tile_size] = image.subsurface(rect)
+
+        self.surface = loader.convert(pygame.Surface(size))
+        self.colorkey = image.get_colorkey()
+        if self.colorkey is not None:
+            self.surface.set_colorkey(self.colorkey)
+
+        self.position = None
+
+    def scroll_to(self, x, y):
+        '''
+        Moves the top left of the layer's view to (x, y) in the image,
+        returning whether anything had to be drawn
+        '''
+        if self.position == (x, y):
+            return False
+
+        width, height = self.surface.get_size()
+        if self.position is None:
+            move_x, move_y = width, height
+        else:
+            move_x, move_y = x - self.position[0], y - self.position[1]
+        self.position = (x, y)
+
+        if abs(move_x) >= width or abs(move_y) >= height:
+            self._fill(pygame.Rect(0, 0, width, height))
+            return True
+
+        self.surface.scroll(-move_x, -move_y)
+
+        # The strips that scrolled into view, the corner is only in the second
+        if move_x > 0:
+            self._fill(pygame.Rect(width - move_x, 0, move_x, height))
+        elif move_x < 0:
+            self._fill(pygame.Rect(0, 0, -move_x, height))
+        if move_y > 0:
+            self._fill(pygame.Rect(0, height - move_y, width, move_y))
+        elif move_y < 0:
+            self._fill(pygame.Rect(0, 0, width, -move_y))
+
+        return True
+
+    def _fill(self, area):
+        '''
+        HELPER: Draws the tiles showing in the area of the layer's surface
+        '''
+        if self.colorkey is not None:
+            self.surface.fill(self.colorkey, area)
+
+        image_width, image_height = self.image_size
+        tile = self.tile_size
+        left = self.position[0] + area.left
+        top = self.position[1] + area.top
+
+        self.surface.set_clip(area)
+        for x in _tile_starts(left, area.width, image_width, tile):
+            for y in _tile_starts(top, area.height, image_height, tile):
+                # The image repeats, so wrap around to the tile that shows up here
+                key = ((x % image_width) / tile, (y % image_height) / tile)
+                self.surface.blit(self.tiles[key], (x - self.position[0], y - self.position[1]))
+        self.surface.set_clip(None)
+
+
+class StarfieldView(View):
+    '''
+    A background made of layers that scroll slower the further away they are
+
+    Only the parts that scrolled into view are drawn each frame, so a still
+    camera costs a single blit no matter how big the screen is
+    '''
+
+    TILE_SIZE = 128
+
+    def __init__(self, size):
+        self.size = size
+        self.layers = []
+
+        self.surface = loader.convert(pygame.Surface(size))
+        self._offset = None
+
+    def add_layer(self, image, parallax=1.0):
+        '''
+        Adds an image on top of the others, repeating it across the world
+        parallax is how far it moves for every pixel the camera does,
+        0 keeps it still and 1 moves it along with everything else
+        '''
+        self.layers.append(_Layer(image, parallax, self.size, self.TILE_SIZE))
+        self._offset = None
+
+    def draw(self, screen, alpha=1.0, offset=(0, 0)):
+        self._scroll(offset)
+        return screen.blit(self.surface, (0, 0))
+
+    def restore(self, screen, rect):
+        '''
+        Re-draws only the given area, as it was last drawn
+        '''
+        return screen.blit(self.surface, rect, rect)
+
+    def _scroll(self, offset):
+        '''
+        HELPER: Brings every layer up to the camera's offset
+        '''
+        if offset == self._offset:
+            return
+        self._offset = offset
+
+        changed = False
+        for layer in self.layers:
+            x = int(round(-offset[0] * layer.parallax))
+            y = int(round(-offset[1] * layer.parallax))
+            changed = layer.scroll_to(x, y) or changed
+
+        if changed:
+            for layer in self.layers:
+                self.surface.blit(layer.surface, (0, 0))
@@ -0,0 +1,39 @@
+from background import StarfieldView, stars
+from unittest import TestCase
+import pygame
+import unittest
+
+
+class StarfieldViewTest(TestCase):
+
+    def setUp(self):
+        # Not a multiple of the tile size, so the last tiles are cut short
+        picture = pygame.Surface((300, 200))
+        for x in range(0, 300, 10):
+            pygame.draw.line(picture, (x % 256, 100, 200), (x, 0), (x, 199))
+
+        self.layers = [
+            (picture, 0.5),
+            (stars((100, 100), 30, seed=3), 1.0),
+        ]
+
+    def render(self, offsets):
+        view = StarfieldView((160, 120))
+        for image, parallax in self.layers:
+            view.add_layer(image, parallax)
+
+        screen = pygame.Surface((160, 120))
+        for offset in offsets:
+            view.draw(screen, offset=offset)
+        return pygame.image.tostring(screen, 'RGB')
+
+    def test_draw__scrolled_matches_fresh(self):
+        '''
+        Drawing only the strips that scroll into view ends up like drawing everything
+        '''
+        offsets = [(0, 0), (-7, -3), (-20, 5), (13, 40), (-400, -400), (-403, -390)]
+        self.assertEqual(self.render(offsets), self.render(offsets[-1:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+'''
+Runs a GameMediator sector without a window as fast as possible, reporting
+how long the updates and draws took as JSON
+
+    python bench.py --ticks 1000 --suns 2 --planets 8 --ships 100
+'''
+import os
+
+# SDL needs to know there is no window before pygame starts up
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from ai import PilotSystem
+from argparse import ArgumentParser
+from math import pi
+from random import Random
+from timeit import default_timer as timer
+
+import json
+import pygame
+import random
+import sys
+
+from celestials import Sun, Planet
+from gravity import BarnesHutSystem, GravityFieldSystem, GravitySystem, INTEGRATORS
+from menu.controllers import FIRE
+from menu.mediators import GameMediator
+from ship import Ship
+
+
+def init_headless(resolution):
+    '''
+    Starts up pygame with a display that never shows up, returning its screen
+    '''
+    pygame.init()
+    return pygame.display.set_mode(resolution)
+
+
+def percentiles(times, points=(50, 95, 99)):
+    '''
+    Returns the given percentiles of the times (in seconds) as milliseconds
+    '''
+    times = sorted(times)
+    last = len(times) - 1
+
+    return dict(
+        ('p%d' % point, times[int(round(last * point / 100.0))] * 1000)
+        for point in points
+    )
+
+
+class BenchMediator(GameMediator):
+    '''
+    A GameMediator with a randomly generated sector of the given size
+    '''
+
+    def __init__(self, suns=1, planets=3, ships=4, seed=0, clock=None):
+        self.sector = {
+            'suns': suns,
+            'planets': planets,
+            'ships': ships,
+            'seed': seed,
+        }
+        self._random = Random(seed)
+
+        super(BenchMediator, self).__init__(clock)
+
+    def _load_sector(self, world):
+        rand = self._random
+
+        suns = []
+        for _ in range(self.sector['suns']):
+            sun = Sun(
+                rand.randrange(world[0]),
+                rand.randrange(world[1]),
+                rand.randrange(20, 50),
+            )
+            suns.append(sun)
+            self.celestials.append(sun)
+            self.views.append(sun)
+            yield
+
+        for _ in range(self.sector['planets'] if suns else 0):
+            planet = Planet(0, 0, rand.randrange(5, 30))
+            planet.orbit(rand.choice(suns), rand.randrange(60, 240))
+            self.celestials.append(planet)
+            self.views.append(planet)
+            yield
+
+    def _spawn_players(self, world):
+        rand = self._random
+
+        for number in range(1, self.sector['ships'] + 1):
+            ship = Ship(
+                rand.randrange(world[0]),
+                rand.randrange(world[1]),
+                base=Ship.BASES[number % len(Ship.BASES)],
+            )
+            ship.set_MoveSpeed(10)
+            ship.set_TurnSpeed(pi)
+            ship.set_direction(rand.uniform(-pi, pi))
+
+            # Keep the ships turning so their frames change
+            ship.rotate(rand.choice((Ship.ROT_LEFT, Ship.ROT_RIGHT)))
+
+            self.views.append(ship)
+            self.players[number] = ship
+            yield
+
+
+def run(mediator, screen, ticks, fire_every=0):
+    '''
+    Runs the mediator for the given number of ticks, each one a single
+    simulation step, returning the timing report
+    Every ship fires once every fire_every ticks, if given
+    '''
+    for msg in mediator.preload(screen):
+        pass
+    mediator.unfreeze()
+
+    step = 1000.0 / (mediator.STEP_RATE or mediator.FPS)
+
+    update_times = []
+    draw_times = []
+
+    start = timer()
+    for tick in range(ticks):
+        # Keeps SDL happy, there is nobody to send us events
+        pygame.event.pump()
+
+        if fire_every and tick % fire_every == 0:
+            for player in mediator.players:
+                mediator.command(player, FIRE)
+
+        before = timer()
+        mediator.update(step)
+        middle = timer()
+        mediator._clear_screen(screen)
+        mediator.draw(screen)
+        mediator._draw_screen(screen)
+        after = timer()
+
+        update_times.append(middle - before)
+        draw_times.append(after - middle)
+    total = timer() - start
+
+    report = {
+        'ticks': ticks,
+        'seconds': total,
+        'ticks_per_sec': ticks / total,
+        'update': percentiles(update_times),
+        'draw': percentiles(draw_times),
+        'projectiles': len(mediator.projectiles),
+    }
+
+    if mediator.worker is not None:
+        # The worker simulates in real time, however fast the draws go
+        report['worker_ticks'] = mediator.worker.tick
+        report['projectiles'] = int(mediator.worker.snapshot()['alive'].sum())
+        mediator.worker.stop()
+
+    return report
+
+
+def main(args):
+    parser = ArgumentParser(description='Benchmarks a headless GameMediator')
+    parser.add_argument('--ticks', type=int, default=1000)
+    parser.add_argument('--suns', type=int, default=1)
+    parser.add_argument('--planets', type=int, default=3)
+    parser.add_argument('--ships', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fire-every', type=int, default=0,
+        help='ticks between each ship firing, 0 never fires')
+    parser.add_argument('--dirty-rects', action='store_true')
+    parser.add_argument('--world', type=int, nargs=2, metavar=('WIDTH', 'HEIGHT'),
+        help='spread the sector over a world this big, the screen shows part of it')
+    parser.add_argument('--no-lod', action='store_true',
+        help='update every view every step, however far from the camera')
+    parser.add_argument('--mutual-gravity', action='store_true',
+        help='ships pull on each other too, through a Barnes-Hut tree')
+    parser.add_argument('--theta', type=float, default=BarnesHutSystem.THETA,
+        help='the Barnes-Hut opening angle')
+    parser.add_argument('--gravity-field', action='store_true',
+        help='look up the pull of the wells from a grid')
+    parser.add_argument('--cell-size', type=int, default=GravityFieldSystem.CELL_SIZE,
+        help='pixels between the grid points of the gravity field')
+    parser.add_argument('--integrator', choices=INTEGRATORS, default=GravitySystem.INTEGRATOR,
+        help='how the gravity system moves the ships along')
+    parser.add_argument('--max-substeps', type=int, default=GravitySystem.MAX_SUBSTEPS,
+        help='the most substeps a ship can take in one step, with an integrator other than euler')
+    parser.add_argument('--step-rate', type=int, default=GameMediator.STEP_RATE,
+        help='simulation steps per second, speeds stay measured per frame')
+    parser.add_argument('--bots', type=int, default=0,
+        help='how many of the ships are flown by bots, instead of spinning in place')
+    parser.add_argument('--bot-cadence', type=int, default=PilotSystem.CADENCE,
+        help='steps between the decisions of each bot')
+    parser.add_argument('--physics-worker', action='store_true',
+        help='simulate in a worker process, only drawing in this one')
+    options = parser.parse_args(args)
+
+    screen = init_headless((640, 480))
+
+    # Celestials pick their masses and images from the shared random
+    random.seed(options.seed)
+
+    BenchMediator.DIRTY_RECTS = options.dirty_rects
+    BenchMediator.MUTUAL_GRAVITY = options.mutual_gravity
+    BenchMediator.WORLD_SIZE = options.world and tuple(options.world)
+    BenchMediator.UPDATE_LOD = not options.no_lod
+    BarnesHutSystem.THETA = options.theta
+    BenchMediator.GRAVITY_FIELD = options.gravity_field
+    GravityFieldSystem.CELL_SIZE = options.cell_size
+    BenchMediator.INTEGRATOR = options.integrator
+    GravitySystem.MAX_SUBSTEPS = options.max_substeps
+    BenchMediator.STEP_RATE = options.step_rate
+    BenchMediator.PHYSICS_WORKER = options.physics_worker
+    BenchMediator.BOTS = options.bots
+    PilotSystem.CADENCE = options.bot_cadence
+
+    mediator = BenchMediator(
+        suns=options.suns,
+        planets=options.planets,
+        ships=options.ships,
+        seed=options.seed,
+    )
+
+    report = run(mediator, screen, options.ticks, options.fire_every)
+    report['sector'] = mediator.sector
+    report['dirty_rects'] = options.dirty_rects
+    report['mutual_gravity'] = options.mutual_gravity
+    report['gravity_field'] = options.gravity_field
+    report['integrator'] = options.integrator
+    report['step_rate'] = options.step_rate
+    report['world'] = BenchMediator.WORLD_SIZE
+    report['update_lod'] = mediator.update_lod
+    report['physics_worker'] = options.physics_worker
+    report['bots'] = options.bots
+    report['bot_cadence'] = options.bot_cadence
+
+    print json.dumps(report, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+    pygame.quit()
@@ -0,0 +1,93 @@
+from pygame import Rect
+
+
+class Camera(object):
+    '''
+    The part of the world that shows up on screen
+
+    Everything in the world is placed in world coordinates, the camera's
+    offset turns them into screen coordinates when drawing
+    '''
+
+    # How far past the edge of the screen something can be and still get drawn,
+    # so what is partly on screen doesn't pop in and out
+    MARGIN = 64
+
+    # (screens away from the view, steps between updates) from nearest to furthest
+    # Anything further than the last distance uses its update interval
+    UPDATE_INTERVALS = (
+        (1.0, 1),
+        (3.0, 4),
+        (None, 16),
+    )
+
+    def __init__(self, size, world=None):
+        '''
+        size `tuple`
+            the size of the screen
+        world `Rect`
+            the camera never shows anything outside of it, it is the size of the screen by default
+        '''
+        self.rect = Rect((0, 0), size)
+
+        if world is None:
+            world = self.rect.copy()
+        self.world = world
+
+        self._visible = self.rect.inflate(self.MARGIN * 2, self.MARGIN * 2)
+
+    @property
+    def offset(self):
+        '''
+        What to add to world coordinates to get screen ones
+        '''
+        return (-self.rect.x, -self.rect.y)
+
+    def move_to(self, x, y):
+        '''
+        Centers the camera on the given point, as far as the world allows
+        '''
+        self.rect.center = (int(round(x)), int(round(y)))
+        self.rect.clamp_ip(self.world)
+
+        self._visible.center = self.rect.center
+
+    def follow(self, objs):
+        '''
+        Centers the camera on the middle of the given objects
+        '''
+        if not objs:
+            return
+
+        self.move_to(
+            sum(obj.x for obj in objs) / float(len(objs)),
+            sum(obj.y for obj in objs) / float(len(objs)),
+        )
+
+    def to_screen(self, x, y):
+        return (x - self.rect.x, y - self.rect.y)
+
+    def to_world(self, x, y):
+        return (x + self.rect.x, y + self.rect.y)
+
+    def sees(self, rect):
+        '''
+        Whether anything in the rect (in world coordinates) would end up on screen
+        '''
+        return self._visible.colliderect(rect)
+
+    def update_interval(self, rect):
+        '''
+        Returns how many steps apart things in the rect should be updated,
+        the further away from the view the less often
+        '''
+        view = self.rect
+
+        # Distance outside the view, measured in screens along each axis
+        away_x = max(view.left - rect.right, rect.left - view.right, 0) / float(view.width)
+        away_y = max(view.top - rect.bottom, rect.top - view.bottom, 0) / float(view.height)
+        away = max(away_x, away_y)
+
+        for distance, interval in self.UPDATE_INTERVALS:
+            if distance is None or away <= distance:
+                return interval
@@ -0,0 +1,35 @@
+from camera import Camera
+from pygame import Rect
+from unittest import TestCase
+import unittest
+
+
+class CameraTest(TestCase):
+
+    def setUp(self):
+        self.camera = Camera((100, 100), world=Rect(0, 0, 1000, 1000))
+
+    def test_move_to__stays_in_world(self):
+        self.camera.move_to(10, 500)
+
+        self.assertEqual(self.camera.rect.topleft, (0, 450))
+        self.assertEqual(self.camera.offset, (0, -450))
+
+    def test_sees(self):
+        self.camera.move_to(500, 500)
+
+        self.assertTrue(self.camera.sees(Rect(540, 540, 10, 10)))
+        # Just off screen still counts, within the margin
+        self.assertTrue(self.camera.sees(Rect(560, 500, 10, 10)))
+        self.assertFalse(self.camera.sees(Rect(900, 900, 10, 10)))
+
+    def test_update_interval(self):
+        self.camera.move_to(500, 500)
+
+        self.assertEqual(self.camera.update_interval(Rect(500, 500, 10, 10)), 1)
+        self.assertEqual(self.camera.update_interval(Rect(700, 500, 10, 10)), 4)
+        self.assertEqual(self.camera.update_interval(Rect(950, 500, 10, 10)), 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
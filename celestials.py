@@ -7,6 +7,8 @@ from math import cos, sin, atan2, degrees, pi, sqrt
 from mixins import ImageBatch
 from random import randrange
 from random import choice as randchoice
+import orbit
+import scale_cache
 import well
 
 
@@ -40,8 +42,8 @@ class Celestial(Sprite, well.GravityWell):
         self.rect.centerx = x
         self.rect.centery = y
 
-        self._counter = 0
-        self._delay = 1000 / Celestial.FPS
+        # Where the celestial was before the last update, used to interpolate draws
+        self._prev_center = self.rect.center
 
         self._pullable = set()
 
@@ -54,32 +56,65 @@ class Celestial(Sprite, well.GravityWell):
         return self.rect.centery
 
     def update(self, delta_time):
-        self._counter += delta_time
-        if self._counter > self._delay:
-            self._counter = 0
+        '''
+        Advances the celestial by delta_time milliseconds
+        '''
+        steps = delta_time * Celestial.FPS / 1000.0
 
-            self._update()
+        self._prev_center = self.rect.center
+        self._update(steps)
 
-            for obj in self._pullable:
-                self._pull_obj(obj)
+        for obj in self._pullable:
+            self._pull_obj(obj, steps)
 
-    def _update(self):
-        pass
+    def _update(self, steps):
+        '''
+        Moves the celestial, steps is measured in 1 / Celestial.FPS seconds
+        '''
+
+    def get_state(self):
+        '''
+        Returns everything the simulation changes, for set_state to go back to
+        '''
+        return (self.rect.center, self._prev_center)
 
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
+    def set_state(self, state):
+        self.rect.center, self._prev_center = state
 
-    def _pull_obj(self, obj):
+    def get_pose(self):
+        '''
+        Returns the numbers drawing the celestial needs, for set_pose to show
+        '''
+        return self.rect.center + self._prev_center
+
+    def set_pose(self, pose):
+        x, y, prev_x, prev_y = pose
+        self.rect.center = (x, y)
+        self._prev_center = (prev_x, prev_y)
+
+    def draw(self, screen, alpha=1.0, offset=(0, 0)):
+        '''
+        Draws the celestial alpha of the way from its last position to its current one
+        '''
+        prev_x, prev_y = self._prev_center
+        rect = self.image.get_rect(center=(
+            int(round(prev_x + (self.x - prev_x) * alpha)) + offset[0],
+            int(round(prev_y + (self.y - prev_y) * alpha)) + offset[1],
+        ))
+        return screen.blit(self.image, rect)
+
+    def _pull_obj(self, obj, steps=1):
         dx = obj.x - self.x
         dy = obj.y - self.y
 
         distance = (dx ** 2 + dy ** 2) ** (1.0 / 2.0)
 
-        rads = atan2(-dy, dx)
+        # Ship.accelerate measures the angle from straight down, in screen axes
+        rads = atan2(-dx, -dy)
 
-        speed = self.pull(distance) / Celestial.FPS
+        speed = self.pull(distance) * steps / Celestial.FPS
 
-        obj.accelerate(-1 * rads, -1 * speed / Celestial.MOVEMENT_CONST)
+        obj.accelerate(rads, speed / Celestial.MOVEMENT_CONST)
 
     def pull_on(self, obj):
         self._pullable.add(obj)
@@ -89,8 +124,8 @@ class Celestial(Sprite, well.GravityWell):
 
 
 
-class Sun(Celestial):
-    IMAGE = pygame.image.load(os.path.join('Resources', 'sprites', 'sun', 'Sun.png'))
+class Sun(Celestial, ImageBatch):
+    IMAGE_PATH = os.path.join('Resources', 'sprites', 'sun')
 
     # This is half the our Solar Mass
     STAR_MASS_CONST = 1 * 10 ** 33
@@ -101,7 +136,11 @@ class Sun(Celestial):
             radius = 50
         self.radius = radius
 
-        self.image = pygame.transform.smoothscale(Sun.IMAGE, (self.radius * 2, self.radius * 2))
+        self.image = scale_cache.smoothscale(
+            Sun.PATHS['Sun'],
+            Sun.IMAGES['Sun'],
+            (self.radius * 2, self.radius * 2)
+        )
 
         if mass is None:
             mass = Sun.STAR_MASS_CONST * randrange(Sun.MASS_RANGE[0], Sun.MASS_RANGE[1])
@@ -122,37 +161,85 @@ class Planet(Celestial, ImageBatch):
         self.radius = radius
 
         if image is None or image not in Planet.IMAGES.keys():
-            image = randchoice(Planet.IMAGES.keys())
+            # Sorted, so the same seed always picks the same image
+            image = randchoice(sorted(Planet.IMAGES.keys()))
 
-        self.image = pygame.transform.smoothscale(Planet.IMAGES[image], (self.radius * 2, self.radius * 2))
+        self.image = scale_cache.smoothscale(
+            Planet.PATHS[image],
+            Planet.IMAGES[image],
+            (self.radius * 2, self.radius * 2)
+        )
 
         if mass is None:
             mass = Planet.PLANET_MASS_CONST * randrange(Planet.MASS_RANGE[0], Planet.MASS_RANGE[1])
         self.mass = mass
 
-        self.rads = randrange(0, 360) * pi / 180
+        # Where along the orbit the planet starts
+        self.anomaly = randrange(0, 360) * pi / 180
+
+        # Steps since the planet started orbiting, unless an OrbitSystem keeps the time
+        self.time = 0.0
+        self.orbit_system = None
 
         super(Planet, self).__init__(x, y)
 
-    def _update(self):
-        self.rads += pi / 2 ** self.speed
-        self.rads %= 2 * pi
+    def _update(self, steps):
+        if self.orbit_system is None:
+            self.time += steps
+
+        self._place()
 
-        self.rect.centerx = self.orbit.x + self.distance * cos(self.rads)
-        self.rect.centery = self.orbit.y + self.distance * sin(self.rads)
+    def get_state(self):
+        return (self.time, super(Planet, self).get_state())
 
+    def set_state(self, state):
+        self.time, state = state
+        super(Planet, self).set_state(state)
 
-    def orbit(self, obj, distance, speed=None):
+    def _place(self):
         '''
+        HELPER: Moves the planet to its current spot along the orbit
+        '''
+        if self.orbit_system is not None:
+            # Already worked out along with every other planet
+            x, y = self.orbit_system.position(self)
+        else:
+            x, y = orbit.position(
+                self.orbit.x, self.orbit.y,
+                self.distance, self.eccentricity, self.periapsis,
+                self.anomaly + self.motion * self.time,
+            )
+
+        self.rect.centerx = x
+        self.rect.centery = y
+
+
+    def orbit(self, obj, distance, speed=None, eccentricity=0, periapsis=None):
+        '''
+        Puts the planet in orbit around obj, distance is the semi-major axis
+        and periapsis the angle the orbit comes closest to obj at
+
         TODO: use GravityWell.satellite() to figure out the minimal speed needed
-        TODO: elliptical orbits?
         '''
+        if not 0 <= eccentricity < 1:
+            raise ValueError('Orbits need an eccentricity in [0, 1): %s' % eccentricity)
+
         self.orbit = obj
         self.distance = distance
+        self.eccentricity = eccentricity
 
         if speed is None:
             speed = randrange(10, 15)
         self.speed = speed
+        # Radians along the orbit every step, on average
+        self.motion = pi / 2 ** speed
+
+        if periapsis is None:
+            periapsis = randrange(0, 360) * pi / 180 if eccentricity else 0
+        self.periapsis = periapsis
+
+        self._place()
+        self._prev_center = self.rect.center
 
 #     def orbit(self, obj, distance):
 #         obj.pull_on(self)
@@ -0,0 +1,189 @@
+from collections import defaultdict
+
+
+class SpatialHash(object):
+    '''
+    A uniform grid, bucketing objects by every cell their rect touches
+    so only objects sharing a cell need to be checked against each other
+    '''
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self._cells = defaultdict(list)
+
+    def clear(self):
+        self._cells.clear()
+
+    def cells(self, rect):
+        '''
+        Returns the keys of every cell the rect touches
+        '''
+        size = self.cell_size
+
+        left = int(rect.left // size)
+        right = int((rect.right - 1) // size)
+        top = int(rect.top // size)
+        bottom = int((rect.bottom - 1) // size)
+
+        return [
+            (x, y)
+            for x in range(left, right + 1)
+            for y in range(top, bottom + 1)
+        ]
+
+    def insert(self, obj, rect):
+        for cell in self.cells(rect):
+            self._cells[cell].append(obj)
+
+    def query(self, rect):
+        '''
+        Returns every object sharing a cell with the given rect
+        '''
+        found = set()
+        cells = self._cells
+
+        for cell in self.cells(rect):
+            if cell in cells:
+                found.update(cells[cell])
+
+        return found
+
+    def buckets(self):
+        '''
+        Returns the objects in each of the non-empty cells
+        '''
+        return self._cells.values()
+
+
+class CollisionSystem(object):
+    '''
+    Finds colliding objects every update, calling the handler registered for
+    the pair of groups they belong to
+
+    Objects require rect, x, y and radius to be defined
+
+    Projectiles aren't objects, so they never get added here, ProjectilePool
+    buckets its live shots into a grid of its own every update and checks them
+    against its targets there
+    '''
+
+    def __init__(self, cell_size=64):
+        self._group = {}
+        # The order objects were added in, so pairs come out the same in every process
+        self._index = {}
+        self._added = 0
+        self._dynamic = []
+        self._static = []
+
+        self._handlers = {}
+
+        self._moving = SpatialHash(cell_size)
+        self._still = SpatialHash(cell_size)
+        self._still_dirty = False
+
+    def add(self, obj, group, static=False):
+        '''
+        Adds an object to the given group, static objects are only hashed
+        once as they never move
+        '''
+        self._group[obj] = group
+        self._index[obj] = self._added
+        self._added += 1
+
+        if static:
+            self._static.append(obj)
+            self._still_dirty = True
+        else:
+            self._dynamic.append(obj)
+
+    def remove(self, obj):
+        del self._group[obj]
+        del self._index[obj]
+
+        if obj in self._static:
+            self._static.remove(obj)
+            self._still_dirty = True
+        else:
+            self._dynamic.remove(obj)
+
+    def on_collision(self, group_a, group_b):
+        '''
+        Adds a handler for when an object of group_a hits one of group_b
+
+        callback(obj_a, obj_b):
+            obj_a is always from group_a
+        '''
+        def wrapper(func):
+            self._handlers[(group_a, group_b)] = func
+            return func
+        return wrapper
+
+    def update(self, delta_time):
+        for obj_a, obj_b in self.pairs():
+            if not self.touching(obj_a, obj_b):
+                continue
+
+            handler = self._handlers.get((self._group[obj_a], self._group[obj_b]))
+            if handler is None:
+                handler = self._handlers[(self._group[obj_b], self._group[obj_a])]
+                obj_a, obj_b = obj_b, obj_a
+
+            handler(obj_a, obj_b)
+
+    def pairs(self):
+        '''
+        Returns the candidate pairs of objects that share a cell and have a handler,
+        in the order the objects were added
+        '''
+        if self._still_dirty:
+            self._still.clear()
+            for obj in self._static:
+                self._still.insert(obj, obj.rect)
+            self._still_dirty = False
+
+        self._moving.clear()
+        for obj in self._dynamic:
+            self._moving.insert(obj, obj.rect)
+
+        pairs = set()
+
+        # Moving objects against each other
+        for bucket in self._moving.buckets():
+            for index, obj_a in enumerate(bucket):
+                for obj_b in bucket[index + 1:]:
+                    self._add_pair(pairs, obj_a, obj_b)
+
+        # Moving objects against the ones that stay still
+        if self._static:
+            for obj_a in self._dynamic:
+                for obj_b in self._still.query(obj_a.rect):
+                    self._add_pair(pairs, obj_a, obj_b)
+
+        index = self._index
+        return sorted(pairs, key=lambda pair: (index[pair[0]], index[pair[1]]))
+
+    @staticmethod
+    def touching(obj_a, obj_b):
+        '''
+        Whether the circles around the two objects overlap
+        '''
+        dx = obj_a.x - obj_b.x
+        dy = obj_a.y - obj_b.y
+        reach = obj_a.radius + obj_b.radius
+
+        return dx ** 2 + dy ** 2 < reach ** 2
+
+    def _add_pair(self, pairs, obj_a, obj_b):
+        '''
+        HELPER: Adds the pair once, no matter which order it was found in
+        '''
+        if obj_a is obj_b:
+            return
+
+        groups = (self._group[obj_a], self._group[obj_b])
+        if groups not in self._handlers and groups[::-1] not in self._handlers:
+            return
+
+        if self._index[obj_a] > self._index[obj_b]:
+            obj_a, obj_b = obj_b, obj_a
+        pairs.add((obj_a, obj_b))
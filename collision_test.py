@@ -0,0 +1,145 @@
+from collision import SpatialHash, CollisionSystem
+from pygame import Rect, Surface
+from ship import Ship
+from unittest import TestCase
+import unittest
+
+
+class Body(object):
+    def __init__(self, x, y, radius):
+        self.x = x
+        self.y = y
+        self.radius = radius
+        self.rect = Rect(x - radius, y - radius, radius * 2, radius * 2)
+
+
+class SpatialHashTest(TestCase):
+
+    def setUp(self):
+        self.grid = SpatialHash(cell_size=10)
+
+    def test_cells(self):
+        '''
+        A rect gets every cell it touches, but not the ones its edge only borders
+        '''
+        self.assertEqual(self.grid.cells(Rect(0, 0, 10, 10)), [(0, 0)])
+        self.assertEqual(
+            sorted(self.grid.cells(Rect(5, -5, 10, 10))),
+            [(0, -1), (0, 0), (1, -1), (1, 0)]
+        )
+
+    def test_query(self):
+        near = Body(5, 5, 2)
+        far = Body(95, 95, 2)
+        self.grid.insert(near, near.rect)
+        self.grid.insert(far, far.rect)
+
+        self.assertEqual(self.grid.query(Rect(0, 0, 4, 4)), set([near]))
+
+
+class CollisionSystemTest(TestCase):
+
+    def setUp(self):
+        self.system = CollisionSystem(cell_size=10)
+        self.hits = []
+
+        @self.system.on_collision('ship', 'sun')
+        def hit(ship, sun):
+            self.hits.append((ship, sun))
+
+    def test_update__calls_handler(self):
+        '''
+        Overlapping objects call the handler, in the order it was registered with
+        '''
+        sun = Body(50, 50, 20)
+        ship = Body(72, 50, 5)
+        self.system.add(sun, 'sun', static=True)
+        self.system.add(ship, 'ship')
+
+        self.system.update(0)
+
+        self.assertEqual(self.hits, [(ship, sun)])
+
+    def test_update__sharing_a_cell(self):
+        '''
+        Objects sharing a cell that don't actually touch are left alone
+        '''
+        sun = Body(50, 50, 20)
+        ship = Body(68, 68, 5)
+        self.system.add(sun, 'sun', static=True)
+        self.system.add(ship, 'ship')
+
+        self.assertEqual(len(self.system.pairs()), 1)
+
+        self.system.update(0)
+
+        self.assertEqual(self.hits, [])
+
+    def test_pairs__without_handler(self):
+        '''
+        Groups without a handler never get paired up
+        '''
+        self.system.add(Body(5, 5, 5), 'ship')
+        self.system.add(Body(6, 6, 5), 'ship')
+
+        self.assertEqual(self.system.pairs(), [])
+
+    def test_pairs__insertion_order(self):
+        '''
+        Pairs come out in the order the objects were added, whatever their ids
+        '''
+        @self.system.on_collision('ship', 'ship')
+        def bounce(ship_a, ship_b):
+            pass
+
+        ships = [Body(5 + index, 5, 5) for index in range(4)]
+        for ship in reversed(ships):
+            self.system.add(ship, 'ship')
+
+        ships.reverse()
+        self.assertEqual(self.system.pairs(), [
+            (ships[a], ships[b])
+            for a in range(4)
+            for b in range(a + 1, 4)
+        ])
+
+
+class BounceTest(TestCase):
+
+    def setUp(self):
+        # Only the size of the image matters here
+        self.images = getattr(Ship, 'SCALED_IMAGES', None)
+        Ship.SCALED_IMAGES = {'ship1': Surface((20, 20))}
+
+    def tearDown(self):
+        if self.images is None:
+            del Ship.SCALED_IMAGES
+        else:
+            Ship.SCALED_IMAGES = self.images
+
+    def bounced(self, swap):
+        '''
+        Returns the states of two overlapping ships, after bouncing them off each other
+        '''
+        ships = [Ship(100, 100), Ship(110, 104)]
+        ships[0].set_motion(100.4, 100.3, 1.0, 0.0)
+        ships[1].set_motion(110.7, 103.6, -1.0, 0.5)
+
+        if swap:
+            ships[1].bounce(ships[0])
+        else:
+            ships[0].bounce(ships[1])
+
+        return [ship.get_motion() for ship in ships]
+
+    def test_bounce__either_way(self):
+        '''
+        Bouncing goes the same whichever ship it starts from
+        '''
+        for this, other in zip(self.bounced(False), self.bounced(True)):
+            for a, b in zip(this, other):
+                self.assertAlmostEqual(a, b, places=12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+from abstract.event_manager import EventManager, Mods
+from pygame import locals as const
+from pygame.event import Event
+from unittest import TestCase
+import unittest
+
+
+class EventManagerTest(TestCase):
+
+    def setUp(self):
+        self.manager = EventManager()
+        self.calls = []
+
+    def handler(self, name):
+        def handler(context, **kwargs):
+            self.calls.append((name, kwargs))
+        return handler
+
+    def keydown(self, key, mod=0):
+        return Event(const.KEYDOWN, key=key, mod=mod)
+
+    def test_keydown__const(self):
+        '''
+        Constants get passed in as keyword arguments
+        '''
+        self.manager.keydown(const.K_a, const={'player': 1})(self.handler('a'))
+
+        self.manager([self.keydown(const.K_a)])
+
+        self.assertEqual(self.calls, [('a', {'player': 1})])
+
+    def test_keydown__order(self):
+        '''
+        Shortcuts get called before keydowns, generic handlers come last
+        '''
+        self.manager.event(const.KEYDOWN)(self.handler('generic'))
+        self.manager.keydown(const.K_q)(self.handler('keydown'))
+        self.manager.shortcut(Mods.CTRL, const.K_q)(self.handler('shortcut'))
+
+        self.manager([self.keydown(const.K_q, const.KMOD_LCTRL)])
+        self.manager([self.keydown(const.K_q)])
+
+        self.assertEqual([name for name, kwargs in self.calls], [
+            'shortcut', 'keydown', 'generic',
+            'keydown', 'generic',
+        ])
+
+    def test_shortcut__modifiers(self):
+        '''
+        Shortcuts only match their exact modifiers
+        '''
+        self.manager.shortcut(Mods.CTRL, const.K_p)(self.handler('ctrl'))
+        self.manager.shortcut(None, const.K_p)(self.handler('plain'))
+
+        self.manager([
+            self.keydown(const.K_p, const.KMOD_RCTRL),
+            self.keydown(const.K_p, const.KMOD_LCTRL | const.KMOD_LSHIFT),
+            self.keydown(const.K_p),
+        ])
+
+        self.assertEqual([name for name, kwargs in self.calls], ['ctrl', 'plain'])
+
+    def test_register__after_handling(self):
+        '''
+        Handlers added after events were handled still get called
+        '''
+        self.manager([self.keydown(const.K_a)])
+        self.manager.keyup(const.K_a)(self.handler('keyup'))
+        self.manager.quit(self.handler('quit'))
+
+        self.manager([Event(const.KEYUP, key=const.K_a, mod=0), Event(const.QUIT)])
+
+        self.assertEqual([name for name, kwargs in self.calls], ['keyup', 'quit'])
+
+
+if __name__ == '__main__':
+    unittest.main()
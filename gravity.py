@@ -0,0 +1,581 @@
+from math import ceil
+
+import numpy
+
+from celestials import Celestial
+from well import GravityWell
+
+
+def pull(dx, dy, mass, closest=1.0):
+    '''
+    Returns the change in speed a mass causes, for every step, on objects
+    dx, dy away from it (as arrays)
+    Anything closer than closest gets pulled as if it were that far away
+
+    This follows the same rules as Celestial._pull_obj, the result is in the
+    same axes as Ship.push, where y points up
+    '''
+    # A body sitting right on a well would divide by zero
+    distance2 = numpy.maximum(dx ** 2 + dy ** 2, closest ** 2)
+    distance = numpy.sqrt(distance2)
+
+    # GravityWell.pull() scaled per frame and to our movement units
+    scale = GravityWell.UGC / (Celestial.FPS * Celestial.MOVEMENT_CONST)
+    speed = scale * mass / distance2
+
+    # Towards the well, dy is measured down the screen
+    return (-speed * dx / distance, speed * dy / distance)
+
+
+# How a GravitySystem moves its bodies along, see GravitySystem.INTEGRATOR
+# Euler only kicks the bodies' speeds once per step, from their rounded
+# positions, and leaves moving to the bodies themselves
+EULER = 'euler'
+# The others move the bodies too, in substeps where the pull is strong
+SEMI_IMPLICIT = 'semi-implicit'
+VERLET = 'verlet'
+INTEGRATORS = (EULER, SEMI_IMPLICIT, VERLET)
+
+
+def substeps(pull_x, pull_y, steps, heaviest, eta, most):
+    '''
+    Returns how many equal substeps each body needs to take the given number
+    of steps in, so none is longer than eta of the time it'd take to fall into
+    the well, with up to most of them
+
+    pull_x, pull_y
+        the change in speed per step on each body (as arrays)
+    heaviest
+        the pull of the heaviest well, from one pixel away
+    '''
+    count = numpy.ones(len(pull_x), dtype=int)
+    if not heaviest:
+        return count
+
+    # Taking the heaviest well to be doing the pulling, it is sqrt(heaviest / strength)
+    # away, and falling in takes around sqrt(distance / strength) steps
+    strength = numpy.hypot(pull_x, pull_y)
+    fall = heaviest ** 0.25 / numpy.maximum(strength, 1e-300) ** 0.75
+
+    return numpy.clip(numpy.ceil(steps / (eta * fall)), 1, most).astype(int)
+
+
+def integrate(x, y, speed_x, speed_y, pull_x, pull_y, steps, counts, accelerations, method):
+    '''
+    Moves bodies along for the given number of steps, taking counts (as an
+    array) equal substeps each, returning their new (x, y, speed_x, speed_y)
+
+    Positions are in screen axes and speeds in Ship.push axes, all as arrays
+    pull_x, pull_y are the change in speed per step at the starting positions,
+    and accelerations(x, y) returns it for any others
+    method is SEMI_IMPLICIT or VERLET, both keep orbits from gaining or losing energy over time
+    '''
+    x, y, speed_x, speed_y, pull_x, pull_y = [
+        numpy.array(values, dtype=float) for values in (x, y, speed_x, speed_y, pull_x, pull_y)
+    ]
+    size = steps / counts.astype(float)
+
+    for substep in range(counts.max() if len(counts) else 0):
+        active = numpy.flatnonzero(counts > substep)
+        step = size[active]
+
+        if method == VERLET:
+            # Half a kick, a drift, then the other half from where it ended up
+            speed_x[active] += pull_x[active] * step / 2
+            speed_y[active] += pull_y[active] * step / 2
+            x[active] += speed_x[active] * step
+            y[active] -= speed_y[active] * step
+
+            pull_x[active], pull_y[active] = accelerations(x[active], y[active])
+            speed_x[active] += pull_x[active] * step / 2
+            speed_y[active] += pull_y[active] * step / 2
+        else:
+            # A kick from where the substep starts, then a drift at the new speed
+            if substep:
+                pull_x[active], pull_y[active] = accelerations(x[active], y[active])
+            speed_x[active] += pull_x[active] * step
+            speed_y[active] += pull_y[active] * step
+            x[active] += speed_x[active] * step
+            y[active] -= speed_y[active] * step
+
+    return x, y, speed_x, speed_y
+
+
+class GravitySystem(object):
+    '''
+    Applies the pull of every well unto every body in one batched pass,
+    instead of each Celestial pulling each of its objects one at a time
+
+    wells require x, y and mass to be defined
+    bodies require x, y and push() to be defined,
+    and get_motion() and set_motion() unless the integrator is EULER
+    '''
+
+    # How the bodies get moved along, one of INTEGRATORS
+    INTEGRATOR = EULER
+
+    # The longest a substep can be, as a share of the time it'd take to fall into the wells
+    SUBSTEP_ETA = 0.05
+    MAX_SUBSTEPS = 16
+
+    def __init__(self, integrator=None):
+        if integrator is None:
+            integrator = self.INTEGRATOR
+        self.integrator = integrator
+
+        self._wells = []
+        self._bodies = []
+
+        self._well_mass = numpy.zeros(0)
+
+    def add_well(self, well, static=False):
+        '''
+        static wells never move, which some systems can make use of
+        '''
+        self._wells.append(well)
+        self._well_mass = numpy.array([w.mass for w in self._wells], dtype=float)
+
+    def remove_well(self, well):
+        self._wells.remove(well)
+        self._well_mass = numpy.array([w.mass for w in self._wells], dtype=float)
+
+    def add_body(self, body):
+        self._bodies.append(body)
+
+    def remove_body(self, body):
+        self._bodies.remove(body)
+
+    def update(self, delta_time):
+        steps = delta_time * Celestial.FPS / 1000.0
+
+        if self.integrator == EULER:
+            self._pull(steps)
+        else:
+            self._integrate(steps)
+
+    def accelerations(self, x, y):
+        '''
+        Returns the change in speed every well causes, summed up for each of
+        the given positions (as arrays)
+        '''
+        wells = self._wells
+        count = len(wells)
+
+        well_x = numpy.fromiter((well.x for well in wells), float, count)
+        well_y = numpy.fromiter((well.y for well in wells), float, count)
+
+        # One row per well, one column per position
+        dx = x[numpy.newaxis, :] - well_x[:, numpy.newaxis]
+        dy = y[numpy.newaxis, :] - well_y[:, numpy.newaxis]
+
+        speed_x, speed_y = pull(dx, dy, self._well_mass[:, numpy.newaxis])
+
+        return speed_x.sum(axis=0), speed_y.sum(axis=0)
+
+    def _pull(self, steps):
+        '''
+        HELPER: Pulls every body towards every well for the given number
+        of 1 / Celestial.FPS second steps
+        '''
+        bodies = self._bodies
+        count = len(bodies)
+        if not count:
+            return
+
+        x = numpy.fromiter((body.x for body in bodies), float, count)
+        y = numpy.fromiter((body.y for body in bodies), float, count)
+
+        speed_x, speed_y = self.accelerations(x, y)
+
+        speed_x *= steps
+        speed_y *= steps
+
+        for body, dx, dy in zip(bodies, speed_x.tolist(), speed_y.tolist()):
+            body.push(dx, dy)
+
+    def _integrate(self, steps):
+        '''
+        HELPER: Moves every body along for the given number of 1 / Celestial.FPS
+        second steps, with the integrator
+        '''
+        bodies = self._bodies
+        count = len(bodies)
+        if not count:
+            return
+
+        motion = numpy.array([body.get_motion() for body in bodies], dtype=float).reshape(count, 4)
+        x, y, speed_x, speed_y = motion.T
+
+        pull_x, pull_y = self.accelerations(x, y)
+        counts = self._substeps(pull_x, pull_y, steps)
+
+        moved = integrate(
+            x, y, speed_x, speed_y, pull_x, pull_y,
+            steps, counts, self.accelerations, self.integrator,
+        )
+        for body, motion in zip(bodies, numpy.column_stack(moved).tolist()):
+            body.set_motion(*motion)
+
+    def _substeps(self, pull_x, pull_y, steps):
+        '''
+        HELPER: Returns how many substeps each body takes, see substeps()
+        '''
+        heaviest = 0.0
+        if len(self._well_mass):
+            heaviest = numpy.hypot(*pull(1.0, 0.0, self._well_mass.max()))
+        return substeps(pull_x, pull_y, steps, heaviest, self.SUBSTEP_ETA, self.MAX_SUBSTEPS)
+
+
+def _spread_bits(values):
+    '''
+    HELPER: Spaces out the lower 16 bits of each value, putting a 0 bit between each
+    '''
+    values = values & 0xFFFF
+    values = (values | (values << 8)) & 0x00FF00FF
+    values = (values | (values << 4)) & 0x0F0F0F0F
+    values = (values | (values << 2)) & 0x33333333
+    values = (values | (values << 1)) & 0x55555555
+    return values
+
+
+class QuadTree(object):
+    '''
+    A Barnes-Hut quadtree over point masses, built a whole level at a time
+
+    Every point gets the Morton code of the deepest cell it is in, so the
+    cells on each level are just the runs of equal code prefixes once sorted.
+    Each level keeps its cells' total mass and center of mass
+    '''
+
+    # How many times the root cell gets split, at most
+    DEPTH = 16
+
+    def __init__(self, x, y, mass):
+        self.x = x
+        self.y = y
+        self.mass = mass
+
+        count = len(x)
+        cells = 1 << self.DEPTH
+
+        left = x.min()
+        top = y.min()
+        # A bit of room, so the points on the far edges stay inside
+        self.size = max(x.max() - left, y.max() - top, 1.0) * (1 + 1e-9)
+
+        scale = cells / self.size
+        cell_x = numpy.minimum(((x - left) * scale).astype(numpy.int64), cells - 1)
+        cell_y = numpy.minimum(((y - top) * scale).astype(numpy.int64), cells - 1)
+        self.codes = _spread_bits(cell_x) | (_spread_bits(cell_y) << 1)
+
+        order = numpy.argsort(self.codes, kind='mergesort')
+        codes = self.codes[order]
+        mass = mass[order]
+        mass_x = mass * x[order]
+        mass_y = mass * y[order]
+
+        # One entry per level, the root first
+        self.keys = []
+        self.counts = []
+        self.masses = []
+        self.center_x = []
+        self.center_y = []
+
+        for level in range(self.DEPTH + 1):
+            keys = codes >> (2 * (self.DEPTH - level))
+            starts = numpy.flatnonzero(numpy.r_[True, keys[1:] != keys[:-1]])
+
+            total = numpy.add.reduceat(mass, starts)
+            # Massless cells still need somewhere to be
+            weight = numpy.where(total > 0, total, 1.0)
+
+            self.keys.append(keys[starts])
+            self.counts.append(numpy.diff(numpy.r_[starts, count]))
+            self.masses.append(total)
+            self.center_x.append(numpy.add.reduceat(mass_x, starts) / weight)
+            self.center_y.append(numpy.add.reduceat(mass_y, starts) / weight)
+
+    def children(self, level, cells):
+        '''
+        Returns where the children of the given cells start on the next level, and how many there are
+        '''
+        keys = self.keys[level][cells] << 2
+        below = self.keys[level + 1]
+
+        start = numpy.searchsorted(below, keys)
+        return start, numpy.searchsorted(below, keys + 4) - start
+
+    def accelerations(self, targets, theta):
+        '''
+        Returns the pull on each of the target points from every other point
+        Cells whose size is under theta times their distance count as one mass,
+        a theta of 0 sums up every point on its own
+        '''
+        x = self.x
+        y = self.y
+
+        speed_x = numpy.zeros(len(x))
+        speed_y = numpy.zeros(len(x))
+
+        # Every (target, cell) pair still to be looked at, starting from the root
+        pair_target = numpy.asarray(targets)
+        pair_cell = numpy.zeros(len(pair_target), dtype=numpy.int64)
+
+        for level in range(self.DEPTH + 1):
+            counts = self.counts[level][pair_cell]
+            total = self.masses[level][pair_cell]
+            center_x = self.center_x[level][pair_cell]
+            center_y = self.center_y[level][pair_cell]
+
+            dx = x[pair_target] - center_x
+            dy = y[pair_target] - center_y
+            size = self.size / (1 << level)
+
+            split = (counts > 1) & (size ** 2 > theta ** 2 * (dx ** 2 + dy ** 2))
+            if level == self.DEPTH:
+                # Points sharing the smallest cell are as close as we can tell apart
+                split[:] = False
+
+            done = ~split
+            target = pair_target[done]
+            total = total[done]
+            center_x = center_x[done]
+            center_y = center_y[done]
+
+            # A cell the target is in shouldn't pull the target on itself
+            inside = (self.codes[target] >> (2 * (self.DEPTH - level))) == self.keys[level][pair_cell[done]]
+            own = numpy.where(inside, self.mass[target], 0.0)
+            rest = total - own
+            has_rest = rest > 0
+            weight = numpy.where(has_rest, rest, 1.0)
+            center_x = (center_x * total - own * x[target]) / weight
+            center_y = (center_y * total - own * y[target]) / weight
+
+            pull_x, pull_y = pull(x[target] - center_x, y[target] - center_y, rest)
+            pull_x[~has_rest] = 0
+            pull_y[~has_rest] = 0
+            speed_x += numpy.bincount(target, pull_x, minlength=len(x))
+            speed_y += numpy.bincount(target, pull_y, minlength=len(x))
+
+            if not split.any():
+                break
+
+            # Look at the children of every cell that was too close
+            start, count = self.children(level, pair_cell[split])
+            pair_target = numpy.repeat(pair_target[split], count)
+            offsets = numpy.arange(len(pair_target)) - numpy.repeat(numpy.cumsum(count) - count, count)
+            pair_cell = numpy.repeat(start, count) + offsets
+
+        targets = numpy.asarray(targets)
+        return speed_x[targets], speed_y[targets]
+
+
+class BarnesHutSystem(GravitySystem):
+    '''
+    A GravitySystem where the bodies also pull on each other, not just the wells
+
+    Every mass goes into a QuadTree, so each body only sums up the far away
+    groups as one mass, taking O(n log n) instead of O(n^2)
+    The wells stay on their orbits, only the bodies get pushed around
+
+    bodies require mass to be defined as well
+    '''
+
+    # How small a group has to look, size over distance, to be summed up as one mass
+    # Lower is more accurate but slower
+    THETA = 0.5
+
+    def __init__(self, theta=None, integrator=None):
+        if theta is None:
+            theta = self.THETA
+        self.theta = theta
+
+        super(BarnesHutSystem, self).__init__(integrator)
+
+    def accelerations(self, x, y):
+        '''
+        Returns the change in speed every well and every other body causes,
+        with the bodies at the given positions (as arrays, one for each body)
+        '''
+        wells = self._wells
+        bodies = self._bodies
+        count = len(wells)
+
+        tree = QuadTree(
+            numpy.concatenate((numpy.fromiter((well.x for well in wells), float, count), x)),
+            numpy.concatenate((numpy.fromiter((well.y for well in wells), float, count), y)),
+            numpy.concatenate((self._well_mass, numpy.fromiter((body.mass for body in bodies), float, len(bodies)))),
+        )
+        return tree.accelerations(numpy.arange(count, count + len(bodies)), self.theta)
+
+    def _substeps(self, pull_x, pull_y, steps):
+        '''
+        HELPER: Every body takes as many substeps as the one needing the most,
+        since they all pull on each other
+        '''
+        counts = super(BarnesHutSystem, self)._substeps(pull_x, pull_y, steps)
+        return numpy.repeat(counts.max(), len(counts))
+
+
+class GravityFieldSystem(GravitySystem):
+    '''
+    A GravitySystem that samples the pull of every well onto a grid, once per
+    step, so each body only looks up the grid points around it however many
+    wells there are
+
+    The static wells are only sampled once, over the whole grid. The moving
+    ones are sampled every step, but only as far out as their pull is felt
+    Bodies outside of the grid get pulled by each well directly
+    '''
+
+    # Pixels between the grid points
+    CELL_SIZE = 16
+
+    # The change in speed per step too small to bother sampling, for the moving wells
+    MIN_PULL = 10 ** -6
+
+    def __init__(self, bounds, cell_size=None, integrator=None):
+        '''
+        bounds `Rect`
+            the area the grid covers
+        '''
+        if cell_size is None:
+            cell_size = self.CELL_SIZE
+        self.cell_size = cell_size
+        self.bounds = bounds
+
+        columns = int(ceil(bounds.width / float(cell_size))) + 1
+        rows = int(ceil(bounds.height / float(cell_size))) + 1
+        self._grid_x = bounds.left + numpy.arange(max(columns, 2), dtype=float) * cell_size
+        self._grid_y = bounds.top + numpy.arange(max(rows, 2), dtype=float) * cell_size
+
+        self._static = set()
+
+        # The (speed_x, speed_y) grids of the static wells, and of every well, None until sampled
+        self._static_field = None
+        self._field = None
+
+        super(GravityFieldSystem, self).__init__(integrator)
+
+    def add_well(self, well, static=False):
+        super(GravityFieldSystem, self).add_well(well)
+
+        if static:
+            self._static.add(well)
+        self._static_field = None
+        self._field = None
+
+    def remove_well(self, well):
+        super(GravityFieldSystem, self).remove_well(well)
+
+        self._static.discard(well)
+        self._static_field = None
+        self._field = None
+
+    def update(self, delta_time):
+        # The moving wells have moved since the last sample
+        self._field = None
+
+        super(GravityFieldSystem, self).update(delta_time)
+
+    def accelerations(self, x, y):
+        '''
+        Returns the change in speed every well causes, summed up for each of
+        the given positions (as arrays), interpolated between the grid points
+        '''
+        if self._field is None:
+            self._field = self._sample()
+        field_x, field_y = self._field
+
+        cell = float(self.cell_size)
+        columns = len(self._grid_x)
+        rows = len(self._grid_y)
+
+        column = (x - self._grid_x[0]) / cell
+        row = (y - self._grid_y[0]) / cell
+        inside = (column >= 0) & (column <= columns - 1) & (row >= 0) & (row <= rows - 1)
+
+        # The top left grid point of the cell each position is in, and how far across it
+        left = numpy.clip(numpy.floor(column).astype(int), 0, columns - 2)
+        top = numpy.clip(numpy.floor(row).astype(int), 0, rows - 2)
+        across = column - left
+        down = row - top
+
+        speeds = []
+        for field in (field_x, field_y):
+            speeds.append(
+                field[top, left] * (1 - across) * (1 - down)
+                + field[top, left + 1] * across * (1 - down)
+                + field[top + 1, left] * (1 - across) * down
+                + field[top + 1, left + 1] * across * down
+            )
+        speed_x, speed_y = speeds
+
+        outside = numpy.flatnonzero(~inside)
+        if len(outside):
+            speed_x[outside], speed_y[outside] = super(GravityFieldSystem, self).accelerations(x[outside], y[outside])
+
+        return speed_x, speed_y
+
+    def _sample(self):
+        '''
+        HELPER: Returns the (speed_x, speed_y) grids of every well's pull
+        '''
+        if self._static_field is None:
+            static = [well for well in self._wells if well in self._static]
+            self._static_field = self._splat(static, numpy.inf)
+        static_x, static_y = self._static_field
+
+        # GravityWell.horizon() of MIN_PULL, for every moving well at once
+        moving = [well for well in self._wells if well not in self._static]
+        mass = numpy.fromiter((well.mass for well in moving), float, len(moving))
+        reach = numpy.sqrt(mass / (self.MIN_PULL * Celestial.FPS * Celestial.MOVEMENT_CONST) * GravityWell.UGC)
+
+        moving_x, moving_y = self._splat(moving, reach)
+        return static_x + moving_x, static_y + moving_y
+
+    def _splat(self, wells, reach):
+        '''
+        HELPER: Returns the (speed_x, speed_y) grids of the given wells' pull,
+        on the grid points within reach (pixels, per well or for all) of each
+        '''
+        grid_x = self._grid_x
+        grid_y = self._grid_y
+        shape = (len(grid_y), len(grid_x))
+
+        count = len(wells)
+        well_x = numpy.fromiter((well.x for well in wells), float, count)
+        well_y = numpy.fromiter((well.y for well in wells), float, count)
+        mass = numpy.fromiter((well.mass for well in wells), float, count)
+
+        # The window of grid points around each well
+        left = numpy.searchsorted(grid_x, well_x - reach)
+        top = numpy.searchsorted(grid_y, well_y - reach)
+        width = numpy.searchsorted(grid_x, well_x + reach, side='right') - left
+        height = numpy.searchsorted(grid_y, well_y + reach, side='right') - top
+
+        # Wells too light to reach a single grid point drop out
+        size = width * height
+        kept = numpy.flatnonzero(size > 0)
+        if not len(kept):
+            return numpy.zeros(shape), numpy.zeros(shape)
+
+        # One entry per (well, grid point in its window) pair, walking each window row by row
+        well = numpy.repeat(kept, size[kept])
+        starts = numpy.cumsum(size[kept]) - size[kept]
+        inside = numpy.arange(len(well)) - numpy.repeat(starts, size[kept])
+        column = left[well] + inside % width[well]
+        row = top[well] + inside // width[well]
+
+        # Grid points right next to a well would spike, and spread the spike over the cells around them
+        pull_x, pull_y = pull(
+            grid_x[column] - well_x[well], grid_y[row] - well_y[well],
+            mass[well], closest=self.cell_size,
+        )
+
+        points = row * shape[1] + column
+        total = shape[0] * shape[1]
+        return (
+            numpy.bincount(points, pull_x, total).reshape(shape),
+            numpy.bincount(points, pull_y, total).reshape(shape),
+        )
@@ -0,0 +1,250 @@
+from celestials import Celestial
+from gravity import SEMI_IMPLICIT, VERLET, GravityFieldSystem, GravitySystem, QuadTree, integrate, pull, substeps
+from pygame import Rect
+from unittest import TestCase
+from well import GravityWell
+import numpy
+import unittest
+
+
+class QuadTreeTest(TestCase):
+
+    def setUp(self):
+        Celestial.set_fps(30)
+
+        random = numpy.random.RandomState(0)
+        self.x = random.uniform(0, 1000, 300)
+        self.y = random.uniform(0, 1000, 300)
+        self.mass = random.uniform(10 ** 27, 10 ** 30, 300)
+
+        self.tree = QuadTree(self.x, self.y, self.mass)
+
+    def direct(self, targets):
+        '''
+        Sums up the pull of every other point one by one
+        '''
+        dx = self.x[targets, numpy.newaxis] - self.x[numpy.newaxis, :]
+        dy = self.y[targets, numpy.newaxis] - self.y[numpy.newaxis, :]
+        speed_x, speed_y = pull(dx, dy, self.mass[numpy.newaxis, :])
+
+        # Nothing pulls on itself
+        rows = numpy.arange(len(targets))
+        speed_x[rows, targets] = 0
+        speed_y[rows, targets] = 0
+
+        return speed_x.sum(axis=1), speed_y.sum(axis=1)
+
+    def test_accelerations__exact(self):
+        '''
+        A theta of 0 never groups points together, so it matches summing them directly
+        '''
+        targets = numpy.arange(300)
+        speed_x, speed_y = self.tree.accelerations(targets, theta=0)
+        direct_x, direct_y = self.direct(targets)
+
+        numpy.testing.assert_allclose(speed_x, direct_x, rtol=1e-9, atol=1e-30)
+        numpy.testing.assert_allclose(speed_y, direct_y, rtol=1e-9, atol=1e-30)
+
+    def test_accelerations__approximate(self):
+        targets = numpy.arange(0, 300, 7)
+        speed_x, speed_y = self.tree.accelerations(targets, theta=0.5)
+        direct_x, direct_y = self.direct(targets)
+
+        error = numpy.hypot(speed_x - direct_x, speed_y - direct_y) / numpy.hypot(direct_x, direct_y)
+        self.assertLess(numpy.median(error), 0.05)
+
+
+class Well(GravityWell):
+
+    def __init__(self, x, y, mass):
+        self.x = x
+        self.y = y
+        self.mass = mass
+
+
+class GravityFieldSystemTest(TestCase):
+
+    def setUp(self):
+        Celestial.set_fps(30)
+
+        self.wells = [
+            (Well(300, 400, 10 ** 34), True),
+            (Well(700, 600, 10 ** 34), False),
+            (Well(500, 200, 10 ** 28), False),
+        ]
+
+        self.field = GravityFieldSystem(Rect(0, 0, 1000, 1000))
+        self.direct = GravitySystem()
+        for well, static in self.wells:
+            self.field.add_well(well, static=static)
+            self.direct.add_well(well)
+
+    def assertMatches(self, x, y):
+        speed_x, speed_y = self.field.accelerations(x, y)
+        direct_x, direct_y = self.direct.accelerations(x, y)
+
+        error = numpy.hypot(speed_x - direct_x, speed_y - direct_y) / numpy.hypot(direct_x, direct_y)
+        self.assertLess(numpy.median(error), 0.05)
+
+    def test_accelerations(self):
+        random = numpy.random.RandomState(0)
+        x = random.uniform(0, 1000, 300)
+        y = random.uniform(0, 1000, 300)
+
+        # Right next to a well the grid can't keep up
+        far = numpy.ones(300, dtype=bool)
+        for well, static in self.wells:
+            far &= numpy.hypot(x - well.x, y - well.y) > 50
+
+        self.assertMatches(x[far], y[far])
+
+    def test_accelerations__moving(self):
+        well = self.wells[1][0]
+        x = numpy.array([650.0, 760.0, 700.0])
+        y = numpy.array([600.0, 600.0, 520.0])
+        self.field.accelerations(x, y)
+
+        well.x -= 100
+        self.field.update(0)
+        self.assertMatches(x - 100, y)
+
+    def test_accelerations__outside(self):
+        x = numpy.array([-500.0, 1500.0])
+        y = numpy.array([500.0, 2000.0])
+        speed_x, speed_y = self.field.accelerations(x, y)
+        direct_x, direct_y = self.direct.accelerations(x, y)
+
+        numpy.testing.assert_allclose(speed_x, direct_x)
+        numpy.testing.assert_allclose(speed_y, direct_y)
+
+
+class PullTest(TestCase):
+
+    def setUp(self):
+        Celestial.set_fps(30)
+
+    def test_pull__towards_well(self):
+        # Speeds point up, the well is below and to the right
+        speed_x, speed_y = pull(numpy.array([-30.0]), numpy.array([-40.0]), 10 ** 34)
+
+        self.assertGreater(speed_x[0], 0)
+        self.assertLess(speed_y[0], 0)
+        self.assertAlmostEqual(speed_x[0] / speed_y[0], -30.0 / 40.0)
+
+
+class IntegrateTest(TestCase):
+
+    MASS = 10 ** 34
+
+    def setUp(self):
+        Celestial.set_fps(30)
+
+        # The pull one pixel away, a circular orbit radius away needs sqrt(strength / radius)
+        self.strength = numpy.hypot(*pull(1.0, 0.0, self.MASS))
+
+    def accelerations(self, x, y):
+        return pull(x, y, self.MASS)
+
+    def orbit(self, method, radius, steps, count):
+        '''
+        Returns the distances from the well after each step, starting on a circular orbit
+        '''
+        x = numpy.array([radius])
+        y = numpy.array([0.0])
+        speed_x = numpy.array([0.0])
+        speed_y = numpy.array([(self.strength / radius) ** 0.5])
+
+        distances = []
+        for _ in range(count):
+            pull_x, pull_y = self.accelerations(x, y)
+            x, y, speed_x, speed_y = integrate(
+                x, y, speed_x, speed_y, pull_x, pull_y,
+                steps, numpy.array([1]), self.accelerations, method,
+            )
+            distances.append(numpy.hypot(x, y)[0])
+
+        return numpy.array(distances)
+
+    def test_integrate__stable_orbit(self):
+        '''
+        Big steps still keep going around at roughly the same distance
+        '''
+        for method in (SEMI_IMPLICIT, VERLET):
+            # Around 42 steps an orbit, for 10 orbits
+            distances = self.orbit(method, 100.0, 10.0, 420)
+            self.assertLess(numpy.abs(distances / 100.0 - 1).max(), 0.1, method)
+
+    def test_integrate__verlet_closer(self):
+        semi_implicit = self.orbit(SEMI_IMPLICIT, 100.0, 10.0, 420)
+        verlet = self.orbit(VERLET, 100.0, 10.0, 420)
+
+        self.assertLess(numpy.abs(verlet - 100.0).max(), numpy.abs(semi_implicit - 100.0).max())
+
+    def test_integrate__substeps(self):
+        '''
+        Ten substeps of one step each end up just like ten steps
+        '''
+        x = numpy.array([20.0])
+        y = numpy.array([0.0])
+        speed_x = numpy.array([0.0])
+        speed_y = numpy.array([0.1])
+
+        stepped = (x, y, speed_x, speed_y)
+        for _ in range(10):
+            pull_x, pull_y = self.accelerations(stepped[0], stepped[1])
+            stepped = integrate(*stepped + (pull_x, pull_y, 1.0, numpy.array([1]), self.accelerations, VERLET))
+
+        pull_x, pull_y = self.accelerations(x, y)
+        substepped = integrate(x, y, speed_x, speed_y, pull_x, pull_y, 10.0, numpy.array([10]), self.accelerations, VERLET)
+
+        numpy.testing.assert_allclose(numpy.concatenate(substepped), numpy.concatenate(stepped))
+
+    def test_substeps(self):
+        x = numpy.array([10.0, 100.0, 1000.0])
+        pull_x, pull_y = self.accelerations(x, numpy.zeros(3))
+        counts = substeps(pull_x, pull_y, 10.0, self.strength, 0.05, 16)
+
+        # Closer in needs more
+        self.assertEqual(counts[2], 1)
+        self.assertGreater(counts[0], counts[1])
+        self.assertLessEqual(counts[0], 16)
+
+    def test_substeps__no_wells(self):
+        counts = substeps(numpy.zeros(2), numpy.zeros(2), 10.0, 0.0, 0.05, 16)
+        numpy.testing.assert_array_equal(counts, [1, 1])
+
+
+class Body(object):
+
+    def __init__(self, x, y, speed_x, speed_y):
+        self.motion = (x, y, speed_x, speed_y)
+
+    def get_motion(self):
+        return self.motion
+
+    def set_motion(self, *motion):
+        self.motion = motion
+
+
+class GravitySystemTest(TestCase):
+
+    def setUp(self):
+        Celestial.set_fps(30)
+
+    def test_update__integrator(self):
+        system = GravitySystem(integrator=VERLET)
+        system.add_well(Well(0, 0, 10 ** 34))
+        body = Body(20.0, 0.0, 0.0, 0.0)
+        system.add_body(body)
+
+        system.update(1000.0 / 30)
+
+        x, y, speed_x, speed_y = body.motion
+        # Falls straight in
+        self.assertLess(x, 20.0)
+        self.assertLess(speed_x, 0)
+        self.assertAlmostEqual(y, 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+from multiprocessing.pool import ThreadPool
+
+import pygame
+
+
+# How many images get decoded at once
+# pygame lets go of the GIL while decoding, so these really run side by side
+THREADS = 4
+
+_pool = None
+
+
+def _get_pool():
+    global _pool
+
+    if _pool is None:
+        _pool = ThreadPool(THREADS)
+    return _pool
+
+
+def convert(image):
+    '''
+    Converts the image to the display's pixel format, so blitting it later
+    doesn't have to. Images with per-pixel alpha keep it
+
+    Does nothing until there is a display to convert to
+    '''
+    if pygame.display.get_surface() is None:
+        return image
+
+    if image.get_flags() & pygame.SRCALPHA:
+        return image.convert_alpha()
+    return image.convert()
+
+
+class PendingImage(object):
+    '''
+    An image that is being decoded in the background
+    '''
+
+    def __init__(self, result):
+        self._result = result
+
+    def ready(self):
+        return self._result.ready()
+
+    def get(self):
+        '''
+        Waits for the image to finish decoding, returning it converted
+        '''
+        return convert(self._result.get())
+
+
+def load_async(path):
+    '''
+    Starts decoding the image in the background, returning a PendingImage
+    '''
+    return PendingImage(_get_pool().apply_async(pygame.image.load, (path,)))
+
+
+def load_images(paths):
+    '''
+    Decodes every image in the {key: path} dict in the background
+    This is a generator giving each (key, image) as soon as it is ready
+
+    Converting has to happen on the thread that owns the display,
+    so the images get converted as they are handed out
+    '''
+    for key, image in _get_pool().imap_unordered(_load_keyed, paths.items()):
+        yield key, convert(image)
+
+
+def _load_keyed(item):
+    '''
+    HELPER: Decodes the image of a (key, path) pair, keeping the key with it
+    '''
+    key, path = item
+    return key, pygame.image.load(path)
@@ -1,33 +1,435 @@
-from mediator import Mediator
+from abstract.mediator import Clock, Mediator, MediatorException
+from abstract.pause import BasePauseMediator
 from unittest import TestCase
 import mock
+import unittest
+
+
+class Recording(object):
+    '''
+    Mixin keeping track of which handlers got called, and running the
+    scripted actions instead of a real tick
+    '''
+
+    def __init__(self, name, calls, *args):
+        self.name = name
+        self.calls = calls
+
+        # One function per tick, each gets the mediator
+        self.script = []
+        self.value = None
+
+        super(Recording, self).__init__(*args)
+
+    def _tick(self, screen):
+        self.calls.append((self.name, 'tick'))
+        if self.script:
+            self.script.pop(0)(self)
+
+    def _preload(self, screen):
+        self.calls.append((self.name, 'preload'))
+
+    def _freeze(self):
+        self.calls.append((self.name, 'freeze'))
+
+    def _unfreeze(self):
+        self.calls.append((self.name, 'unfreeze'))
+
+    def _finish(self):
+        self.calls.append((self.name, 'finish'))
+        return self.value
+
+    def _on_return(self, value):
+        self.calls.append((self.name, 'return', value))
+
+
+class RecordingMediator(Recording, Mediator):
+    pass
+
+
+class RecordingPauseMediator(Recording, BasePauseMediator):
+    pass
 
 
 class MediatorTest(TestCase):
 
     def setUp(self):
-        self.mediator = Mediator()
+        class Loaded(Mediator):
+            _load_class = mock.MagicMock()
+            _unload_class = mock.MagicMock()
+        self.Loaded = Loaded
 
     def test_event__load(self):
         '''
         Check that the load event gets called
         '''
-        Mediator._load = mock.MagicMock()
-
-        Mediator.load()
+        list(self.Loaded.load_class())
 
-        Mediator._load.assert_called_once_with()
+        self.Loaded._load_class.assert_called_once_with()
+        self.assertTrue(self.Loaded.is_loaded)
 
     def test_event__unload(self):
-        Mediator._load = mock.MagicMock()
+        list(self.Loaded.load_class())
+        list(self.Loaded.unload_class())
+
+        self.Loaded._unload_class.assert_called_once_with()
+        self.assertFalse(self.Loaded.is_loaded)
+
+
+class TransitionTest(TestCase):
+    '''
+    A root mediator running a game, which can be paused
+    '''
+
+    def setUp(self):
+        self.calls = []
+
+        self.root = RecordingMediator('root', self.calls)
+        self.game = RecordingMediator('game', self.calls)
+        self.pause = RecordingPauseMediator('pause', self.calls, self.game)
+
+        self.root.script.append(lambda root: root.post(Mediator.PutEvent(self.game)))
+
+    def pause_game(self, game):
+        game.post(Mediator.SwapForEvent(self.pause, pop=False))
+
+    def resume(self, pause):
+        pause.post(BasePauseMediator.ResumeEvent())
+
+    def quit(self, mediator):
+        mediator.post(Mediator.PopEvent())
+
+    def run_ticks(self, count):
+        for _ in range(count):
+            self.root._run(None)
+
+    def test_put(self):
+        self.run_ticks(2)
+
+        self.assertIs(self.root._child, self.game)
+        self.assertIs(self.game._parent, self.root)
+        self.assertEqual(self.calls, [
+            ('root', 'preload'), ('root', 'unfreeze'), ('root', 'tick'),
+            ('game', 'preload'), ('game', 'unfreeze'), ('game', 'tick'),
+        ])
+
+    def test_put__not_a_mediator(self):
+        with self.assertRaises(MediatorException):
+            Mediator.PutEvent(object())
+
+    def test_post__after_tick(self):
+        '''
+        Posted events wait for the tick to be over
+        '''
+        def put(root):
+            root.post(Mediator.PutEvent(self.game))
+            self.assertIsNone(root._child)
+        self.root.script = [put]
+
+        self.run_ticks(1)
+
+        self.assertIs(self.root._child, self.game)
+
+    def test_post__not_an_event(self):
+        with self.assertRaises(MediatorException):
+            self.root.post(Mediator.PutEvent)
+
+    def test_pause_resume(self):
+        '''
+        The pause screen and the game only get frozen while the other one runs,
+        so pausing a second time doesn't load the pause screen again
+        '''
+        self.game.script = [self.pause_game, lambda game: None, self.pause_game]
+        self.pause.script = [self.resume]
+        self.run_ticks(6)
+        del self.calls[:3]
+
+        self.assertEqual(self.calls, [
+            ('game', 'preload'), ('game', 'unfreeze'), ('game', 'tick'),
+            ('game', 'freeze'),
+            ('pause', 'unfreeze'), ('pause', 'preload'), ('pause', 'tick'),
+            ('pause', 'freeze'),
+            ('game', 'unfreeze'), ('game', 'tick'), ('game', 'tick'),
+            ('game', 'freeze'),
+            ('pause', 'unfreeze'), ('pause', 'tick'),
+        ])
+        self.assertIs(self.root._child, self.pause)
+        self.assertTrue(self.game.is_alive)
+        self.assertTrue(self.pause.is_alive)
+
+    def test_quit(self):
+        '''
+        Popping the game hands what it finished with back to the root
+        '''
+        self.game.value = 'won'
+        self.game.script = [self.quit]
+        self.run_ticks(2)
+
+        self.assertFalse(self.game.is_alive)
+        self.assertIsNone(self.root._child)
+        self.assertEqual(self.calls[-2:], [('game', 'finish'), ('root', 'return', 'won')])
+
+    def test_quit__from_pause(self):
+        '''
+        Quitting from the pause screen finishes the paused game too,
+        returning what the game finished with
+        '''
+        self.game.value = 'quit'
+        self.game.script = [self.pause_game]
+        self.pause.script = [self.quit]
+        self.run_ticks(3)
+
+        self.assertFalse(self.pause.is_alive)
+        self.assertFalse(self.game.is_alive)
+        self.assertIsNone(self.root._child)
+        self.assertEqual(self.calls[-3:], [
+            ('pause', 'finish'), ('game', 'finish'), ('root', 'return', 'quit'),
+        ])
+
+    def test_quit__root(self):
+        '''
+        A root with nobody to pop it finishes itself, ending run()
+        '''
+        self.root.script = [self.quit]
+
+        self.root.run(None)
+
+        self.assertFalse(self.root.is_alive)
+        self.assertEqual(self.calls[-1], ('root', 'finish'))
+
+    def test_swap__without_parent(self):
+        self.root.script = [lambda root: root.post(Mediator.SwapForEvent(self.game))]
+
+        with self.assertRaises(MediatorException):
+            self.run_ticks(1)
+
+    def test_raise(self):
+        '''
+        Raising an event instead of posting it still gets it handled
+        '''
+        def put(root):
+            raise Mediator.PutEvent(self.game)
+        self.root.script = [put]
+
+        self.run_ticks(1)
+
+        self.assertIs(self.root._child, self.game)
+
+
+class Stepping(Mediator):
+    '''
+    Runs 50 steps a second, so 20ms each, keeping track of the updates and the alpha drawn
+    '''
+    STEP_RATE = 50
+
+    def __init__(self, clock=None):
+        self.updates = []
+        self.alphas = []
+        super(Stepping, self).__init__(clock)
+
+    def update(self, delta_time):
+        self.updates.append(delta_time)
 
-        Mediator.load()
+    def draw(self, screen, alpha=1.0):
+        self.alphas.append(alpha)
 
-        Mediator._load.assert_called_once_with()
 
+class StepTest(TestCase):
 
+    def setUp(self):
+        self.mediator = Stepping()
+
+    def test_step__whole_steps(self):
+        alpha = self.mediator._step(45)
+
+        self.assertEqual(self.mediator.updates, [20.0, 20.0])
+        self.assertAlmostEqual(alpha, 0.25)
+
+    def test_step__carries_leftover(self):
+        '''
+        Time that doesn't make up a whole step counts towards the next frame's steps
+        '''
+        self.assertAlmostEqual(self.mediator._step(15), 0.75)
+        self.assertEqual(self.mediator.updates, [])
+
+        self.assertAlmostEqual(self.mediator._step(10), 0.25)
+        self.assertEqual(self.mediator.updates, [20.0])
+
+    def test_step__max_steps(self):
+        '''
+        A slow frame only catches up MAX_STEPS steps, dropping the rest of the
+        whole steps but keeping the leftover
+        '''
+        alpha = self.mediator._step(20 * (Stepping.MAX_STEPS + 3) + 5)
+
+        self.assertEqual(self.mediator.updates, [20.0] * Stepping.MAX_STEPS)
+        self.assertAlmostEqual(alpha, 0.25)
+
+        self.mediator._step(10)
+        self.assertEqual(len(self.mediator.updates), Stepping.MAX_STEPS)
+
+    def test_step__variable(self):
+        '''
+        Without a step rate every frame is a single update with the frame's delta
+        '''
+        self.mediator.STEP_RATE = None
+
+        self.assertEqual(self.mediator._step(33), 1.0)
+        self.assertEqual(self.mediator._step(5), 1.0)
+        self.assertEqual(self.mediator.updates, [33, 5])
+
+    def test_unfreeze__drops_leftover(self):
+        '''
+        Time spent frozen doesn't count towards the next step
+        '''
+        self.mediator._step(15)
+        self.mediator.unfreeze()
+
+        self.assertAlmostEqual(self.mediator._step(10), 0.5)
+        self.assertEqual(self.mediator.updates, [])
+
+    def test_tick(self):
+        '''
+        Each frame steps through the clock's delta, then draws with what's left over
+        '''
+        clock = mock.Mock()
+        clock.delta.side_effect = [0, 30, 30]
+        self.mediator = Stepping(clock)
+        self.mediator.unfreeze()
+
+        for _ in range(3):
+            self.mediator._tick(None)
+
+        clock.reset.assert_called_once_with()
+        self.assertEqual(clock.fps_sleep.call_count, 3)
+        self.assertEqual(self.mediator.updates, [20.0, 20.0, 20.0])
+        self.assertEqual(len(self.mediator.alphas), 3)
+        for alpha, expected in zip(self.mediator.alphas, [0.0, 0.5, 0.0]):
+            self.assertAlmostEqual(alpha, expected)
+
+
+class FakeTime(object):
+    '''
+    Stands in for the clock's timer and sleep, each look at the timer takes a
+    little time so spinning gets somewhere
+    '''
+    LOOK = 0.0001
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def timer(self):
+        self.now += self.LOOK
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ClockTest(TestCase):
+
+    def setUp(self):
+        self.time = FakeTime()
+        patchers = [
+            mock.patch('abstract.mediator.timer', self.time.timer),
+            mock.patch('abstract.mediator.sleep', self.time.sleep),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        # 20ms a frame
+        self.clock = Clock(50)
+
+    def frame(self, seconds):
+        '''
+        Works through a frame that takes the given time, then waits for the next one
+        '''
+        self.time.now += seconds
+        self.clock.fps_sleep()
+        return self.time.now
+
+    def test_fps_sleep__spacing(self):
+        '''
+        Frames end on deadlines a period apart, sleeping most of the way
+        and spinning through the rest
+        '''
+        start = self.frame(0)
+
+        for number in range(1, 4):
+            self.assertAlmostEqual(self.frame(0.005) - start, 0.02 * number, places=3)
+
+        self.assertEqual(len(self.time.sleeps), 3)
+        for slept in self.time.sleeps:
+            self.assertAlmostEqual(slept, 0.015 - Clock.SPIN, places=3)
+
+    def test_fps_sleep__drift(self):
+        '''
+        A slightly late frame is made up for by the next one
+        '''
+        start = self.frame(0)
+
+        self.assertAlmostEqual(self.frame(0.025) - start, 0.025, places=3)
+        self.assertAlmostEqual(self.frame(0.005) - start, 0.04, places=3)
+
+    def test_fps_sleep__resync(self):
+        '''
+        A frame more than a period late starts the deadlines over from itself,
+        instead of rushing through the next few
+        '''
+        start = self.frame(0)
+
+        late = self.frame(0.05)
+        self.assertAlmostEqual(late - start, 0.05, places=3)
+        self.assertAlmostEqual(self.frame(0.005) - late, 0.02, places=3)
+
+    def test_fps_sleep__unpaced(self):
+        clock = Clock()
+        clock.fps_sleep()
+        clock.fps_sleep()
+
+        self.assertEqual(self.time.sleeps, [])
+
+    def test_get_average_fps(self):
+        self.assertEqual(self.clock.get_average_fps(), None)
+
+        self.clock.delta()
+        for seconds in [0.01] * 9 + [0.04]:
+            self.time.now += seconds
+            self.clock.delta()
+
+        fps, percentiles = self.clock.get_average_fps((50, 99))
+        self.assertAlmostEqual(fps, 1000 / 13.0, delta=1)
+        self.assertAlmostEqual(percentiles[50], 10, places=0)
+        self.assertAlmostEqual(percentiles[99], 40, places=0)
+        self.assertAlmostEqual(self.clock.get_average_fps(), fps)
+
+    def test_get_average_fps__window(self):
+        '''
+        Only the last few frames count
+        '''
+        self.clock.delta()
+        for seconds in [0.1] * 10 + [0.01] * Clock.WINDOW:
+            self.time.now += seconds
+            self.clock.delta()
+
+        self.assertAlmostEqual(self.clock.get_average_fps(), 100, delta=1)
+
+    def test_reset(self):
+        '''
+        The first delta after a reset starts the clock over, without counting as a frame
+        '''
+        self.clock.delta()
+        self.time.now += 0.01
+        self.clock.delta()
 
+        self.clock.reset()
+        self.time.now += 1
+        self.assertEqual(self.clock.delta(), 0)
+        self.assertEqual(len(self.clock._frame_times), 1)
 
 
 if __name__ == '__main__':
-    MediatorTest()
+    unittest.main()
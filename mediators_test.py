@@ -0,0 +1,117 @@
+from abstract.mediator import Mediator
+from background import StarfieldView
+from pygame import Rect
+from unittest import TestCase
+import mock
+import pygame
+import unittest
+
+
+BLUE = (0, 0, 255)
+RED = (255, 0, 0)
+
+
+class Box(object):
+    '''
+    A view drawing a red box wherever its rect is
+    '''
+
+    def __init__(self, rect):
+        self.rect = Rect(rect)
+
+    def update(self, delta_time):
+        pass
+
+    def draw(self, screen, alpha=1.0, offset=(0, 0)):
+        return screen.fill(RED, self.rect.move(offset))
+
+
+class Camera(object):
+    def __init__(self):
+        self.offset = (0, 0)
+
+    def sees(self, rect):
+        return True
+
+    def update_interval(self, rect):
+        return 1
+
+
+class DirtyRectsTest(TestCase):
+
+    def setUp(self):
+        from bench import init_headless
+        from menu.mediators import PygameMediatorMixin
+
+        class Screen(PygameMediatorMixin, Mediator):
+            DIRTY_RECTS = True
+
+        self.screen = init_headless((160, 120))
+
+        clock = mock.Mock()
+        clock.delta.return_value = 0
+        self.mediator = Screen(clock)
+
+        picture = pygame.Surface((160, 120))
+        picture.fill(BLUE)
+        self.mediator.background = StarfieldView((160, 120))
+        self.mediator.background.add_layer(picture)
+        self.box = Box((10, 10, 20, 20))
+        self.mediator.views = [self.mediator.background, self.box]
+
+        patcher = mock.patch('pygame.display.update')
+        self.update = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.mediator.unfreeze()
+        self.mediator._tick(self.screen)
+
+    def tick(self):
+        self.update.reset_mock()
+        self.mediator._tick(self.screen)
+
+    def test_tick__only_dirty_rects(self):
+        '''
+        Moving a view restores where it was from the background, and only
+        pushes that and where it is now to the display
+        '''
+        self.update.assert_called_once_with()
+
+        self.box.rect.x = 50
+        self.tick()
+
+        self.update.assert_called_once_with([Rect(10, 10, 20, 20), Rect(50, 10, 20, 20)])
+        self.assertEqual(tuple(self.screen.get_at((15, 15)))[:3], BLUE)
+        self.assertEqual(tuple(self.screen.get_at((55, 15)))[:3], RED)
+
+    def test_tick__unfreeze(self):
+        '''
+        Something else could have drawn over the screen while frozen
+        '''
+        self.mediator.freeze()
+        self.mediator.unfreeze()
+        self.tick()
+
+        self.update.assert_called_once_with()
+
+    def test_tick__camera_moved(self):
+        '''
+        Moving the camera shifts everything, so the whole screen gets redrawn
+        '''
+        self.mediator.camera = Camera()
+        self.tick()
+        self.update.assert_called_once_with([Rect(10, 10, 20, 20), Rect(10, 10, 20, 20)])
+
+        self.mediator.camera.offset = (-5, 0)
+        self.tick()
+        self.update.assert_called_once_with()
+        self.assertEqual(tuple(self.screen.get_at((7, 15)))[:3], RED)
+        self.assertEqual(tuple(self.screen.get_at((27, 15)))[:3], BLUE)
+
+        # Back to only the dirty rects once the camera stops
+        self.tick()
+        self.update.assert_called_once_with([Rect(5, 10, 20, 20), Rect(5, 10, 20, 20)])
+
+
+if __name__ == '__main__':
+    unittest.main()
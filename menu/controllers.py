@@ -10,6 +10,13 @@ const.MOUSEKEY_RIGHT = 3
 const.MOUSEKEY_SCROLLUP = 4
 const.MOUSEKEY_SCROLLDOWN = 5
 
+# Player command actions, see GameMediator.command
+(
+    ROTATE,
+    MOVE,
+    FIRE,
+) = range(3)
+
 
 # Start up our pause_handler
 pause_handler = EventManager()
@@ -26,7 +33,7 @@ game_handler = EventManager()
 @game_handler.shortcut(Mods.META, const.K_q)
 @game_handler.shortcut(Mods.ALT, const.K_q)
 def quit(context):
-    raise context.mediator.PopEvent()
+    context.mediator.post(context.mediator.PopEvent())
 
 @game_handler.keydown(const.K_SPACE)
 def pause(context):
@@ -34,7 +41,19 @@ def pause(context):
 
 @pause_handler.keydown(const.K_SPACE)
 def unpause(context):
-    raise context.mediator.ResumeEvent()
+    context.mediator.post(context.mediator.ResumeEvent())
+
+@game_handler.keydown(const.K_F3)
+def toggle_profiler(context):
+    context.mediator.toggle_profiler()
+
+@game_handler.keydown(const.K_F4)
+def toggle_trajectories(context):
+    context.mediator.toggle_trajectories()
+
+@game_handler.shortcut(Mods.CTRL, const.K_p)
+def dump_profile(context):
+    context.mediator.dump_profile()
 
 
 #################################################
@@ -46,56 +65,63 @@ def unpause(context):
 @game_handler.keydown(const.K_RIGHT, const={'player': 3})
 @game_handler.keydown(const.K_h, const={'player': 4})
 def rotate_right(context, player):
-    context.mediator.players[player].rotate(Ship.ROT_RIGHT)
+    context.mediator.command(player, ROTATE, Ship.ROT_RIGHT)
 
 @game_handler.keyup(const.K_d, const={'player': 1})
 @game_handler.keyup(const.K_l, const={'player': 2})
 @game_handler.keyup(const.K_RIGHT, const={'player': 3})
 @game_handler.keyup(const.K_h, const={'player': 4})
 def rotate_right_stop(context, player):
-    context.mediator.players[player].rotate(Ship.ROT_RIGHT, stop=True)
+    context.mediator.command(player, ROTATE, Ship.ROT_RIGHT, stop=True)
 
 @game_handler.keydown(const.K_a, const={'player': 1})
 @game_handler.keydown(const.K_j, const={'player': 2})
 @game_handler.keydown(const.K_LEFT, const={'player': 3})
 @game_handler.keydown(const.K_f, const={'player': 4})
 def rotate_left(context, player):
-    context.mediator.players[player].rotate(Ship.ROT_LEFT)
+    context.mediator.command(player, ROTATE, Ship.ROT_LEFT)
 
 @game_handler.keyup(const.K_a, const={'player': 1})
 @game_handler.keyup(const.K_j, const={'player': 2})
 @game_handler.keyup(const.K_LEFT, const={'player': 3})
 @game_handler.keyup(const.K_f, const={'player': 4})
 def rotate_left_stop(context, player):
-    context.mediator.players[player].rotate(Ship.ROT_LEFT, stop=True)
+    context.mediator.command(player, ROTATE, Ship.ROT_LEFT, stop=True)
 
 @game_handler.keydown(const.K_w, const={'player': 1})
 @game_handler.keydown(const.K_i, const={'player': 2})
 @game_handler.keydown(const.K_UP, const={'player': 3})
 @game_handler.keydown(const.K_t, const={'player': 4})
 def move_up(context, player):
-    context.mediator.players[player].move(Ship.MOV_FORWARDS)
+    context.mediator.command(player, MOVE, Ship.MOV_FORWARDS)
 
 @game_handler.keyup(const.K_w, const={'player': 1})
 @game_handler.keyup(const.K_i, const={'player': 2})
 @game_handler.keyup(const.K_UP, const={'player': 3})
 @game_handler.keyup(const.K_t, const={'player': 4})
 def move_up_stop(context, player):
-    context.mediator.players[player].move(Ship.MOV_FORWARDS, stop=True)
+    context.mediator.command(player, MOVE, Ship.MOV_FORWARDS, stop=True)
 
 @game_handler.keydown(const.K_s, const={'player': 1})
 @game_handler.keydown(const.K_k, const={'player': 2})
 @game_handler.keydown(const.K_DOWN, const={'player': 3})
 @game_handler.keydown(const.K_g, const={'player': 4})
 def move_down(context, player):
-    context.mediator.players[player].move(Ship.MOV_BACKWARDS)
+    context.mediator.command(player, MOVE, Ship.MOV_BACKWARDS)
 
 @game_handler.keyup(const.K_s, const={'player': 1})
 @game_handler.keyup(const.K_k, const={'player': 2})
 @game_handler.keyup(const.K_DOWN, const={'player': 3})
 @game_handler.keyup(const.K_g, const={'player': 4})
 def move_down_stop(context, player):
-    context.mediator.players[player].move(Ship.MOV_BACKWARDS, stop=True)
+    context.mediator.command(player, MOVE, Ship.MOV_BACKWARDS, stop=True)
+
+@game_handler.keydown(const.K_e, const={'player': 1})
+@game_handler.keydown(const.K_o, const={'player': 2})
+@game_handler.keydown(const.K_RSHIFT, const={'player': 3})
+@game_handler.keydown(const.K_y, const={'player': 4})
+def fire(context, player):
+    context.mediator.command(player, FIRE)
 
 
 
@@ -1,154 +1,583 @@
 from abstract import mediator
 from abstract import event_manager
+from abstract.profiler import FrameProfiler
+from menu.views import ProfilerOverlay
+from time import time
 
 from pygame import locals as const
 import pygame
 
-class PygameClock(object):
+
+WHITE = pygame.Color(255, 255, 255)
+
+class PygameMediatorMixin(object):
     '''
-    A clock using the pygame clock
+    A Mixin making the Mediator use pygame methods
     '''
 
-    def __init__(self, fps=None):
-        self.fps = fps
-        self._clock = pygame.time.Clock()
+    # Only restore and push the areas views drew to, instead of the whole screen
+    # This requires self.background to be set to a view with a restore method
+    DIRTY_RECTS = False
 
-        self.reset()
+    FRAME_RATE = 60
 
-    def delta(self):
-        '''
-        Returns the time in milliseconds since the last call of this method
-        '''
-        now = pygame.time.get_ticks()
+    # Views far away from the camera get updated less often, see Camera.update_interval
+    UPDATE_LOD = True
 
-        # If we have no time, then the first time we call delta is the starting time
-        # aka delta == 0 as no time passed
-        if self._time is None:
-            delta = 0
-        else:
-            delta = now - self._time
+    def __init__(self, *args, **kwargs):
+        self.background = None
+        self._full_redraw = True
+        self._restored = []
+        self._drawn = []
+        self._offset = (0, 0)
 
-        # Make sure to update the current time
-        self._time = now
+        # When set, views with a rect are placed in world coordinates
+        # and only drawn when the camera sees them
+        self.camera = None
+        self.update_lod = self.UPDATE_LOD
 
-        # TODO: update the FPS average
+        # How many updates ran, and the time each view skipped since its last update
+        self._updates = 0
+        self._skipped = {}
 
-        return delta
+        super(PygameMediatorMixin, self).__init__(*args, **kwargs)
 
-    def fps_sleep(self):
-        '''
-        Sleeps until the clock is running N Frames per Second
-        This just ensures you run no faster than the fps, though you can
-        run slower
-        '''
-        if self.fps is None:
-            return
-
-        self._clock.tick(self.fps)
+    def get_events(self):
+        return pygame.event.get()
 
-    def get_average_fps(self):
+    def draw(self, screen, alpha=1.0):
+        camera = self.camera
+        if camera is None:
+            offset = (0, 0)
+        else:
+            offset = camera.offset
+
+        # The background is handled by _clear_screen when using dirty rects
+        skip = self.background if self._uses_dirty_rects() else None
+
+        # Unless the camera moved, which shifts everything on the screen
+        if skip is not None and offset != self._offset:
+            skip = None
+            self._full_redraw = True
+        self._offset = offset
+
+        drawn = []
+        for view in self.views:
+            if view is skip:
+                continue
+
+            # Views without a rect are either on the screen itself or cull themselves
+            if camera is not None and hasattr(view, 'rect') and not camera.sees(view.rect):
+                continue
+
+            rect = self._measure(view, 'draw', view.draw, screen, alpha, offset)
+            if view is self.background:
+                # Only drawn here when the whole screen gets pushed anyway,
+                # it doesn't need restoring next frame
+                continue
+            if isinstance(rect, list):
+                drawn.extend(rect)
+            elif rect is not None:
+                drawn.append(rect)
+
+        self._drawn = drawn
+
+    def update(self, delta_time):
+        if self.camera is None or not self.update_lod:
+            return super(PygameMediatorMixin, self).update(delta_time)
+
+        for model in self.models:
+            self._measure(model, 'update', model.update, delta_time)
+
+        camera = self.camera
+        skipped = self._skipped
+        self._updates += 1
+
+        for index, view in enumerate(self.views):
+            interval = 1
+            if hasattr(view, 'rect'):
+                interval = camera.update_interval(view.rect)
+
+            # Spread the far views over different steps, so they don't all land on the same one
+            if interval > 1 and (self._updates + index) % interval:
+                skipped[view] = skipped.get(view, 0) + delta_time
+                continue
+
+            # Catch up on all the time skipped, in one go
+            self._measure(view, 'update', view.update, skipped.pop(view, 0) + delta_time)
+
+    def toggle_profiler(self):
         '''
-        Returns the current FPS average
+        Starts or stops timing every frame, showing the results on screen
         '''
-        # TODO
+        if self.profiler is None:
+            self.profiler = FrameProfiler()
+            self._profiler_view = ProfilerOverlay(self.profiler)
+            self.views.append(self._profiler_view)
+        else:
+            self.views.remove(self._profiler_view)
+            self.profiler = None
 
-    def reset(self):
+    def dump_profile(self):
         '''
-        Resets the clock, using the next delta() call to syncronize it
+        Saves the recorded frames as a Chrome trace, returning its filename
         '''
-        self._time = None
-
+        if self.profiler is None:
+            return None
 
-WHITE = pygame.Color(255, 255, 255)
+        filename = 'profile-%d.json' % time()
+        self.profiler.dump(filename)
+        return filename
 
-class PygameMediatorMixin(object):
-    '''
-    A Mixin making the Mediator use pygame methods
-    '''
+    def _uses_dirty_rects(self):
+        return self.DIRTY_RECTS and self.background is not None
 
-    def __init__(self, clock=None):
-        # Pygame uses the pygame clock
-        if clock is None:
-            clock = PygameClock()
+    def _clear_screen(self, screen):
+        if not self._uses_dirty_rects():
+            screen.fill(WHITE)
+        elif self._full_redraw:
+            self.background.draw(screen, 1.0, self._offset)
+        else:
+            # Only erase what got drawn last frame
+            for rect in self._drawn:
+                self.background.restore(screen, rect)
+            self._restored = self._drawn
 
-        super(PygameMediatorMixin, self).__init__(clock)
+    def _draw_screen(self, screen):
+        if not self._uses_dirty_rects() or self._full_redraw:
+            pygame.display.update()
+        else:
+            pygame.display.update(self._restored + self._drawn)
 
-    def get_events(self):
-        return pygame.event.get()
+        self._full_redraw = False
 
-    def _clear_screen(self, screen):
-        screen.fill(WHITE)
+    def _unfreeze(self):
+        # Something else had the screen, so nothing on it can be trusted
+        self._full_redraw = True
 
-    def _draw_screen(self, screen):
-        pygame.display.update()
+        super(PygameMediatorMixin, self)._unfreeze()
 
 
 from menu.controllers import game_handler, pause_handler
+from menu.controllers import ROTATE, MOVE, FIRE
 import background
+from ai import PilotSystem
 from celestials import Sun, Planet
+from camera import Camera
+from collision import CollisionSystem
+from gravity import GravitySystem, GravityFieldSystem, BarnesHutSystem, EULER
+from orbit import OrbitSystem
+from physics import PhysicsWorker
+from replay import Recorder
+from trajectory import TrajectoryOverlay, TrajectoryPredictor
 from ship import Ship
+from weapons import Ammo, ProjectilePool
+import weapons
 
 from abstract.view import ImageView
 from abstract import pause
 from math import pi
+import random
+
+# Collision groups
+(
+    SHIPS,
+    CELESTIALS,
+) = range(2)
 
 class MainMediator(mediator.Mediator):
 
+    # File each match gets recorded to, to play back with replay.py
+    # None doesn't record
+    RECORD = None
+
     def _preload(self, screen):
-        game = GameMediator()
+        # Picked here instead of left to the clock, so it can go into the recording
+        seed = random.randrange(2 ** 31)
+
+        recorder = None
+        if self.RECORD is not None:
+            recorder = Recorder(self.RECORD, seed)
+
+        game = GameMediator(seed=seed, recorder=recorder)
 
-        raise mediator.Mediator.PutEvent(game)
+        self.post(mediator.Mediator.PutEvent(game))
 
     def _on_return(self, value):
-        raise mediator.Mediator.PopEvent()
+        self.post(mediator.Mediator.PopEvent())
 
 
 class PauseMediator(PygameMediatorMixin, pause.BasePauseMediator):
+
+    def __init__(self, mediator, clock=None):
+        self._screenshot = None
+        self._stale_screenshot = True
+
+        super(PauseMediator, self).__init__(mediator, clock)
+
     def _preload(self, screen):
         yield 'Setting Screenshot'
-        screenshot = screen.copy()
-        yield
-        self._mediator.draw(screenshot)
+        # Filled in on the first tick, and again every time we get unfrozen
+        self._screenshot = screen.copy()
         yield
 
-        self.views.append(ImageView(screenshot))
+        self.views.append(ImageView(self._screenshot))
 
         self.controller = pause_handler
         self.controller.context.mediator = self
 
+    def _clear_screen(self, screen):
+        # The screen still shows the paused mediator's last frame, until we clear it
+        if self._stale_screenshot:
+            self._screenshot.blit(screen, (0, 0))
+            self._mediator.draw(self._screenshot)
+            self._stale_screenshot = False
+
+        super(PauseMediator, self)._clear_screen(screen)
+
+    def _unfreeze(self):
+        self._stale_screenshot = True
+
+        super(PauseMediator, self)._unfreeze()
+
 class GameMediator(PygameMediatorMixin, mediator.Mediator):
 
     FPS = 30
+    STEP_RATE = FPS
+
+    WEAPON = weapons.FIREBALL
+
+    # How much of a projectile's speed gets passed on to the ship it hits
+    IMPACT = 0.1
+
+    # Ships pull on each other too, instead of only being pulled by the celestials
+    MUTUAL_GRAVITY = False
+
+    # Look up the wells' pull from a grid sampled once per step, see GravityFieldSystem
+    # Ignored when the bodies pull on each other too
+    GRAVITY_FIELD = False
+
+    # How the gravity system moves the ships along, see gravity.INTEGRATORS
+    # The others stay stable at a lower STEP_RATE than Euler, taking substeps where the pull is strong
+    INTEGRATOR = EULER
+
+    # How many of the players, counting back from the last one, are flown by bots
+    BOTS = 0
+
+    # Simulate in a worker process, see PhysicsWorker
+    # Can't be used in a deterministic run, e.g. with a session or a recorder, which need the simulation in here
+    PHYSICS_WORKER = False
+
+    # The (width, height) of the sector, None fits it to the screen
+    WORLD_SIZE = None
+
+    # (parallax, stars per tile) of each layer of stars over the background, from back to front
+    STAR_LAYERS = (
+        (0.25, 24),
+        (0.5, 8),
+    )
+    STAR_TILE = (256, 256)
+
+    def __init__(self, clock=None, session=None, seed=None, recorder=None, deterministic=False):
+        '''
+        session `LockstepSession`
+            when given, commands are played in step with the other peers
+        seed `int`
+            seeds the random choices of the sector, so it comes out the same every time
+        recorder `Recorder`
+            when given, records every command applied along with its tick
+        deterministic `bool`
+            the simulation has to come out the same as every other run of the
+            same seed and commands, e.g. when replaying a recording
+            Always the case with a session or a recorder
+        '''
+        # Kept frozen between pauses instead of being rebuilt each time
+        self._pause = None
+
+        self.session = session
+        self.seed = seed
+        self.recorder = recorder
+        self.deterministic = deterministic or session is not None or recorder is not None
+
+        # How many steps have been simulated
+        self.tick = 0
+
+        self.worker = None
+        self.trajectories = None
+
+        super(GameMediator, self).__init__(clock)
 
     def pause(self):
-        pause = PauseMediator(self)
-        raise mediator.Mediator.SwapForEvent(pause, pop=False)
+        if self._pause is None or not self._pause.is_alive:
+            self._pause = PauseMediator(self)
+
+        self.post(mediator.Mediator.SwapForEvent(self._pause, pop=False))
+
+    def toggle_trajectories(self):
+        '''
+        Starts or stops showing where gravity will carry each ship
+        The worker's ships only come back with their poses, so there is nothing to predict from
+        '''
+        if self.worker is not None:
+            return
+
+        if self.trajectories is None:
+            ships = [self.players[number] for number in sorted(self.players)]
+            predictor = TrajectoryPredictor(ships, self.celestials, self.orbits, self.FPS, integrator=self.INTEGRATOR)
+            self.trajectories = TrajectoryOverlay(predictor)
+            self.views.append(self.trajectories)
+        else:
+            self.views.remove(self.trajectories)
+            self.trajectories = None
+
+    def fire(self, player):
+        self.players[player].fire(self.projectiles, self.WEAPON, player)
+
+    def command(self, player, action, direction=0, stop=False):
+        '''
+        Gives the player's ship a command, right away or on the tick the
+        session schedules it for
+        '''
+        command = (player, action, direction, stop)
+
+        if self.worker is not None:
+            self.worker.command(command)
+        elif self.session is None:
+            self.apply_command(command)
+        else:
+            self.session.queue(command)
+
+    def apply_command(self, command):
+        player, action, direction, stop = command
+
+        if self.recorder is not None:
+            self.recorder.record(self.tick, command)
+
+        if player not in self.players:
+            return
+
+        if action == ROTATE:
+            self.players[player].rotate(direction, stop=stop)
+        elif action == MOVE:
+            self.players[player].move(direction, stop=stop)
+        elif action == FIRE:
+            self.fire(player)
+
+    def update(self, delta_time):
+        if self.worker is not None:
+            # The worker keeps its own time
+            return
+
+        if self.session is None:
+            self.simulate(delta_time)
+        else:
+            self.session.step(self, delta_time)
+
+    def draw(self, screen, alpha=1.0):
+        if self.worker is not None:
+            alpha = self.worker.show()
+
+        self.camera.follow(self.players.values())
+
+        super(GameMediator, self).draw(screen, alpha)
+
+    def simulate(self, delta_time):
+        '''
+        Runs the models and views for one step
+        '''
+        super(GameMediator, self).update(delta_time)
+
+        if self.recorder is not None:
+            self.recorder.step(self.tick)
+        self.tick += 1
+
+    def get_state(self):
+        '''
+        Returns everything the simulation changes, for set_state to go back to
+        '''
+        return (
+            [self.players[number].get_state() for number in sorted(self.players)],
+            [celestial.get_state() for celestial in self.celestials],
+            self.orbits.time,
+            self.projectiles.get_state(),
+            self.pilots.get_state(),
+            self.tick,
+        )
+
+    def set_state(self, state):
+        players, celestials, self.orbits.time, projectiles, pilots, self.tick = state
+
+        if self.recorder is not None:
+            self.recorder.rewind(self.tick)
+
+        for number, player in zip(sorted(self.players), players):
+            self.players[number].set_state(player)
+        for celestial, saved in zip(self.celestials, celestials):
+            celestial.set_state(saved)
+        self.projectiles.set_state(projectiles)
+        self.pilots.set_state(pilots)
+
+    def _finish(self):
+        # Nothing can resume us anymore, so the pause screen goes too
+        if self._pause is not None and self._pause.is_alive:
+            self._pause.finish()
+
+        if self.recorder is not None:
+            self.recorder.close()
+
+        if self.worker is not None:
+            self.worker.stop()
+
+        super(GameMediator, self)._finish()
+
+    def _freeze(self):
+        if self.worker is not None:
+            self.worker.pause()
+
+        super(GameMediator, self)._freeze()
+
+    def _unfreeze(self):
+        super(GameMediator, self)._unfreeze()
+
+        if self.worker is not None:
+            self.worker.resume()
+
+    def _on_hit(self, target, kind, speed_x, speed_y):
+        '''
+        Knocks back any ship hit by a projectile, celestials just absorb them
+        '''
+        if isinstance(target, Ship):
+            target.push(speed_x * self.IMPACT, -speed_y * self.IMPACT)
 
     def _preload(self, screen):
         rect = screen.get_rect()
         resolution = (rect.width, rect.height)
 
+        # The sector can be bigger than the screen, the camera shows part of it
+        world = self.WORLD_SIZE or resolution
+        self.camera = Camera(resolution, world=pygame.Rect((0, 0), world))
+        if self.deterministic:
+            # Skipping updates depends on where the camera is, which other
+            # peers and replays can't know
+            self.update_lod = False
+        if self.PHYSICS_WORKER:
+            if self.deterministic:
+                raise mediator.MediatorException('The physics worker runs on its own time')
+            # Nor can the worker, it only has the camera as it was when it started
+            self.update_lod = False
+
         yield 'Loading Events'
         self.controller = game_handler
         self.controller.context.mediator = self
 
+        # The background decodes while the sprites load
         yield 'Loading Background'
-        self.bg = ImageView(
-            background.load(options=background.STRETCH, resolution=resolution)
-        )
-        self.views.append(self.bg)
+        pending_bg = background.load_async()
 
         yield 'Loading Planets'
         for msg in Planet.load():
             yield msg
 
         yield 'Loading Stars'
+        for msg in Sun.load():
+            yield msg
+
         Sun.set_fps(GameMediator.FPS)
 
         yield 'Loading Sector'
+        if self.seed is not None:
+            random.seed(self.seed)
         self.celestials = []
+        for msg in self._load_sector(world):
+            yield msg
+
+        yield 'Building Ships'
+        for msg in Ship.load(warmup=Ship.BASES):
+            yield msg
+
+        Ship.set_fps(GameMediator.FPS)
+        # The other integrators move the ships themselves
+        Ship.DRIFT = self.INTEGRATOR == EULER
+
+        yield 'Loading Ammo'
+        for msg in Ammo.load():
+            yield msg
+
+        yield 'Preparing Background'
+        self.bg = background.StarfieldView(resolution)
+        # The picture is far enough away to stay still, the stars drift past in front of it
+        self.bg.add_layer(
+            background.prepare(pending_bg.get(), options=background.STRETCH, resolution=resolution),
+            parallax=0,
+        )
+        for seed, (parallax, count) in enumerate(self.STAR_LAYERS):
+            self.bg.add_layer(background.stars(self.STAR_TILE, count, seed=seed), parallax=parallax)
+        # Always drawn first, under everything else
+        self.views.insert(0, self.bg)
+        self.background = self.bg
 
-        sun = Sun(resolution[0] / 2, resolution[1] / 2, 50)
+        yield 'Spawning Players'
+        self.players = {}
+        for msg in self._spawn_players(world):
+            yield msg
+
+        yield 'Setting Orbits'
+        # Placed before gravity pulls on anything, so the wells are where they'll be drawn
+        self.orbits = OrbitSystem(GameMediator.FPS)
+        for celestial in self.celestials:
+            if isinstance(celestial, Planet):
+                self.orbits.add(celestial)
+        self.models.append(self.orbits)
+
+        yield 'Applying Gravity'
+        if self.MUTUAL_GRAVITY:
+            self.gravity = BarnesHutSystem(integrator=self.INTEGRATOR)
+        elif self.GRAVITY_FIELD:
+            self.gravity = GravityFieldSystem(self.camera.world, integrator=self.INTEGRATOR)
+        else:
+            self.gravity = GravitySystem(integrator=self.INTEGRATOR)
+        for celestial in self.celestials:
+            self.gravity.add_well(celestial, static=isinstance(celestial, Sun))
+        for player in self.players.values():
+            self.gravity.add_body(player)
+        self.models.append(self.gravity)
+
+        yield 'Applying Collisions'
+        self.collisions = CollisionSystem()
+        self.collisions.on_collision(SHIPS, CELESTIALS)(Ship.bounce_off)
+        self.collisions.on_collision(SHIPS, SHIPS)(Ship.bounce)
+        for celestial in self.celestials:
+            self.collisions.add(celestial, CELESTIALS, static=isinstance(celestial, Sun))
+        for player in self.players.values():
+            self.collisions.add(player, SHIPS)
+        self.models.append(self.collisions)
+
+        yield 'Arming Ships'
+        self.projectiles = ProjectilePool(GameMediator.FPS, bounds=self.camera.world, on_hit=self._on_hit)
+        for number, player in self.players.iteritems():
+            self.projectiles.add_target(player, number)
+        for celestial in self.celestials:
+            self.projectiles.add_target(celestial)
+        self.views.append(self.projectiles)
+
+        yield 'Seating Pilots'
+        self.pilots = PilotSystem(self)
+        for number in sorted(self.players)[len(self.players) - self.BOTS:] if self.BOTS else ():
+            self.pilots.add(number)
+        self.models.append(self.pilots)
+
+        if self.PHYSICS_WORKER:
+            yield 'Starting Physics'
+            # Forked with everything loaded, so it has its own copy of the sector
+            self.worker = PhysicsWorker(self, self.STEP_RATE)
+            self.worker.start()
+
+    def _load_sector(self, world):
+        '''
+        Creates the celestials for this sector, world is its (width, height)
+        This method should be a generator that provides loading progress
+        '''
+        sun = Sun(world[0] / 2, world[1] / 2, 50)
         self.celestials.append(sun)
         self.views.append(sun)
         yield
@@ -171,15 +600,11 @@ class GameMediator(PygameMediatorMixin, mediator.Mediator):
         self.views.append(planet)
         yield
 
-        yield 'Building Ships'
-        for msg in Ship.load():
-            yield msg
-
-        Ship.set_fps(GameMediator.FPS)
-
-        yield 'Spawning Players'
-        self.players = {}
-
+    def _spawn_players(self, world):
+        '''
+        Creates the ships for this sector, world is its (width, height)
+        This method should be a generator that provides loading progress
+        '''
         player1 = Ship(50, 50, base='purple')
         player1.set_MoveSpeed(10)
         player1.set_TurnSpeed(pi)
@@ -211,13 +636,3 @@ class GameMediator(PygameMediatorMixin, mediator.Mediator):
         self.views.append(player4)
         self.players[4] = player4
         yield
-
-        yield 'Applying Gravity'
-        for celestial in self.celestials:
-            celestial.pull_on(player1)
-            celestial.pull_on(player2)
-            celestial.pull_on(player3)
-            celestial.pull_on(player4)
-
-
-
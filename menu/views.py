@@ -0,0 +1,49 @@
+from abstract.view import View
+
+import pygame
+
+
+class ProfilerOverlay(View):
+    '''
+    Shows how long the last frame took, phase by phase,
+    along with the slowest models and views
+    '''
+
+    COLOUR = pygame.Color(0, 255, 0)
+    PHASES = ('events', 'clear', 'update', 'draw', 'display', 'sleep')
+    SLOWEST = 5
+
+    def __init__(self, profiler, position=(5, 5)):
+        self.profiler = profiler
+        self.position = position
+
+        self._font = pygame.font.Font(None, 18)
+
+    def draw(self, screen, alpha=1.0, offset=(0, 0)):
+        phases = self.profiler.totals('phase')
+        if not phases:
+            return []
+
+        lines = ['frame %6.2fms' % (sum(phases.values()) * 1000)]
+        for phase in self.PHASES:
+            if phase in phases:
+                lines.append('  %-8s %6.2fms' % (phase, phases[phase] * 1000))
+
+        # The slowest models and views, across updates and draws
+        slowest = []
+        for category in ('update', 'draw'):
+            for name, duration in self.profiler.totals(category).iteritems():
+                slowest.append((duration, '%s.%s' % (name, category)))
+        slowest.sort(reverse=True)
+
+        for duration, name in slowest[:self.SLOWEST]:
+            lines.append('  %-16s %6.2fms' % (name, duration * 1000))
+
+        x, y = self.position
+        drawn = []
+        for line in lines:
+            text = self._font.render(line, True, self.COLOUR)
+            drawn.append(screen.blit(text, (x, y)))
+            y += text.get_height()
+
+        return drawn
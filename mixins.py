@@ -1,4 +1,4 @@
-import pygame.image
+import atlas
 import os.path
 
 
@@ -8,6 +8,8 @@ class ImageBatch(object):
     '''
 
     IMAGES = {}
+    PATHS = {}
+    IMAGE_EXTENSIONS = ('.png',)
 
     @classmethod
     def load(cls):
@@ -15,11 +17,14 @@ class ImageBatch(object):
 
         yield 'Generating ImageBatch for %s' % cls.__name__
 
-        cls.IMAGES = {}
+        cls.PATHS = paths = {}
 
         for key in os.listdir(cls.IMAGE_PATH):
-            if key.endswith('.png'):
-                yield '    %s' % key
-                cls.IMAGES[os.path.splitext(key)[0]] = pygame.image.load(
-                    os.path.join(cls.IMAGE_PATH, key)
-                )
+            name, extension = os.path.splitext(key)
+            if extension in cls.IMAGE_EXTENSIONS:
+                paths[name] = os.path.join(cls.IMAGE_PATH, key)
+
+        # Every image is a part of one atlas, which is a single read once it's been packed
+        cls.IMAGES = atlas.load_images(paths)
+        for name in sorted(cls.IMAGES):
+            yield '    %s' % os.path.basename(paths[name])
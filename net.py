@@ -0,0 +1,306 @@
+'''
+Lockstep multiplayer over UDP
+
+Every peer runs the whole simulation, only the commands given each tick are
+sent around. A command given during tick T is applied on every peer at tick
+T + input_delay, which hides the time the packet takes to arrive
+
+Without rollback a peer waits until it has every peer's commands for a tick
+before running it. With rollback it guesses nobody else did anything, runs
+ahead, and rewinds to re-run the ticks it guessed wrong once the commands arrive
+'''
+from collections import defaultdict
+
+import errno
+import socket
+import struct
+
+
+# peer, ack, first tick, tick count
+HEADER = struct.Struct('!BiiB')
+# command count, for each tick
+TICK = struct.Struct('!B')
+# player, action, direction, stop
+COMMAND = struct.Struct('!BBbB')
+
+
+class NetException(Exception):
+    '''
+    Raised when a packet can't be understood
+    '''
+
+
+def pack(peer, ack, first, ticks):
+    '''
+    Packs the commands for the ticks starting at first into one packet
+    ticks is a list of command lists, one for each tick
+    '''
+    parts = [HEADER.pack(peer, ack, first, len(ticks))]
+    for commands in ticks:
+        parts.append(TICK.pack(len(commands)))
+        for player, action, direction, stop in commands:
+            parts.append(COMMAND.pack(player, action, direction, stop))
+
+    return ''.join(parts)
+
+
+def unpack(packet):
+    '''
+    Returns the (peer, ack, first, ticks) packed into the packet
+    '''
+    try:
+        peer, ack, first, count = HEADER.unpack_from(packet)
+        offset = HEADER.size
+
+        ticks = []
+        for _ in range(count):
+            (length,) = TICK.unpack_from(packet, offset)
+            offset += TICK.size
+
+            commands = []
+            for _ in range(length):
+                player, action, direction, stop = COMMAND.unpack_from(packet, offset)
+                commands.append((player, action, direction, bool(stop)))
+                offset += COMMAND.size
+            ticks.append(commands)
+    except struct.error as e:
+        raise NetException('Malformed packet: %s' % e)
+
+    return (peer, ack, first, ticks)
+
+
+class LockstepSession(object):
+    '''
+    Keeps the peers' simulations in step, sending this peer's commands to the
+    others and applying everyone's commands on the tick they were meant for
+
+    The mediator needs simulate(delta_time), apply_command(command) and, for
+    rollback, get_state() and set_state(state) defined
+    '''
+
+    # The most ticks sent in one packet, older unacknowledged ticks wait for the next one
+    MAX_TICKS = 32
+
+    # The most ticks rollback can run ahead of the commands it has
+    MAX_ROLLBACK = 8
+
+    def __init__(self, peer, addresses, players, input_delay=3, rollback=False):
+        '''
+        peer `int`
+            the index of this peer's address
+        addresses `list`
+            the (host, port) of every peer, the same list on each of them
+        players `list`
+            the players this peer controls, other commands are ignored
+        input_delay `int`
+            how many ticks a command waits before it is applied
+        '''
+        self.peer = peer
+        self.addresses = list(addresses)
+        self.players = set(players)
+        self.input_delay = input_delay
+        self.rollback = rollback
+
+        # The next tick to simulate
+        self.tick = 0
+
+        # tick: {peer: [commands]}
+        self._inputs = defaultdict(dict)
+
+        # The last tick each peer's commands are known up to
+        self._received = [input_delay - 1] * len(self.addresses)
+        # The last tick each peer has our commands up to
+        self._acked = [input_delay - 1] * len(self.addresses)
+
+        # Commands given since the last tick was simulated
+        self._pending = []
+
+        # tick: the state from right before it was simulated
+        self._snapshots = {}
+        # The earliest tick that was run with a wrong guess
+        self._rewind = None
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(self.addresses[peer])
+        self.socket.setblocking(False)
+
+    def close(self):
+        self.socket.close()
+
+    def queue(self, command):
+        '''
+        Schedules a (player, action, direction, stop) command of a local player
+        '''
+        if command[0] in self.players:
+            self._pending.append(command)
+
+    def confirmed(self):
+        '''
+        Returns the last tick every peer's commands are known up to
+        '''
+        return min(self._received)
+
+    def ready(self):
+        '''
+        Whether the next tick can be simulated yet
+        '''
+        behind = self.tick - self.confirmed()
+        if self.rollback:
+            return behind <= self.MAX_ROLLBACK
+        return behind <= 0
+
+    def step(self, mediator, delta_time):
+        '''
+        Simulates the next tick if it can, returning whether it did
+        The commands are sent out either way, so a stalled peer still gets heard
+        '''
+        self.poll()
+
+        if self._rewind is not None:
+            self._resimulate(mediator, delta_time)
+
+        ran = self.ready()
+        if ran:
+            # Our commands now belong to the tick that is input_delay away
+            self._inputs[self.tick + self.input_delay][self.peer] = self._pending
+            self._pending = []
+            self._received[self.peer] = self.tick + self.input_delay
+
+            if self.rollback:
+                self._snapshots[self.tick] = mediator.get_state()
+            self._simulate(mediator, self.tick, delta_time)
+            self.tick += 1
+
+            self._forget()
+
+        self.send()
+        return ran
+
+    def settle(self, mediator, delta_time):
+        '''
+        Re-runs the ticks late commands arrived for, without simulating any new
+        ones, returning whether every tick simulated so far had everyone's commands
+        '''
+        self.poll()
+
+        if self._rewind is not None:
+            self._resimulate(mediator, delta_time)
+
+        self.send()
+        return self.confirmed() >= self.tick - 1
+
+    def send(self):
+        '''
+        Sends every peer the commands they haven't acknowledged yet
+        '''
+        last = self._received[self.peer]
+
+        for peer, address in enumerate(self.addresses):
+            if peer == self.peer:
+                continue
+
+            first = self._acked[peer] + 1
+            if first > last:
+                # Still tell them what we have, so their acks keep coming
+                first = last + 1
+            stop = min(last, first + self.MAX_TICKS - 1)
+
+            ticks = [
+                self._inputs[tick].get(self.peer, [])
+                for tick in range(first, stop + 1)
+            ]
+            packet = pack(self.peer, self._received[peer], first, ticks)
+
+            try:
+                self.socket.sendto(packet, address)
+            except socket.error as e:
+                # The peer isn't up yet, the next packet will cover this one
+                if e.errno not in (errno.ECONNREFUSED, errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
+
+    def poll(self):
+        '''
+        Reads every packet that arrived since the last poll
+        '''
+        while True:
+            try:
+                packet, address = self.socket.recvfrom(65536)
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                if e.errno == errno.ECONNREFUSED:
+                    continue
+                raise
+
+            try:
+                self._receive(*unpack(packet))
+            except NetException:
+                continue
+
+    def _receive(self, peer, ack, first, ticks):
+        '''
+        HELPER: Stores the commands a peer sent
+        '''
+        if peer == self.peer or peer >= len(self.addresses):
+            return
+
+        self._acked[peer] = max(self._acked[peer], ack)
+
+        # Ticks are only ever sent in order, so a gap means a packet went missing
+        if first > self._received[peer] + 1:
+            return
+
+        for offset, commands in enumerate(ticks):
+            tick = first + offset
+            if tick <= self._received[peer]:
+                continue
+
+            self._inputs[tick][peer] = commands
+
+            # We ran this tick guessing they did nothing, and they didn't
+            if tick < self.tick and commands:
+                if self._rewind is None or tick < self._rewind:
+                    self._rewind = tick
+
+        self._received[peer] = max(self._received[peer], first + len(ticks) - 1)
+
+    def _resimulate(self, mediator, delta_time):
+        '''
+        HELPER: Goes back to the first tick that was guessed wrong, running
+        every tick since then again
+        '''
+        start = self._rewind
+        self._rewind = None
+
+        mediator.set_state(self._snapshots[start])
+        for tick in range(start, self.tick):
+            self._snapshots[tick] = mediator.get_state()
+            self._simulate(mediator, tick, delta_time)
+
+    def _simulate(self, mediator, tick, delta_time):
+        '''
+        HELPER: Applies everyone's commands for the tick, in peer order, then runs it
+        '''
+        inputs = self._inputs.get(tick, {})
+        for peer in sorted(inputs):
+            for command in inputs[peer]:
+                mediator.apply_command(command)
+
+        mediator.simulate(delta_time)
+
+    def _forget(self):
+        '''
+        HELPER: Drops the commands and snapshots nobody can need anymore
+        '''
+        confirmed = self.confirmed()
+
+        # Nobody acks our own commands back to us, only the other peers count
+        acked = [tick for peer, tick in enumerate(self._acked) if peer != self.peer]
+        oldest = min(acked + [confirmed, self.tick - 1])
+
+        for tick in [tick for tick in self._inputs if tick < oldest]:
+            del self._inputs[tick]
+
+        # Ticks up to confirmed are known, so they never get rewound to
+        for tick in [tick for tick in self._snapshots if tick <= confirmed]:
+            del self._snapshots[tick]
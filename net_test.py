@@ -0,0 +1,125 @@
+from net import LockstepSession, NetException, pack, unpack
+from unittest import TestCase
+import unittest
+
+
+class Counter(object):
+    '''
+    A mediator whose whole state is the commands it was given
+    '''
+    def __init__(self):
+        self.applied = []
+        self.steps = 0
+
+    def apply_command(self, command):
+        self.applied.append((self.steps, command))
+
+    def simulate(self, delta_time):
+        self.steps += 1
+
+    def get_state(self):
+        return (list(self.applied), self.steps)
+
+    def set_state(self, state):
+        self.applied, self.steps = list(state[0]), state[1]
+
+
+class PacketTest(TestCase):
+
+    def test_round_trip(self):
+        ticks = [[], [(1, 0, -1, True), (1, 2, 0, False)]]
+
+        self.assertEqual(unpack(pack(3, -1, 7, ticks)), (3, -1, 7, ticks))
+
+    def test_unpack__truncated(self):
+        packet = pack(0, 0, 0, [[(1, 0, 1, False)]])
+
+        with self.assertRaises(NetException):
+            unpack(packet[:-1])
+
+
+class LockstepSessionTest(TestCase):
+    ADDRESSES = [('127.0.0.1', 9300), ('127.0.0.1', 9301)]
+
+    def setUp(self):
+        self.sessions = [
+            LockstepSession(peer, self.ADDRESSES, players=[peer + 1], input_delay=2)
+            for peer in range(2)
+        ]
+        self.mediators = [Counter(), Counter()]
+
+    def tearDown(self):
+        for session in self.sessions:
+            session.close()
+
+    def step_all(self):
+        for session, mediator in zip(self.sessions, self.mediators):
+            session.step(mediator, 1)
+
+    def test_step__applies_on_the_same_tick(self):
+        '''
+        Both peers apply a command on the tick input_delay after it was given
+        '''
+        self.sessions[0].queue((1, 0, 1, False))
+        # Commands for players the peer doesn't control are dropped
+        self.sessions[0].queue((2, 0, 1, False))
+
+        for _ in range(20):
+            self.step_all()
+
+        self.assertEqual(self.mediators[0].applied, [(2, (1, 0, 1, False))])
+        self.assertEqual(self.mediators[1].applied, self.mediators[0].applied)
+
+    def test_step__waits_for_peers(self):
+        '''
+        Without rollback a peer can't run past the ticks it has everyone's commands for
+        '''
+        for _ in range(10):
+            self.sessions[0].step(self.mediators[0], 1)
+
+        self.assertEqual(self.sessions[0].tick, 2)
+
+    def test_step__forgets_old_commands(self):
+        '''
+        Commands everyone has are dropped, so a long match doesn't keep them all
+        '''
+        for tick in range(500):
+            if tick % 3 == 0:
+                self.sessions[0].queue((1, 0, 1, tick % 2 == 0))
+                self.sessions[1].queue((2, 0, 1, tick % 2 == 0))
+            self.step_all()
+
+        for session in self.sessions:
+            self.assertGreater(session.tick, 400)
+            self.assertLessEqual(len(session._inputs), session.input_delay + 2)
+            self.assertLessEqual(len(session._snapshots), session.input_delay + 2)
+
+    def test_settle__rewinds_late_commands(self):
+        '''
+        A peer that ran ahead of a command re-runs the tick it was meant for
+        before settling, ending up just like the peer that gave it
+        '''
+        for session in self.sessions:
+            session.rollback = True
+
+        self.sessions[1].queue((2, 0, 1, False))
+        for _ in range(6):
+            self.sessions[0].step(self.mediators[0], 1)
+        for _ in range(6):
+            self.sessions[1].step(self.mediators[1], 1)
+
+        for _ in range(100):
+            settled = [
+                session.settle(mediator, 1)
+                for session, mediator in zip(self.sessions, self.mediators)
+            ]
+            if all(settled):
+                break
+
+        self.assertEqual(settled, [True, True])
+        self.assertEqual(self.mediators[0].applied, [(2, (2, 0, 1, False))])
+        self.assertEqual(self.mediators[0].get_state(), self.mediators[1].get_state())
+
+
+if __name__ == '__main__':
+    unittest.main()
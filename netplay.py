@@ -0,0 +1,177 @@
+'''
+Plays a lockstep match with other peers, each one controlling a player
+
+Every peer is given the same list of addresses and seed, along with its
+own index into that list. To try it out on one machine:
+
+    python netplay.py --peer 0 127.0.0.1:9000 127.0.0.1:9001
+    python netplay.py --peer 1 127.0.0.1:9000 127.0.0.1:9001
+
+--headless runs without a window, pressing random keys for its player and
+printing a checksum of the final state, which should match on every peer
+'''
+from argparse import ArgumentParser
+from random import Random
+
+import hashlib
+import json
+import pygame
+import sys
+import time
+
+from menu.controllers import ROTATE, MOVE, FIRE
+from menu.mediators import GameMediator
+from net import LockstepSession
+from replay import Recorder
+from ship import Ship
+
+
+# How long (in seconds) a headless match waits for the other peers' last commands
+SETTLE_TIMEOUT = 5
+
+
+def parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return (host, int(port))
+
+
+def checksum(mediator):
+    '''
+    Returns a hash of the mediator's state, to compare with the other peers
+    '''
+    players, celestials, time, projectiles, (steps, cooldown), tick = mediator.get_state()
+    alive = projectiles[7]
+
+    summary = repr((
+        players,
+        celestials,
+        time,
+        [array[alive].tolist() for array in projectiles[:7]],
+        steps,
+        cooldown.tolist(),
+    ))
+    return hashlib.md5(summary).hexdigest()
+
+
+def play_randomly(mediator, player, rand):
+    '''
+    Presses or lets go of a random key for the player
+    '''
+    action = rand.choice((ROTATE, MOVE, FIRE))
+
+    if action == ROTATE:
+        direction = rand.choice((Ship.ROT_LEFT, Ship.ROT_RIGHT))
+    elif action == MOVE:
+        direction = rand.choice((Ship.MOV_FORWARDS, Ship.MOV_BACKWARDS))
+    else:
+        direction = 0
+
+    mediator.command(player, action, direction, stop=rand.random() < 0.5)
+
+
+def run_headless(mediator, ticks, seed):
+    '''
+    Runs the match for the given number of ticks as fast as the peers allow,
+    returning the report
+    '''
+    from bench import init_headless
+
+    screen = init_headless((640, 480))
+    for msg in mediator.preload(screen):
+        pass
+    mediator.unfreeze()
+
+    session = mediator.session
+    rand = Random(seed + session.peer)
+    step = 1000.0 / mediator.STEP_RATE
+
+    stalls = 0
+    start = time.time()
+    while session.tick < ticks:
+        pygame.event.pump()
+
+        if rand.random() < 0.2:
+            for player in session.players:
+                play_randomly(mediator, player, rand)
+
+        if not session.ready():
+            stalls += 1
+            time.sleep(0.001)
+        mediator.update(step)
+
+    # The last ticks might have run on guesses, so re-run any that were
+    # wrong before taking the checksum
+    settled = False
+    deadline = time.time() + SETTLE_TIMEOUT
+    while not settled and time.time() < deadline:
+        settled = session.settle(mediator, step)
+        if not settled:
+            time.sleep(0.001)
+    report = {
+        'peer': session.peer,
+        'ticks': session.tick,
+        'seconds': time.time() - start,
+        'stalls': stalls,
+        'settled': settled,
+        'checksum': checksum(mediator),
+    }
+
+    # Keep answering until everyone else is done too
+    linger = time.time() + 0.5
+    while time.time() < linger:
+        session.poll()
+        session.send()
+        time.sleep(0.01)
+
+    return report
+
+
+def main(args):
+    parser = ArgumentParser(description='Plays a lockstep match over UDP')
+    parser.add_argument('addresses', nargs='+', metavar='HOST:PORT',
+        help='every peer, in the same order on each of them')
+    parser.add_argument('--peer', type=int, required=True,
+        help='which of the addresses is this one, it controls player peer + 1')
+    parser.add_argument('--delay', type=int, default=3,
+        help='ticks a command waits before it is applied')
+    parser.add_argument('--rollback', action='store_true',
+        help='run ahead of late commands, rewinding when they arrive')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--headless', action='store_true')
+    parser.add_argument('--ticks', type=int, default=600,
+        help='how long a headless match runs')
+    parser.add_argument('--record', metavar='FILE',
+        help='record the match, to play back with replay.py')
+    options = parser.parse_args(args)
+
+    session = LockstepSession(
+        options.peer,
+        [parse_address(address) for address in options.addresses],
+        players=[options.peer + 1],
+        input_delay=options.delay,
+        rollback=options.rollback,
+    )
+
+    recorder = None
+    if options.record:
+        recorder = Recorder(options.record, options.seed)
+
+    # The seed makes the sector come out the same on every peer
+    mediator = GameMediator(session=session, seed=options.seed, recorder=recorder)
+    try:
+        if options.headless:
+            print json.dumps(run_headless(mediator, options.ticks, options.seed), sort_keys=True)
+        else:
+            pygame.init()
+            screen = pygame.display.set_mode((640, 480))
+            pygame.display.set_caption('Space Battle - Player %d' % (options.peer + 1))
+            mediator.run(screen)
+    finally:
+        session.close()
+        if recorder is not None and mediator.is_alive:
+            recorder.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+    pygame.quit()
@@ -0,0 +1,156 @@
+from math import pi
+
+import numpy
+
+
+# How many Newton iterations Kepler's equation gets at most
+NEWTON_STEPS = 12
+# Close enough to stop iterating early, in radians
+TOLERANCE = 1e-12
+
+
+def eccentric_anomaly(mean, eccentricity):
+    '''
+    Solves Kepler's equation, mean = E - eccentricity * sin(E), for E
+    Works on whole arrays at once, which broadcast against each other
+    '''
+    mean = numpy.remainder(numpy.asarray(mean, dtype=float) + pi, 2 * pi) - pi
+    eccentricity = numpy.asarray(eccentricity, dtype=float)
+
+    # Starting from pi keeps Newton from overshooting on the very stretched orbits
+    anomaly = numpy.where(eccentricity < 0.8, mean, pi * numpy.sign(mean))
+    for _ in range(NEWTON_STEPS):
+        delta = (anomaly - eccentricity * numpy.sin(anomaly) - mean) / (1 - eccentricity * numpy.cos(anomaly))
+        anomaly = anomaly - delta
+
+        if numpy.abs(delta).max() < TOLERANCE:
+            break
+
+    return anomaly
+
+
+def position(center_x, center_y, distance, eccentricity, periapsis, mean):
+    '''
+    Returns where the orbiting body is, given its orbital elements and mean anomaly
+    distance is the semi-major axis, and periapsis the angle of the closest point
+    Everything can be an array, broadcasting against each other
+    '''
+    if numpy.any(eccentricity):
+        anomaly = eccentric_anomaly(mean, eccentricity)
+    else:
+        # Circles need no solving, the eccentric anomaly is the mean one
+        anomaly = mean
+
+    # Along the ellipse, with the periapsis pointing along x
+    along = distance * (numpy.cos(anomaly) - eccentricity)
+    across = distance * numpy.sqrt(1 - eccentricity ** 2) * numpy.sin(anomaly)
+
+    cos_periapsis = numpy.cos(periapsis)
+    sin_periapsis = numpy.sin(periapsis)
+
+    return (
+        center_x + along * cos_periapsis - across * sin_periapsis,
+        center_y + along * sin_periapsis + across * cos_periapsis,
+    )
+
+
+class OrbitSystem(object):
+    '''
+    Places every orbiting body from its orbital elements in one batched pass,
+    working out where they are in closed form instead of stepping each one along
+
+    bodies require orbit (the center object), distance, eccentricity,
+    periapsis, motion and anomaly to be defined, as Planet.orbit() sets them
+    '''
+
+    def __init__(self, fps):
+        '''
+        fps `int`
+            the time is measured in 1 / fps second steps
+        '''
+        self.fps = fps
+
+        # Steps since the start, the bodies were at their starting anomaly then
+        self.time = 0.0
+
+        self._bodies = []
+        self._index = {}
+
+        self._distance = numpy.zeros(0)
+        self._eccentricity = numpy.zeros(0)
+        self._periapsis = numpy.zeros(0)
+        self._motion = numpy.zeros(0)
+        self._anomaly = numpy.zeros(0)
+
+        self.x = numpy.zeros(0)
+        self.y = numpy.zeros(0)
+
+    def add(self, body):
+        self._bodies.append(body)
+        self._rebuild()
+
+        body.orbit_system = self
+
+    def remove(self, body):
+        self._bodies.remove(body)
+        self._rebuild()
+
+        body.orbit_system = None
+
+    @property
+    def bodies(self):
+        '''
+        The bodies in the order positions() has them
+        '''
+        return list(self._bodies)
+
+    def positions(self, time):
+        '''
+        Returns the x and y of every body at the given time, in steps
+        An array of times gives one row of positions for each of them
+
+        The centers are taken to stay where they are now
+        '''
+        bodies = self._bodies
+        count = len(bodies)
+
+        center_x = numpy.fromiter((body.orbit.x for body in bodies), float, count)
+        center_y = numpy.fromiter((body.orbit.y for body in bodies), float, count)
+
+        time = numpy.asarray(time, dtype=float)[..., numpy.newaxis]
+        mean = self._anomaly + self._motion * time
+
+        return position(
+            center_x, center_y,
+            self._distance, self._eccentricity, self._periapsis,
+            mean,
+        )
+
+    def position(self, body):
+        '''
+        Returns where the body is as of the last update
+        '''
+        index = self._index[body]
+        return (self.x[index], self.y[index])
+
+    def update(self, delta_time):
+        self.time += delta_time * self.fps / 1000.0
+
+        if self._bodies:
+            self.x, self.y = self.positions(self.time)
+
+    def _rebuild(self):
+        '''
+        HELPER: Gathers the orbital elements of every body into arrays
+        '''
+        bodies = self._bodies
+        count = len(bodies)
+
+        self._index = dict((body, index) for index, body in enumerate(bodies))
+
+        for name in ('distance', 'eccentricity', 'periapsis', 'motion', 'anomaly'):
+            values = numpy.fromiter((getattr(body, name) for body in bodies), float, count)
+            setattr(self, '_' + name, values)
+
+        if bodies:
+            self.x, self.y = self.positions(self.time)
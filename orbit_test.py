@@ -0,0 +1,77 @@
+from math import pi
+from orbit import OrbitSystem, eccentric_anomaly, position
+from unittest import TestCase
+import numpy
+import unittest
+
+
+class Center(object):
+    x = 100.0
+    y = 50.0
+
+
+class Body(object):
+    def __init__(self, distance, eccentricity=0.0, periapsis=0.0, motion=0.1, anomaly=0.0):
+        self.orbit = Center()
+        self.distance = distance
+        self.eccentricity = eccentricity
+        self.periapsis = periapsis
+        self.motion = motion
+        self.anomaly = anomaly
+
+
+class KeplerTest(TestCase):
+
+    def test_eccentric_anomaly(self):
+        '''
+        The solution satisfies Kepler's equation, even for very stretched orbits
+        '''
+        mean = numpy.linspace(-pi, pi, 100, endpoint=False)[:, numpy.newaxis]
+        eccentricity = numpy.array([0.0, 0.3, 0.7, 0.95, 0.99])
+
+        anomaly = eccentric_anomaly(mean, eccentricity)
+        solved = anomaly - eccentricity * numpy.sin(anomaly)
+
+        numpy.testing.assert_allclose(solved, numpy.broadcast_to(mean, solved.shape), atol=1e-9)
+
+    def test_position__periapsis(self):
+        '''
+        At a mean anomaly of 0 the body is at its closest, along the periapsis
+        '''
+        x, y = position(0.0, 0.0, 10.0, 0.5, pi / 2, 0.0)
+
+        self.assertAlmostEqual(x, 0.0)
+        self.assertAlmostEqual(y, 5.0)
+
+
+class OrbitSystemTest(TestCase):
+
+    def setUp(self):
+        self.system = OrbitSystem(fps=30)
+        self.circle = Body(20, motion=0.25, anomaly=1.0)
+        self.ellipse = Body(40, eccentricity=0.6, periapsis=0.5)
+        self.system.add(self.circle)
+        self.system.add(self.ellipse)
+
+    def test_update__circle(self):
+        self.system.update(1000)
+
+        x, y = self.system.position(self.circle)
+        angle = 1.0 + 0.25 * 30
+        self.assertAlmostEqual(x, 100 + 20 * numpy.cos(angle))
+        self.assertAlmostEqual(y, 50 + 20 * numpy.sin(angle))
+
+    def test_positions__many_times(self):
+        '''
+        An array of times gives a row of positions for each, matching the updates
+        '''
+        x, y = self.system.positions(numpy.array([0.0, 15.0, 30.0]))
+        self.assertEqual(x.shape, (3, 2))
+
+        self.system.update(1000)
+        numpy.testing.assert_allclose(x[2], self.system.x)
+        numpy.testing.assert_allclose(y[2], self.system.y)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+'''
+Runs a GameMediator's simulation in a worker process, so it gets a core
+of its own instead of taking turns with drawing
+
+The worker writes a snapshot of everything drawn after every step, into one
+of two buffers while the other holds the last complete one. The mediator
+draws straight out of the complete buffer through numpy views
+
+Python 2 has no multiprocessing.shared_memory, so the buffers are RawArrays
+that the worker shares by being forked from the mediator's process. That
+also hands it the already loaded sector, it never touches the display
+'''
+from multiprocessing import Event, Pipe, Process, RawArray, RawValue
+from time import sleep, time
+
+import numpy
+
+from ship import Ship
+
+
+class PhysicsWorker(object):
+    '''
+    Simulates the mediator in another process, showing its snapshots
+
+    Commands go to the worker over a pipe, and get applied at the start of its next step
+    '''
+
+    # How long a paused worker waits before checking whether it should stop
+    PAUSE_POLL = 0.1
+
+    def __init__(self, mediator, step_rate):
+        '''
+        mediator `GameMediator`
+            already loaded, the worker gets a copy of it as it is when started
+        step_rate `int`
+            simulation steps the worker runs every second
+        '''
+        self.mediator = mediator
+        self.step = 1000.0 / step_rate
+
+        self._ships = [mediator.players[number] for number in sorted(mediator.players)]
+        self._celestials = list(mediator.celestials)
+
+        pool = mediator.projectiles
+        # Each field of a snapshot, laid out one after the other in a buffer
+        # The poses are the ones from get_pose
+        self._fields = (
+            ('time', numpy.float64, (1,)),
+            ('tick', numpy.int64, (1,)),
+            ('ships', numpy.float64, (len(self._ships), 7)),
+            ('celestials', numpy.float64, (len(self._celestials), 4)),
+            ('x', numpy.float64, (pool.capacity,)),
+            ('y', numpy.float64, (pool.capacity,)),
+            ('speed_x', numpy.float64, (pool.capacity,)),
+            ('speed_y', numpy.float64, (pool.capacity,)),
+            ('kind', pool.kind.dtype, (pool.capacity,)),
+            ('alive', pool.alive.dtype, (pool.capacity,)),
+        )
+        size = sum(numpy.dtype(dtype).itemsize * numpy.prod(shape) for name, dtype, shape in self._fields)
+
+        self._buffers = [RawArray('b', int(size)) for _ in range(2)]
+        self._snapshots = [self._views(buffer) for buffer in self._buffers]
+
+        # Which buffer holds the latest complete snapshot, -1 before there is one
+        self._front = RawValue('i', -1)
+        # Bumped before and after each buffer is written, odd while it is being written
+        self._writes = RawArray('l', 2)
+
+        # The (buffer, writes) last shown, drawing again before the next snapshot only needs a new alpha
+        self._shown = None
+
+        self._commands, self._sender = Pipe(duplex=False)
+        self._running = Event()
+        self._stopped = Event()
+        self._process = None
+
+    def start(self):
+        '''
+        Forks the worker, it stays paused until resumed
+        '''
+        self._process = Process(target=self._work)
+        self._process.daemon = True
+        self._process.start()
+
+    def resume(self):
+        self._running.set()
+
+    def pause(self):
+        self._running.clear()
+
+    def stop(self):
+        '''
+        Stops the worker, waiting for it to finish
+        '''
+        if self._process is None:
+            return
+
+        self._stopped.set()
+        self._running.set()
+        self._process.join()
+        self._process = None
+
+    def command(self, command):
+        self._sender.send(command)
+
+    @property
+    def tick(self):
+        '''
+        How many steps the worker has simulated, as of the latest snapshot
+        '''
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return 0
+        return int(snapshot['tick'][0])
+
+    def snapshot(self):
+        '''
+        Returns the views into the latest complete snapshot, or None if there isn't one yet
+        '''
+        front = self._front.value
+        if front < 0:
+            return None
+        return self._snapshots[front]
+
+    def show(self):
+        '''
+        Moves everything the mediator draws to the latest complete snapshot,
+        returning how far along the time is towards the next one
+        '''
+        while True:
+            front = self._front.value
+            if front < 0:
+                return 1.0
+
+            writes = self._writes[front]
+            snapshot = self._snapshots[front]
+
+            if self._shown == (front, writes):
+                written = snapshot['time'][0]
+                break
+
+            for ship, pose in zip(self._ships, snapshot['ships'].tolist()):
+                ship.set_pose(pose)
+            for celestial, pose in zip(self._celestials, snapshot['celestials'].tolist()):
+                celestial.set_pose(pose)
+
+            # The projectiles get copied into the pool's own arrays, which this
+            # side never simulates, so the check below covers them as well
+            pool = self.mediator.projectiles
+            pool.x[:] = snapshot['x']
+            pool.y[:] = snapshot['y']
+            pool.speed_x[:] = snapshot['speed_x']
+            pool.speed_y[:] = snapshot['speed_y']
+            pool.kind[:] = snapshot['kind']
+            pool.alive[:] = snapshot['alive']
+
+            written = snapshot['time'][0]
+
+            # The worker only reuses this buffer after writing the other one,
+            # in which case it got written over while being read
+            if writes % 2 == 0 and self._writes[front] == writes:
+                self._shown = (front, writes)
+                break
+
+        return min(max((time() - written) * 1000.0 / self.step, 0.0), 1.0)
+
+    def _views(self, buffer):
+        '''
+        HELPER: Returns the {name: array} views of each field in the buffer
+        '''
+        views = {}
+        offset = 0
+        for name, dtype, shape in self._fields:
+            dtype = numpy.dtype(dtype)
+            count = int(numpy.prod(shape))
+            views[name] = numpy.frombuffer(buffer, dtype, count, offset).reshape(shape)
+            offset += dtype.itemsize * count
+        return views
+
+    def _work(self):
+        '''
+        HELPER: The worker's loop, simulating at the step rate while resumed
+        '''
+        # Nobody draws the ships in here
+        Ship.ANIMATE = False
+
+        mediator = self.mediator
+        seconds = self.step / 1000.0
+
+        due = None
+        while not self._stopped.is_set():
+            if not self._running.wait(self.PAUSE_POLL):
+                due = None
+                continue
+            if due is None:
+                due = time()
+
+            while self._commands.poll():
+                mediator.apply_command(self._commands.recv())
+
+            mediator.simulate(self.step)
+            self._write()
+
+            due += seconds
+            delay = due - time()
+            if delay > 0:
+                sleep(delay)
+            else:
+                # Fell behind, running late from now on instead of trying to catch up
+                due = time()
+
+    def _write(self):
+        '''
+        HELPER: Copies the mediator into the back buffer, then makes it the front one
+        '''
+        back = 1 - max(self._front.value, 0)
+        snapshot = self._snapshots[back]
+
+        self._writes[back] += 1
+
+        snapshot['ships'][:] = [ship.get_pose() for ship in self._ships]
+        snapshot['celestials'][:] = [celestial.get_pose() for celestial in self._celestials]
+
+        pool = self.mediator.projectiles
+        snapshot['x'][:] = pool.x
+        snapshot['y'][:] = pool.y
+        snapshot['speed_x'][:] = pool.speed_x
+        snapshot['speed_y'][:] = pool.speed_y
+        snapshot['kind'][:] = pool.kind
+        snapshot['alive'][:] = pool.alive
+
+        snapshot['tick'][0] = self.mediator.tick
+        snapshot['time'][0] = time()
+
+        self._writes[back] += 1
+        self._front.value = back
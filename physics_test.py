@@ -0,0 +1,90 @@
+from physics import PhysicsWorker
+from time import sleep
+from unittest import TestCase
+from weapons import ProjectilePool
+import numpy
+import unittest
+
+
+class Body(object):
+    def __init__(self, size):
+        self.pose = (0.0,) * size
+
+    def get_pose(self):
+        return self.pose
+
+    def set_pose(self, pose):
+        self.pose = tuple(pose)
+
+
+class Sector(object):
+    '''
+    Just enough of a GameMediator, moving a ship along by its speed every step
+    '''
+
+    def __init__(self):
+        self.players = {1: Body(7)}
+        self.celestials = [Body(4)]
+        self.projectiles = ProjectilePool(30, capacity=8)
+        self.tick = 0
+        self.speed = 0
+
+    def apply_command(self, command):
+        self.speed = command
+
+    def simulate(self, delta_time):
+        x = self.players[1].pose[0]
+        self.players[1].pose = (x + self.speed, 0, x, 0, 0, 0, 0)
+        self.projectiles.fire(x, 0, 0, 0, 0, 1)
+        self.tick += 1
+
+
+class PhysicsWorkerTest(TestCase):
+
+    def setUp(self):
+        self.sector = Sector()
+        self.worker = PhysicsWorker(self.sector, step_rate=200)
+        self.worker.start()
+
+    def tearDown(self):
+        self.worker.stop()
+
+    def wait(self, ticks):
+        for _ in range(500):
+            if self.worker.tick >= ticks:
+                return
+            sleep(0.01)
+        self.fail('The worker never got to tick %d' % ticks)
+
+    def test_show(self):
+        self.worker.command(2)
+        self.worker.resume()
+        self.wait(5)
+        self.worker.pause()
+        sleep(0.05)
+
+        self.worker.show()
+        tick = self.worker.tick
+
+        # Only the worker's copy of the sector moves, until shown
+        self.assertEqual(self.sector.tick, 0)
+        self.assertEqual(self.sector.players[1].pose[0], 2.0 * tick)
+        self.assertEqual(int(self.sector.projectiles.alive.sum()), min(tick, 8))
+
+    def test_show__copies_projectiles(self):
+        '''
+        The pool keeps its own arrays, the worker can write over either buffer
+        right after show returns
+        '''
+        self.worker.resume()
+        self.wait(5)
+        self.worker.show()
+
+        pool = self.sector.projectiles
+        for snapshot in self.worker._snapshots:
+            for name in ('x', 'y', 'speed_x', 'speed_y', 'kind', 'alive'):
+                self.assertFalse(numpy.may_share_memory(getattr(pool, name), snapshot[name]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+'''
+Records the commands given during a match, and plays them back without a
+window as fast as possible
+
+The seed decides every random choice of the sector, so the seed and the
+commands are all a match needs to be played again
+
+    python replay.py match.rec
+    python replay.py match.rec --window --draw-every 4
+'''
+from argparse import ArgumentParser
+from collections import defaultdict
+from timeit import default_timer as timer
+
+import json
+import struct
+import sys
+
+from net import COMMAND
+
+
+MAGIC = 'SBRC'
+VERSION = 1
+
+# magic, version, seed
+HEADER = struct.Struct('!4sBI')
+# ticks since the last record, command count
+RECORD = struct.Struct('!HB')
+
+# The most ticks one record can skip ahead
+MAX_GAP = 2 ** 16 - 1
+# The most commands one record can hold
+MAX_COMMANDS = 2 ** 8 - 1
+
+
+class ReplayException(Exception):
+    '''
+    Raised when a recording can't be read
+    '''
+
+
+class Recorder(object):
+    '''
+    Collects the commands applied on each tick, writing them out once closed
+
+    Ticks only get written on close, so a rollback can still take back the
+    ones it re-runs
+    '''
+
+    def __init__(self, filename, seed):
+        self.filename = filename
+        self.seed = seed
+
+        self._ticks = defaultdict(list)
+        self._length = 0
+
+    def record(self, tick, command):
+        '''
+        Adds a (player, action, direction, stop) command applied before the tick ran
+        '''
+        self._ticks[tick].append(command)
+
+    def step(self, tick):
+        '''
+        Marks the tick as run
+        '''
+        self._length = tick + 1
+
+    def rewind(self, tick):
+        '''
+        Forgets everything from the tick on, as it is about to be run again
+        '''
+        for later in [later for later in self._ticks if later >= tick]:
+            del self._ticks[later]
+        self._length = min(self._length, tick)
+
+    def close(self):
+        with open(self.filename, 'wb') as output:
+            output.write(HEADER.pack(MAGIC, VERSION, self.seed))
+
+            last = 0
+            # The final empty record marks how long the match ran
+            ticks = sorted(tick for tick in self._ticks if tick < self._length)
+            for tick in ticks + [self._length]:
+                commands = self._ticks.get(tick, [])
+
+                while tick - last > MAX_GAP:
+                    output.write(RECORD.pack(MAX_GAP, 0))
+                    last += MAX_GAP
+
+                # Rarely a tick has too many commands for one record
+                for start in range(0, max(len(commands), 1), MAX_COMMANDS):
+                    chunk = commands[start:start + MAX_COMMANDS]
+                    output.write(RECORD.pack(tick - last, len(chunk)))
+                    for player, action, direction, stop in chunk:
+                        output.write(COMMAND.pack(player, action, direction, stop))
+                    last = tick
+
+
+def read(filename):
+    '''
+    Returns the (seed, length, ticks) of a recording
+    ticks maps each tick to the commands applied right before it ran
+    '''
+    with open(filename, 'rb') as recording:
+        data = recording.read()
+
+    try:
+        magic, version, seed = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ReplayException('%s is not a recording' % filename)
+        if version != VERSION:
+            raise ReplayException('Unknown recording version: %d' % version)
+
+        offset = HEADER.size
+        ticks = defaultdict(list)
+        tick = 0
+        while offset < len(data):
+            gap, count = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            tick += gap
+
+            for _ in range(count):
+                player, action, direction, stop = COMMAND.unpack_from(data, offset)
+                ticks[tick].append((player, action, direction, bool(stop)))
+                offset += COMMAND.size
+    except struct.error as e:
+        raise ReplayException('Truncated recording: %s' % e)
+
+    return (seed, tick, ticks)
+
+
+def play(mediator, screen, length, ticks, draw_every=0):
+    '''
+    Runs the recorded ticks through the mediator without waiting between them,
+    returning the timing report
+    The screen is drawn to once every draw_every ticks, if given
+    '''
+    import pygame
+    from bench import percentiles
+
+    # Has to come out just like the recorded match did
+    mediator.deterministic = True
+
+    for msg in mediator.preload(screen):
+        pass
+    mediator.unfreeze()
+
+    step = 1000.0 / mediator.STEP_RATE
+
+    update_times = []
+
+    start = timer()
+    for tick in range(length):
+        for command in ticks.get(tick, ()):
+            mediator.apply_command(command)
+
+        before = timer()
+        mediator.simulate(step)
+        update_times.append(timer() - before)
+
+        if draw_every and tick % draw_every == 0:
+            pygame.event.pump()
+            mediator._clear_screen(screen)
+            mediator.draw(screen)
+            mediator._draw_screen(screen)
+    total = timer() - start
+
+    return {
+        'ticks': length,
+        'seconds': total,
+        'ticks_per_sec': length / total if total else None,
+        'update': percentiles(update_times) if update_times else {},
+    }
+
+
+def main(args):
+    parser = ArgumentParser(description='Replays a recorded match as fast as possible')
+    parser.add_argument('recording')
+    parser.add_argument('--draw-every', type=int, default=0,
+        help='ticks between each draw, 0 never draws')
+    parser.add_argument('--window', action='store_true',
+        help='show the draws in a window, to watch the match fast-forwarded')
+    options = parser.parse_args(args)
+
+    seed, length, ticks = read(options.recording)
+
+    if options.window:
+        import pygame
+        pygame.init()
+        screen = pygame.display.set_mode((640, 480))
+        pygame.display.set_caption('Space Battle - Replay')
+    else:
+        from bench import init_headless
+        screen = init_headless((640, 480))
+
+    from menu.mediators import GameMediator
+    from netplay import checksum
+
+    mediator = GameMediator(seed=seed, deterministic=True)
+    report = play(mediator, screen, length, ticks, options.draw_every)
+    report['seed'] = seed
+    report['checksum'] = checksum(mediator)
+
+    print json.dumps(report, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,147 @@
+from replay import Recorder, ReplayException, play, read
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class RecorderTest(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 'match.rec')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_round_trip(self):
+        recorder = Recorder(self.filename, seed=42)
+        recorder.record(0, (1, 0, 1, False))
+        recorder.record(70000, (2, 2, 0, True))
+        for tick in range(70010):
+            recorder.step(tick)
+        recorder.close()
+
+        seed, length, ticks = read(self.filename)
+
+        self.assertEqual(seed, 42)
+        self.assertEqual(length, 70010)
+        self.assertEqual(dict(ticks), {
+            0: [(1, 0, 1, False)],
+            70000: [(2, 2, 0, True)],
+        })
+
+    def test_rewind(self):
+        '''
+        Rewound ticks are forgotten, so only the re-run commands get written
+        '''
+        recorder = Recorder(self.filename, seed=0)
+        recorder.record(3, (1, 0, 1, False))
+        recorder.step(5)
+        recorder.rewind(2)
+        recorder.record(4, (1, 1, 1, False))
+        recorder.step(4)
+        recorder.close()
+
+        seed, length, ticks = read(self.filename)
+
+        self.assertEqual(length, 5)
+        self.assertEqual(dict(ticks), {4: [(1, 1, 1, False)]})
+
+    def test_read__not_a_recording(self):
+        with open(self.filename, 'wb') as output:
+            output.write('not a recording')
+
+        with self.assertRaises(ReplayException):
+            read(self.filename)
+
+
+class ReplayTest(TestCase):
+
+    SEED = 7
+    TICKS = 200
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 'match.rec')
+
+        from bench import init_headless
+        from menu.mediators import GameMediator
+
+        self.screen = init_headless((320, 240))
+
+        # Bigger than the screen, so the camera only sees part of it
+        class Sector(GameMediator):
+            WORLD_SIZE = (1600, 1200)
+        self.Sector = Sector
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_play__matches_recording(self):
+        '''
+        Playing a recording back ends up just like the recorded match
+        '''
+        from menu.controllers import MOVE, ROTATE, FIRE
+        from netplay import checksum
+        from ship import Ship
+
+        live = self.Sector(seed=self.SEED, recorder=Recorder(self.filename, self.SEED))
+        for msg in live.preload(self.screen):
+            pass
+        live.unfreeze()
+
+        step = 1000.0 / live.STEP_RATE
+        for tick in range(self.TICKS):
+            if tick % 20 == 0:
+                for player in live.players:
+                    live.command(player, MOVE, Ship.MOV_FORWARDS, stop=tick % 40 == 20)
+                    live.command(player, ROTATE, Ship.ROT_LEFT, stop=tick % 60 == 0)
+                    live.command(player, FIRE)
+            live.update(step)
+        live.recorder.close()
+
+        seed, length, ticks = read(self.filename)
+        replayed = self.Sector(seed=seed)
+        play(replayed, self.screen, length, ticks)
+
+        self.assertEqual(replayed.tick, live.tick)
+        self.assertEqual(checksum(replayed), checksum(live))
+
+    def test_main_mediator__records(self):
+        '''
+        Matches started from the main menu can be recorded, and come out the same played back
+        '''
+        from menu.controllers import MOVE
+        from menu.mediators import GameMediator, MainMediator
+        from netplay import checksum
+        from ship import Ship
+
+        class Main(MainMediator):
+            RECORD = self.filename
+
+        main = Main()
+        main._preload(self.screen)
+        (sender, event), = main._transitions
+        live = event.mediator
+        for msg in live.preload(self.screen):
+            pass
+        live.unfreeze()
+
+        step = 1000.0 / live.STEP_RATE
+        live.command(1, MOVE, Ship.MOV_FORWARDS)
+        for tick in range(self.TICKS):
+            live.update(step)
+        live.finish()
+
+        seed, length, ticks = read(self.filename)
+        self.assertEqual(seed, live.seed)
+
+        replayed = GameMediator(seed=seed)
+        play(replayed, self.screen, length, ticks)
+        self.assertEqual(checksum(replayed), checksum(live))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+from hashlib import sha1
+
+import loader
+import mmap
+import os
+import pygame
+
+
+# Scaled images get stored here as raw RGBA pixels, named by what they came from
+CACHE_PATH = os.path.join('Resources', '.cache')
+
+# Scaled images already in use, shared by everything asking for the same one
+_surfaces = {}
+
+
+def smoothscale(path, image, size):
+    '''
+    Returns the image (as loaded from path) smoothscaled to the given size
+
+    The result is kept on disk, keyed by the file, its mtime and the size,
+    so the next start up can map it back in without scaling again
+    '''
+    key = _key(path, size)
+
+    surface = _surfaces.get(key)
+    if surface is not None:
+        return surface
+
+    surface = read(key, size)
+    if surface is None:
+        surface = pygame.transform.smoothscale(image, size)
+        write(key, surface)
+
+    surface = loader.convert(surface)
+    _surfaces[key] = surface
+
+    return surface
+
+
+def clear():
+    '''
+    Forgets the scaled images kept in memory, the ones on disk are kept
+    '''
+    _surfaces.clear()
+
+
+def _key(path, size):
+    '''
+    HELPER: Returns the cache key for the file scaled to the given size
+    '''
+    return sha1('%s|%d|%dx%d' % (
+        os.path.abspath(path),
+        os.stat(path).st_mtime,
+        size[0],
+        size[1],
+    )).hexdigest()
+
+
+def _filename(key):
+    return os.path.join(CACHE_PATH, '%s.rgba' % key)
+
+
+def read(key, size):
+    '''
+    Maps the cached pixels back in, returning None if they aren't cached
+    '''
+    try:
+        with open(_filename(key), 'rb') as cached:
+            pixels = mmap.mmap(cached.fileno(), 0, access=mmap.ACCESS_COPY)
+    except (IOError, OSError, ValueError):
+        return None
+
+    # A half written or stale file, it'll get replaced
+    if len(pixels) != size[0] * size[1] * 4:
+        pixels.close()
+        return None
+
+    # Wrapped without a copy, but the callers convert it to the display format
+    # which copies the pixels out, so the map only lives until then
+    # What the cache saves is the smoothscale, not the copy
+    return pygame.image.frombuffer(buffer(pixels), size, 'RGBA')
+
+
+def write(key, surface):
+    '''
+    Stores the surface's pixels, ignoring any failure as the cache is optional
+    '''
+    filename = _filename(key)
+    partial = '%s.%d' % (filename, os.getpid())
+
+    try:
+        if not os.path.isdir(CACHE_PATH):
+            os.makedirs(CACHE_PATH)
+
+        with open(partial, 'wb') as cached:
+            cached.write(pygame.image.tostring(surface, 'RGBA'))
+
+        # Readers never see a half written file
+        os.rename(partial, filename)
+    except (IOError, OSError):
+        pass
@@ -1,10 +1,14 @@
 import pygame
 import os.path
+from collections import OrderedDict
 from mixins import ImageBatch
-from math import cos, sin, pi
+import atlas
+from weapons import Ammo
+from well import GravityWell
+from math import cos, sin, pi, sqrt
 
 
-class Ship(pygame.sprite.Sprite, ImageBatch):
+class Ship(pygame.sprite.Sprite, ImageBatch, GravityWell):
     # Original Image
     IMAGE_PATH = os.path.join('Resources', 'sprites', 'ship')
 
@@ -17,27 +21,117 @@ class Ship(pygame.sprite.Sprite, ImageBatch):
     MOV_BACKWARDS = -1
     MOV_STOP = 0
 
+    # Only felt by other ships when the bodies pull on each other too, see BarnesHutSystem
+    MASS = 1 * 10 ** 28
+
+    MODELS = ('ship1',)
+    BASES = ('blue', 'green', 'purple', 'red')
+
+    # Side-burn frames, alternated while rotating
+    BURN_FRAMES = {
+        ROT_LEFT: ('left - 1', 'left - 2'),
+        ROT_RIGHT: ('right - 1', 'right - 2'),
+    }
+
+    # Every side-burn and engine layer, so a pose can refer to them by number
+    LAYERS = (None, 'left - 1', 'left - 2', 'right - 1', 'right - 2', 'on - start', 'on - 1', 'on - 2', 'on - 3', 'off')
+
+    # Picking the frame to draw can be left to whoever draws the ship, see PhysicsWorker
+    ANIMATE = True
+
+    # Moving the ship along its speed can be left to a GravitySystem's integrator, see gravity.INTEGRATORS
+    DRIFT = True
+
+    # Rendered frames are cached by (model, base, burn, engine, heading step)
+    # so a steady state update only does a lookup
+    HEADING_STEPS = 128
+    FRAME_CACHE_SIZE = 2048
+    FRAMES = OrderedDict()
+    COMPOSITES = {}
+
     @classmethod
-    def load(cls):
+    def load(cls, warmup=()):
+        '''
+        Loads and resizes the ship images
+
+        warmup `list`
+            bases to pre-render the idle frame of, for every heading
+        '''
         for out in super(Ship, cls).load():
             yield out
 
         yield '  Resizing ImageBatch for %s' % cls.__name__
 
-        cls.SCALED_IMAGES = {}
+        sizes = {}
         for key, value in cls.IMAGES.iteritems():
-            yield '    %s' % key
-
             rect = value.get_rect()
+            sizes[key] = (rect.width / 5, rect.height / 5)
+
+        # Packed together like the originals
+        cls.SCALED_IMAGES = atlas.scale_images(cls.PATHS, cls.IMAGES, sizes)
 
-            width = rect.width / 5
-            height = rect.height / 5
+        cls.FRAMES = OrderedDict()
+        cls.COMPOSITES = {}
 
-            cls.SCALED_IMAGES[key] = pygame.transform.smoothscale(
-                value,
-                (width, height)
+        if warmup:
+            yield '  Warming frame cache for %s' % cls.__name__
+
+        for model in cls.MODELS:
+            for base in warmup:
+                yield '    %s - %s' % (model, base)
+                for heading in range(cls.HEADING_STEPS):
+                    cls.get_frame(model, base, None, None, heading)
+
+    @classmethod
+    def get_frame(cls, model, base, burn, engine, heading):
+        '''
+        Returns the ship image with the given side-burn and engine frames
+        (None when off), rotated to the given heading step
+        '''
+        key = (model, base, burn, engine, heading)
+
+        # Re-inserting keeps the most recently used frames at the end
+        frame = cls.FRAMES.pop(key, None)
+        if frame is None:
+            frame = pygame.transform.rotate(
+                cls._composite(model, base, burn, engine),
+                heading * 360.0 / cls.HEADING_STEPS
             )
 
+            if len(cls.FRAMES) >= cls.FRAME_CACHE_SIZE:
+                cls.FRAMES.popitem(last=False)
+        cls.FRAMES[key] = frame
+
+        return frame
+
+    @classmethod
+    def _composite(cls, model, base, burn, engine):
+        '''
+        HELPER: Returns the un-rotated ship image with all its layers
+        '''
+        key = (model, base, burn, engine)
+
+        image = cls.COMPOSITES.get(key)
+        if image is not None:
+            return image
+
+        # Base image with the engine off
+        image = cls.SCALED_IMAGES.get('%s - off' % model).copy()
+        base_image = cls.SCALED_IMAGES.get('%s - %s' % (model, base))
+        image.blit(base_image, base_image.get_rect())
+
+        # Each extra layer goes underneath the image so far
+        for layer in (burn, engine):
+            if layer is None:
+                continue
+
+            layer_image = cls.SCALED_IMAGES.get('%s - %s' % (model, layer)).copy()
+            layer_image.blit(image, image.get_rect())
+            image = layer_image
+
+        cls.COMPOSITES[key] = image
+        return image
+
     def __init__(self, x, y, model='ship1', base='purple'):
         super(Ship, self).__init__()
 
@@ -45,19 +139,26 @@ class Ship(pygame.sprite.Sprite, ImageBatch):
         self.base = base
         self.image = Ship.SCALED_IMAGES.get(self.model)
 
+        # Collisions treat the ship as a circle fitting its un-rotated image
+        self.radius = min(self.image.get_size()) / 2
+
+        self.mass = Ship.MASS
+
         self.rect = self.image.get_rect()
         self.rect.centerx = x
         self.rect.centery = y
 
         self._direction = 0
-        self._delay = 1000 / Ship.FPS
-        self._counter = 0
         self._rotate_direction = 0
         self._move_direction = 0
 
         self._engine_counter = 0
         self._burn_counter = 0
 
+        # The side-burn and engine layers showing, picked by the last update
+        self._burn = None
+        self._engine = None
+
         self._speedX = float(0)
         self._speedY = float(0)
 
@@ -67,6 +168,10 @@ class Ship(pygame.sprite.Sprite, ImageBatch):
         self._x = float(x)
         self._y = float(y)
 
+        # Where the ship was before the last update, used to interpolate draws
+        self._prev_x = self._x
+        self._prev_y = self._y
+
     def set_direction(self, dir):
         self._direction = dir
 
@@ -132,6 +237,108 @@ class Ship(pygame.sprite.Sprite, ImageBatch):
         self._speedX += cos(rads) * speed
         self._speedY += sin(rads) * speed
 
+    def push(self, speed_x, speed_y):
+        '''
+        Adds the given change in speed, in the same axes accelerate uses
+        '''
+        self._speedX += speed_x
+        self._speedY += speed_y
+
+    def fire(self, pool, kind, owner):
+        '''
+        Fires a projectile of the given kind out of the front of the ship
+        '''
+        # Same facing as accelerate, in screen axes
+        facing_x = sin(self._direction)
+        facing_y = cos(self._direction)
+        speed = Ammo.KINDS[kind][1]
+
+        return pool.fire(
+            self._x + facing_x * self.radius,
+            self._y + facing_y * self.radius,
+            self._speedX + facing_x * speed,
+            -self._speedY + facing_y * speed,
+            kind,
+            owner,
+        )
+
+    def bounce_off(self, obj):
+        '''
+        Bounces the ship off an object that doesn't get pushed back, e.g. a celestial
+        '''
+        nx, ny, overlap = self._normal(obj.x, obj.y, obj.radius)
+        self._nudge(nx * overlap, ny * overlap)
+
+        # Note: _speedY points up, while the normal is in screen axes
+        along = self._speedX * nx - self._speedY * ny
+        if along < 0:
+            self._speedX -= 2 * along * nx
+            self._speedY += 2 * along * ny
+
+    def bounce(self, other):
+        '''
+        Bounces two ships of the same mass off each other
+        '''
+        # Both from their exact positions, so it comes out the same whichever ship goes first
+        nx, ny, overlap = self._normal(other._x, other._y, other.radius)
+        self._nudge(nx * overlap / 2, ny * overlap / 2)
+        other._nudge(-nx * overlap / 2, -ny * overlap / 2)
+
+        # The ships swap their speeds along the normal
+        along = (self._speedX - other._speedX) * nx - (self._speedY - other._speedY) * ny
+        if along < 0:
+            self._speedX -= along * nx
+            self._speedY += along * ny
+            other._speedX += along * nx
+            other._speedY -= along * ny
+
+    def _normal(self, x, y, radius):
+        '''
+        HELPER: Returns the direction from an object at x, y with the given
+        radius to the ship (in screen axes) and how far they overlap
+        '''
+        dx = self._x - x
+        dy = self._y - y
+        distance = sqrt(dx ** 2 + dy ** 2)
+
+        # Dead center, so any direction will do
+        if distance == 0:
+            return 0.0, -1.0, float(self.radius + radius)
+
+        return dx / distance, dy / distance, self.radius + radius - distance
+
+    def _nudge(self, dx, dy):
+        '''
+        HELPER: Moves the ship without changing its speed
+        '''
+        self._x += dx
+        self._y += dy
+
+        self.rect.centerx = self._x
+        self.rect.centery = self._y
+
+    def get_state(self):
+        '''
+        Returns everything the simulation changes, for set_state to go back to
+        '''
+        return (
+            self._x, self._y, self._prev_x, self._prev_y,
+            self._speedX, self._speedY, self._direction,
+            self._rotate_direction, self._move_direction,
+            self._engine_counter, self._burn_counter,
+        )
+
+    def set_state(self, state):
+        (
+            self._x, self._y, self._prev_x, self._prev_y,
+            self._speedX, self._speedY, self._direction,
+            self._rotate_direction, self._move_direction,
+            self._engine_counter, self._burn_counter,
+        ) = state
+
+        self.rect.centerx = self._x
+        self.rect.centery = self._y
+
     def engine_on_image(self, counter):
         '''
 
@@ -143,67 +350,129 @@ class Ship(pygame.sprite.Sprite, ImageBatch):
             3: 'on - 3'
         }[counter]
 
+    def get_motion(self):
+        '''
+        Returns the ship's exact position and speed, for set_motion
+        '''
+        return (self._x, self._y, self._speedX, self._speedY)
+
+    def set_motion(self, x, y, speed_x, speed_y):
+        '''
+        Moves the ship to the given position and speed, drawing it on its way from where it was
+        '''
+        self._prev_x = self._x
+        self._prev_y = self._y
+
+        self._x = x
+        self._y = y
+        self._speedX = speed_x
+        self._speedY = speed_y
+
+        self.rect.centerx = self._x
+        self.rect.centery = self._y
+
+    def get_thrust(self):
+        '''
+        Returns how hard the ship is accelerating and how fast it is turning, per second
+        '''
+        return (float(self._movespeed) * self._move_direction, self._rotate_direction * self._turnspeed)
+
+    def get_pose(self):
+        '''
+        Returns the numbers drawing the ship needs, for set_pose to show
+        '''
+        return (
+            self._x, self._y, self._prev_x, self._prev_y, self._direction,
+            Ship.LAYERS.index(self._burn), Ship.LAYERS.index(self._engine),
+        )
+
+    def set_pose(self, pose):
+        '''
+        Moves the ship to a pose from get_pose, without simulating anything
+        '''
+        self._x, self._y, self._prev_x, self._prev_y, self._direction, burn, engine = pose
+        self._burn = Ship.LAYERS[int(burn)]
+        self._engine = Ship.LAYERS[int(engine)]
+
+        self.rect.centerx = self._x
+        self.rect.centery = self._y
+        self.animate()
+
     def update(self, delta_time):
-        self._counter += delta_time
-        if self._counter > self._delay:
-            self._counter = 0
-
-            # Base image right now
-            base_image = Ship.SCALED_IMAGES.get('%s - %s' % (self.model, self.base))
-
-            # Add the current engine level
-            engine_image = Ship.SCALED_IMAGES.get('%s - off' % self.model).copy()
-            engine_image.blit(base_image, base_image.get_rect())
-            output_image = engine_image
-
-            # Updates side-burn
-            if self._rotate_direction != Ship.ROT_STOP:
-                if self._burn_counter == 0:
-                    burn_image = ('%s - left - 1' % (self.model)) if self._rotate_direction == Ship.ROT_LEFT else ('%s - right - 1' % (self.model))
-                    self._burn_counter = 1
-                elif self._burn_counter == 1:
-                    burn_image = ('%s - left - 2' % (self.model)) if self._rotate_direction == Ship.ROT_LEFT else ('%s - right - 2' % (self.model))
-                    self._burn_counter = 0
-
-                burn_image = Ship.SCALED_IMAGES.get(burn_image).copy()
-                burn_image.blit(output_image, output_image.get_rect())
-                output_image = burn_image
-
-            # Updates engine
-            if self._move_direction != Ship.MOV_STOP:
-                if self._move_direction == Ship.MOV_FORWARDS:
-                    engine_image = ('%s - %s' % (self.model, self.engine_on_image(self._engine_counter)))
-                    if self._engine_counter < 3:
-                        self._engine_counter += 1
-                    else:
-                        self._engine_counter = 1
-                elif self._move_direction == Ship.MOV_BACKWARDS:
-                    self._engine_counter = 0
-                    engine_image = ('%s - off' % (self.model))
-
-                engine_image = Ship.SCALED_IMAGES.get(engine_image).copy()
-                engine_image.blit(output_image, output_image.get_rect())
-                output_image = engine_image
+        '''
+        Advances the ship by delta_time milliseconds
+        '''
+        self.simulate(delta_time)
+
+        if Ship.ANIMATE:
+            self.animate()
+
+    def simulate(self, delta_time):
+        '''
+        Moves the ship along by delta_time milliseconds, without touching its image
+        Speeds are measured per 1 / Ship.FPS seconds
+        '''
+        seconds = delta_time / 1000.0
+
+        # Updates side-burn
+        burn = None
+        if self._rotate_direction != Ship.ROT_STOP:
+            burn = Ship.BURN_FRAMES[self._rotate_direction][self._burn_counter]
+            self._burn_counter = 1 - self._burn_counter
+
+        # Updates engine
+        engine = None
+        if self._move_direction == Ship.MOV_FORWARDS:
+            engine = self.engine_on_image(self._engine_counter)
+            if self._engine_counter < 3:
+                self._engine_counter += 1
             else:
-                self._engine_counter = 0
+                self._engine_counter = 1
+        elif self._move_direction == Ship.MOV_BACKWARDS:
+            self._engine_counter = 0
+            engine = 'off'
+        else:
+            self._engine_counter = 0
+
+        self._burn = burn
+        self._engine = engine
 
-            # Ship Rotation
-            self._direction = self._direction + (self._rotate_direction * self._turnspeed / Ship.FPS)
-            self.image = pygame.transform.rotate(output_image, self._direction * 180 / pi)
-            self.rect = self.image.get_rect(center = self.rect.center)
+        # Ship Rotation
+        self._direction = self._direction + (self._rotate_direction * self._turnspeed * seconds)
+
+        # Ship Accelerate From Engine
+        self.accelerate(self._direction, float(self._movespeed) * self._move_direction * seconds)
+
+        if not Ship.DRIFT:
+            return
 
-            # Ship Accelerate From Engine
-            self.accelerate(self._direction, float(self._movespeed) * self._move_direction / Ship.FPS)
+        # Ship Move
+        # TODO: Make it not run off screen?
+        self._prev_x = self._x
+        self._prev_y = self._y
 
-            # Ship Move
-            # TODO: Make it not run off screen?
-            self._x += self._speedX
-            self._y -= self._speedY
+        self._x += self._speedX * seconds * Ship.FPS
+        self._y -= self._speedY * seconds * Ship.FPS
 
-            self.rect.centerx = self._x
-            self.rect.centery = self._y
+        self.rect.centerx = self._x
+        self.rect.centery = self._y
 
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
+    def animate(self):
+        '''
+        Picks the frame showing the ship's heading and layers
+        '''
+        heading = int(round(self._direction * Ship.HEADING_STEPS / (2 * pi))) % Ship.HEADING_STEPS
+        self.image = Ship.get_frame(self.model, self.base, self._burn, self._engine, heading)
+        self.rect = self.image.get_rect(center=self.rect.center)
+
+    def draw(self, screen, alpha=1.0, offset=(0, 0)):
+        '''
+        Draws the ship alpha of the way from its last position to its current one
+        '''
+        rect = self.image.get_rect(center=(
+            int(round(self._prev_x + (self._x - self._prev_x) * alpha)) + offset[0],
+            int(round(self._prev_y + (self._y - self._prev_y) * alpha)) + offset[1],
+        ))
+        return screen.blit(self.image, rect)
 
 
@@ -0,0 +1,250 @@
+'''
+Predicts where gravity will carry each ship, to show them their path ahead
+'''
+from abstract.view import View
+from math import pi
+
+import numpy
+import pygame
+
+from celestials import Celestial
+from gravity import EULER, GravitySystem, integrate, pull, substeps
+
+
+class TrajectoryPredictor(object):
+    '''
+    Keeps every ship's next steps worked out, following the same rules the
+    simulation does, with the planets moving along their orbits
+
+    The predictions are kept in ring buffers, each step only works out one
+    more step at the far end, unless a ship's thrust changed or something
+    knocked it off its predicted path, in which case that ship starts over
+    '''
+
+    # How many steps ahead to predict
+    STEPS = 90
+
+    # How far (in pixels or speed per step) a ship can stray from its prediction before it starts over
+    TOLERANCE = 0.01
+
+    def __init__(self, ships, celestials, orbits, fps, steps=None, integrator=EULER):
+        '''
+        ships `list`
+            the ships to predict, they require get_state() and get_thrust()
+        celestials `list`
+            every well pulling on them, those in the orbits move along them
+        orbits `OrbitSystem`
+        fps `int`
+            speeds are measured per 1 / fps seconds
+        integrator `str`
+            the one the GravitySystem moves the ships with, see gravity.INTEGRATORS
+        '''
+        if steps is None:
+            steps = self.STEPS
+        self.steps = steps
+        self.integrator = integrator
+
+        self.ships = list(ships)
+        self.orbits = orbits
+        self.fps = fps
+
+        # The moving wells come first, in the order the orbit system has them
+        self._moving = orbits.bodies
+        still = [celestial for celestial in celestials if celestial not in set(self._moving)]
+        self._still_x = numpy.array([celestial.x for celestial in still], dtype=float)
+        self._still_y = numpy.array([celestial.y for celestial in still], dtype=float)
+        self._mass = numpy.array([well.mass for well in self._moving + still], dtype=float)
+
+        # One row per ship, one column per step ahead, starting at self._head and wrapping around
+        shape = (len(self.ships), steps)
+        self.x = numpy.zeros(shape)
+        self.y = numpy.zeros(shape)
+        self._speed_x = numpy.zeros(shape)
+        self._speed_y = numpy.zeros(shape)
+        self._direction = numpy.zeros(shape)
+        self._head = 0
+
+        # Where the wells are at each step ahead, in the same columns
+        self._well_x = numpy.zeros((steps, len(self._mass)))
+        self._well_y = numpy.zeros((steps, len(self._mass)))
+
+        self._thrust = None
+        self._delta_time = None
+
+    def path(self, index):
+        '''
+        Returns the x and y arrays of the given ship's predicted positions, nearest first
+        '''
+        order = (numpy.arange(self.steps) + self._head) % self.steps
+        return self.x[index, order], self.y[index, order]
+
+    def update(self, delta_time):
+        '''
+        Moves the predictions along after the ships took a step of delta_time milliseconds
+        '''
+        count = len(self.ships)
+        states = numpy.array([ship.get_state()[:7] for ship in self.ships], dtype=float).reshape(count, 7)
+        x, y, speed_x, speed_y, direction = states[:, [0, 1, 4, 5, 6]].T
+        thrust = numpy.array([ship.get_thrust() for ship in self.ships], dtype=float).reshape(count, 2)
+
+        if delta_time != self._delta_time or self._thrust is None:
+            # Nothing predicted yet, or for a different step
+            self._delta_time = delta_time
+            self._head = 0
+            self._place_wells(numpy.arange(self.steps))
+            stale = numpy.ones(count, dtype=bool)
+        else:
+            # Each ship should have ended up at what used to be one step ahead
+            head = self._head
+            stale = (thrust != self._thrust).any(axis=1)
+            for actual, predicted in (
+                (x, self.x), (y, self.y), (speed_x, self._speed_x),
+                (speed_y, self._speed_y), (direction, self._direction),
+            ):
+                stale |= numpy.abs(actual - predicted[:, head]) > self.TOLERANCE
+
+            # That column is free now, for the new furthest step
+            self._head = (head + 1) % self.steps
+            self._place_wells(numpy.array([head]))
+
+            kept = numpy.flatnonzero(~stale)
+            if len(kept):
+                before = (head - 1) % self.steps
+                self._advance(kept, before, head, thrust[kept])
+
+        self._thrust = thrust
+
+        redo = numpy.flatnonzero(stale)
+        if len(redo):
+            self._predict(redo, x[redo], y[redo], speed_x[redo], speed_y[redo], direction[redo], thrust[redo])
+
+    def _place_wells(self, columns):
+        '''
+        HELPER: Works out where the wells will be for the given columns
+        '''
+        ahead = (columns - self._head) % self.steps + 1
+
+        moving = len(self._moving)
+        if moving:
+            x, y = self.orbits.positions(self.orbits.time + ahead)
+            self._well_x[columns, :moving] = x
+            self._well_y[columns, :moving] = y
+        self._well_x[columns, moving:] = self._still_x
+        self._well_y[columns, moving:] = self._still_y
+
+        # The wells pull from their rects, which only keep whole pixels
+        self._well_x[columns] = numpy.trunc(self._well_x[columns])
+        self._well_y[columns] = numpy.trunc(self._well_y[columns])
+
+    def _predict(self, ships, x, y, speed_x, speed_y, direction, thrust):
+        '''
+        HELPER: Predicts every step ahead for the ships at the given rows,
+        starting from their current states
+        '''
+        state = (x, y, speed_x, speed_y, direction)
+        for ahead in range(self.steps):
+            column = (self._head + ahead) % self.steps
+            state = self._step(state, column, thrust)
+            self._store(ships, column, state)
+
+    def _advance(self, ships, before, column, thrust):
+        '''
+        HELPER: Predicts one more step into the given column, for the ships at
+        the given rows, from what they were predicted to do in the column before
+        '''
+        state = (
+            self.x[ships, before], self.y[ships, before],
+            self._speed_x[ships, before], self._speed_y[ships, before],
+            self._direction[ships, before],
+        )
+        self._store(ships, column, self._step(state, column, thrust))
+
+    def _store(self, ships, column, state):
+        x, y, speed_x, speed_y, direction = state
+        self.x[ships, column] = x
+        self.y[ships, column] = y
+        self._speed_x[ships, column] = speed_x
+        self._speed_y[ships, column] = speed_y
+        self._direction[ships, column] = direction
+
+    def _step(self, state, column, thrust):
+        '''
+        HELPER: Returns the states after one step, with the wells where they
+        are in the given column, going through it just like the simulation does
+        '''
+        x, y, speed_x, speed_y, direction = state
+        seconds = self._delta_time / 1000.0
+        steps = self._delta_time * Celestial.FPS / 1000.0
+
+        well_x = self._well_x[column][numpy.newaxis, :]
+        well_y = self._well_y[column][numpy.newaxis, :]
+        mass = self._mass[numpy.newaxis, :]
+
+        def accelerations(x, y):
+            pull_x, pull_y = pull(x[:, numpy.newaxis] - well_x, y[:, numpy.newaxis] - well_y, mass)
+            return pull_x.sum(axis=1), pull_y.sum(axis=1)
+
+        if self.integrator == EULER:
+            # GravitySystem.update, the ships pull from their rects too
+            pull_x, pull_y = accelerations(numpy.trunc(x), numpy.trunc(y))
+            speed_x = speed_x + pull_x * steps
+            speed_y = speed_y + pull_y * steps
+        else:
+            # GravitySystem.update moves the ships itself, before they thrust
+            pull_x, pull_y = accelerations(x, y)
+            heaviest = numpy.hypot(*pull(1.0, 0.0, self._mass.max())) if len(self._mass) else 0.0
+            counts = substeps(pull_x, pull_y, steps, heaviest, GravitySystem.SUBSTEP_ETA, GravitySystem.MAX_SUBSTEPS)
+            x, y, speed_x, speed_y = integrate(
+                x, y, speed_x, speed_y, pull_x, pull_y,
+                steps, counts, accelerations, self.integrator,
+            )
+
+        # Ship.simulate
+        direction = direction + thrust[:, 1] * seconds
+        rads = direction - pi / 2
+        speed = thrust[:, 0] * seconds
+        speed_x = speed_x + numpy.cos(rads) * speed
+        speed_y = speed_y + numpy.sin(rads) * speed
+
+        if self.integrator == EULER:
+            x = x + speed_x * seconds * self.fps
+            y = y - speed_y * seconds * self.fps
+
+        return x, y, speed_x, speed_y, direction
+
+
+class TrajectoryOverlay(View):
+    '''
+    Draws the predicted path of every ship, in its colour
+    '''
+
+    # Every how many steps ahead a point is drawn
+    SPACING = 3
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+        self._colours = [pygame.Color(ship.base) for ship in predictor.ships]
+
+        # Nothing is predicted until the first update
+        self._predicted = False
+
+    def update(self, delta_time):
+        self.predictor.update(delta_time)
+        self._predicted = True
+
+    def draw(self, screen, alpha=1.0, offset=(0, 0)):
+        predictor = self.predictor
+        if not self._predicted:
+            return []
+
+        drawn = []
+        for index, colour in enumerate(self._colours):
+            x, y = predictor.path(index)
+            points = zip(
+                (x[::self.SPACING] + offset[0]).astype(int).tolist(),
+                (y[::self.SPACING] + offset[1]).astype(int).tolist(),
+            )
+            if len(points) > 1:
+                drawn.append(pygame.draw.lines(screen, colour, False, points))
+
+        return drawn
@@ -0,0 +1,99 @@
+from celestials import Celestial
+from gravity import VERLET
+from orbit import OrbitSystem
+from trajectory import TrajectoryPredictor
+from unittest import TestCase
+import numpy
+import unittest
+
+
+class Well(object):
+    x = 300
+    y = 200
+    mass = 10 ** 30
+
+
+class Drifter(object):
+    '''
+    A ship with no engine, placed wherever its prediction says it'll be
+    '''
+
+    def __init__(self, x, y, speed_x, speed_y):
+        self.state = (x, y, x, y, speed_x, speed_y, 0.0)
+        self.thrust = (0.0, 0.0)
+
+    def get_state(self):
+        return self.state + (0, 0, 0, 0)
+
+    def get_thrust(self):
+        return self.thrust
+
+
+class TrajectoryPredictorTest(TestCase):
+
+    STEP = 1000.0 / 30
+
+    def setUp(self):
+        Celestial.set_fps(30)
+
+        self.ships = [Drifter(100.0, 100.0, 2.0, 0.0), Drifter(500.0, 300.0, 0.0, 1.0)]
+        self.predictor = TrajectoryPredictor(self.ships, [Well()], OrbitSystem(30), 30, steps=20)
+        self.predictor.update(self.STEP)
+
+    def follow(self):
+        '''
+        Moves each ship to where it was predicted to be next
+        '''
+        predictor = self.predictor
+        head = predictor._head
+        for index, ship in enumerate(self.ships):
+            ship.state = (
+                predictor.x[index, head], predictor.y[index, head], 0.0, 0.0,
+                predictor._speed_x[index, head], predictor._speed_y[index, head],
+                predictor._direction[index, head],
+            )
+
+    def test_update__extends(self):
+        '''
+        Following the prediction only adds steps on at the end, which end up
+        just like predicting from scratch
+        '''
+        for _ in range(25):
+            self.follow()
+            self.predictor.update(self.STEP)
+
+        fresh = TrajectoryPredictor(self.ships, [Well()], OrbitSystem(30), 30, steps=20)
+        fresh.update(self.STEP)
+
+        for index in range(len(self.ships)):
+            numpy.testing.assert_allclose(self.predictor.path(index), fresh.path(index), rtol=1e-9)
+
+    def test_update__thrust_changed(self):
+        self.follow()
+        self.ships[0].thrust = (10.0, 0.0)
+        self.predictor.update(self.STEP)
+
+        x, y = self.predictor.path(0)
+        # The engine pushes it down the screen, faster than the well pulls on it
+        self.assertGreater(y[-1] - y[0], 10)
+
+    def test_update__integrator(self):
+        '''
+        Predicting the integrator's way extends just the same
+        '''
+        self.predictor = TrajectoryPredictor(self.ships, [Well()], OrbitSystem(30), 30, steps=20, integrator=VERLET)
+        self.predictor.update(self.STEP)
+
+        for _ in range(5):
+            self.follow()
+            self.predictor.update(self.STEP)
+
+        fresh = TrajectoryPredictor(self.ships, [Well()], OrbitSystem(30), 30, steps=20, integrator=VERLET)
+        fresh.update(self.STEP)
+
+        for index in range(len(self.ships)):
+            numpy.testing.assert_allclose(self.predictor.path(index), fresh.path(index), rtol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,296 @@
+from math import pi
+from mixins import ImageBatch
+
+import numpy
+import os.path
+import pygame
+
+
+# Projectile Kinds
+(
+    FIREBALL,
+    MISSILE,
+    LASER,
+) = range(3)
+
+
+class Ammo(ImageBatch):
+    IMAGE_PATH = os.path.join('Resources', 'sprites', 'ammo')
+    IMAGE_EXTENSIONS = ('.gif',)
+
+    # kind: (image, speed per step, steps to live, radius, degrees ccw from up the image faces)
+    KINDS = {
+        FIREBALL: ('Fireball', 6, 60, 6, 0),
+        MISSILE: ('Missle - 1', 8, 90, 6, -90),
+        LASER: ('laser', 12, 30, 3, 0),
+    }
+
+    # Rotated images for each kind, one per heading step
+    HEADING_STEPS = 32
+    FRAMES = {}
+
+    @classmethod
+    def load(cls):
+        for out in super(Ammo, cls).load():
+            yield out
+
+        yield '  Rotating ImageBatch for %s' % cls.__name__
+
+        cls.FRAMES = {}
+        for kind, (image, speed, ttl, radius, facing) in cls.KINDS.iteritems():
+            yield '    %s' % image
+
+            cls.FRAMES[kind] = [
+                pygame.transform.rotate(
+                    cls.IMAGES[image],
+                    step * 360.0 / cls.HEADING_STEPS - facing
+                )
+                for step in range(cls.HEADING_STEPS)
+            ]
+
+
+class ProjectilePool(object):
+    '''
+    Every live projectile, kept as one array per field instead of one object each
+
+    Firing takes a slot off the free list and expiring puts it back, so
+    nothing gets allocated per shot, and each update moves every projectile at once
+    '''
+
+    # How far off screen a projectile's center can be and still show part of its image
+    MARGIN = 32
+
+    # Size of the cells the live projectiles get bucketed into, to find the ones near a target
+    CELL_SIZE = 64
+
+    def __init__(self, fps, capacity=4096, bounds=None, on_hit=None):
+        '''
+        fps `int`
+            the speeds are measured per 1 / fps seconds
+        bounds `Rect`
+            projectiles leaving this area expire
+        on_hit `function`
+            callback(target, kind, speed_x, speed_y) when a projectile hits a target
+        '''
+        self.fps = fps
+        self.capacity = capacity
+        self.bounds = bounds
+        self.on_hit = on_hit
+
+        self.x = numpy.zeros(capacity)
+        self.y = numpy.zeros(capacity)
+        self.speed_x = numpy.zeros(capacity)
+        self.speed_y = numpy.zeros(capacity)
+        self.ttl = numpy.zeros(capacity)
+        self.owner = numpy.zeros(capacity, dtype=numpy.int32)
+        self.kind = numpy.zeros(capacity, dtype=numpy.int8)
+        self.alive = numpy.zeros(capacity, dtype=bool)
+
+        self._radius = numpy.array([Ammo.KINDS[kind][3] for kind in sorted(Ammo.KINDS)])
+
+        # A stack of the unused slots, the top is at self._free_count - 1
+        self._free = numpy.arange(capacity - 1, -1, -1)
+        self._free_count = capacity
+
+        self._targets = []
+
+    def __len__(self):
+        return self.capacity - self._free_count
+
+    def add_target(self, target, owner=None):
+        '''
+        Projectiles will hit the target, unless they were fired by the given owner
+        Targets require x, y and radius to be defined
+        '''
+        self._targets.append((target, owner))
+
+    def remove_target(self, target):
+        self._targets = [pair for pair in self._targets if pair[0] is not target]
+
+    def fire(self, x, y, speed_x, speed_y, kind, owner):
+        '''
+        Fires a projectile, speeds are in screen axes
+        Returns False if the pool is full and the shot had to be dropped
+        '''
+        if not self._free_count:
+            return False
+
+        self._free_count -= 1
+        slot = self._free[self._free_count]
+
+        self.x[slot] = x
+        self.y[slot] = y
+        self.speed_x[slot] = speed_x
+        self.speed_y[slot] = speed_y
+        self.ttl[slot] = Ammo.KINDS[kind][2]
+        self.owner[slot] = owner
+        self.kind[slot] = kind
+        self.alive[slot] = True
+
+        return True
+
+    def update(self, delta_time):
+        if self._free_count == self.capacity:
+            return
+
+        steps = delta_time * self.fps / 1000.0
+
+        # Dead slots move too, that's cheaper than picking out the live ones
+        self.x += self.speed_x * steps
+        self.y += self.speed_y * steps
+        self.ttl -= steps
+
+        expired = self.alive & (self.ttl <= 0)
+        if self.bounds is not None:
+            bounds = self.bounds
+            expired |= self.alive & (
+                (self.x < bounds.left) | (self.x >= bounds.right)
+                | (self.y < bounds.top) | (self.y >= bounds.bottom)
+            )
+        self._release(numpy.flatnonzero(expired))
+
+        self._hit_targets()
+
+    def draw(self, screen, alpha=1.0, offset=(0, 0)):
+        '''
+        Draws every live projectile on screen, returning the areas drawn to
+        '''
+        live = numpy.flatnonzero(self.alive)
+        if not len(live):
+            return []
+
+        # Step back to where the projectiles were alpha of the way through the step
+        back = 1.0 - alpha
+        x = (self.x[live] - self.speed_x[live] * back).astype(int) + offset[0]
+        y = (self.y[live] - self.speed_y[live] * back).astype(int) + offset[1]
+
+        # Skip the ones off screen, with some room for their images
+        width, height = screen.get_size()
+        margin = self.MARGIN
+        shown = (x > -margin) & (x < width + margin) & (y > -margin) & (y < height + margin)
+        if not shown.all():
+            live = live[shown]
+            x = x[shown]
+            y = y[shown]
+
+        # Images face up when unrotated, turning counter-clockwise
+        headings = numpy.arctan2(-self.speed_x[live], -self.speed_y[live])
+        steps = numpy.rint(headings * Ammo.HEADING_STEPS / (2 * pi)).astype(int) % Ammo.HEADING_STEPS
+
+        frames = Ammo.FRAMES
+        blits = []
+        for kind, step, center_x, center_y in zip(self.kind[live].tolist(), steps.tolist(), x.tolist(), y.tolist()):
+            image = frames[kind][step]
+            blits.append((image, image.get_rect(center=(center_x, center_y))))
+
+        return screen.blits(blits)
+
+    def get_state(self):
+        '''
+        Returns a copy of every projectile, for set_state to go back to
+        '''
+        return (
+            self.x.copy(), self.y.copy(), self.speed_x.copy(), self.speed_y.copy(),
+            self.ttl.copy(), self.owner.copy(), self.kind.copy(), self.alive.copy(),
+            self._free.copy(), self._free_count,
+        )
+
+    def set_state(self, state):
+        arrays = (
+            self.x, self.y, self.speed_x, self.speed_y,
+            self.ttl, self.owner, self.kind, self.alive, self._free,
+        )
+        for array, saved in zip(arrays, state):
+            array[:] = saved
+        self._free_count = state[-1]
+
+    def _hit_targets(self):
+        '''
+        HELPER: Expires every projectile touching a target, telling on_hit about it
+
+        The live projectiles are sorted by the cell of a grid they're in, so each
+        target only gets checked against the ones in the cells around it
+        A projectile only hits the first target it touches, in the order they were added
+        '''
+        live = numpy.flatnonzero(self.alive)
+        if not len(live) or not self._targets:
+            return
+
+        size = float(self.CELL_SIZE)
+        cells = _cell_keys(numpy.floor(self.x[live] / size), numpy.floor(self.y[live] / size))
+        order = numpy.argsort(cells, kind='mergesort')
+        live = live[order]
+        cells = cells[order]
+
+        targets = [target for target, owner in self._targets]
+        target_x = numpy.array([target.x for target in targets], dtype=float)
+        target_y = numpy.array([target.y for target in targets], dtype=float)
+        target_radius = numpy.array([target.radius for target in targets], dtype=float)
+        owned = numpy.array([owner is not None for target, owner in self._targets])
+        target_owner = numpy.array([owner or 0 for target, owner in self._targets])
+
+        # Every cell around each target, projectiles can stick out of theirs by their radius
+        reach = target_radius + self._radius.max()
+        left = numpy.floor((target_x - reach) / size)
+        top = numpy.floor((target_y - reach) / size)
+        wide = (numpy.floor((target_x + reach) / size) - left + 1).astype(int)
+        tall = (numpy.floor((target_y + reach) / size) - top + 1).astype(int)
+        which, index = _expand(wide * tall)
+        keys = _cell_keys(left[which] + index // tall[which], top[which] + index % tall[which])
+
+        # Then every projectile in those cells
+        starts = numpy.searchsorted(cells, keys, side='left')
+        ends = numpy.searchsorted(cells, keys, side='right')
+        pairs, index = _expand(ends - starts)
+        which = which[pairs]
+        slots = live[starts[pairs] + index]
+
+        reach = self._radius[self.kind[slots]] + target_radius[which]
+        touching = (
+            ((self.x[slots] - target_x[which]) ** 2 + (self.y[slots] - target_y[which]) ** 2 < reach ** 2)
+            & ~(owned[which] & (self.owner[slots] == target_owner[which]))
+        )
+        which = which[touching]
+        slots = slots[touching]
+        if not len(slots):
+            return
+
+        # Only the first target each projectile touched
+        order = numpy.lexsort((which, slots))
+        slots, first = numpy.unique(slots[order], return_index=True)
+        which = which[order][first]
+
+        if self.on_hit is not None:
+            for index in numpy.lexsort((slots, which)).tolist():
+                slot = slots[index]
+                self.on_hit(targets[which[index]], self.kind[slot], self.speed_x[slot], self.speed_y[slot])
+
+        self._release(slots)
+
+    def _release(self, slots):
+        '''
+        HELPER: Puts the given slots back on the free list
+        '''
+        count = len(slots)
+        if not count:
+            return
+
+        self.alive[slots] = False
+        self._free[self._free_count:self._free_count + count] = slots
+        self._free_count += count
+
+
+def _cell_keys(cell_x, cell_y):
+    '''
+    Packs the grid coordinates of each cell into a single sortable number
+    '''
+    return cell_x.astype(numpy.int64) * 2 ** 32 + cell_y.astype(numpy.int64)
+
+
+def _expand(counts):
+    '''
+    Returns, for counts of items in each group, which group each item is in and its index in it
+    '''
+    which = numpy.repeat(numpy.arange(len(counts)), counts)
+    index = numpy.arange(len(which)) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    return which, index
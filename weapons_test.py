@@ -0,0 +1,161 @@
+from pygame import Rect
+from unittest import TestCase
+from weapons import Ammo, ProjectilePool, FIREBALL, LASER
+import numpy
+import unittest
+
+
+class Target(object):
+    def __init__(self, x, y, radius):
+        self.x = x
+        self.y = y
+        self.radius = radius
+
+
+class ProjectilePoolTest(TestCase):
+
+    STEP = 1000.0 / 30
+
+    def setUp(self):
+        self.hits = []
+        self.pool = ProjectilePool(30, capacity=4, on_hit=self.on_hit)
+
+    def on_hit(self, target, kind, speed_x, speed_y):
+        self.hits.append((target, kind, speed_x, speed_y))
+
+    def live(self):
+        return numpy.flatnonzero(self.pool.alive).tolist()
+
+    def test_fire(self):
+        self.assertTrue(self.pool.fire(10, 20, 1, 2, LASER, 1))
+
+        slot, = self.live()
+        self.assertEqual(len(self.pool), 1)
+        self.assertEqual((self.pool.x[slot], self.pool.y[slot]), (10, 20))
+        self.assertEqual(self.pool.kind[slot], LASER)
+        self.assertEqual(self.pool.ttl[slot], Ammo.KINDS[LASER][2])
+
+    def test_fire__reuses_freed_slot(self):
+        '''
+        Once a projectile expires, the next shot goes into its slot
+        '''
+        self.pool.fire(0, 0, 0, 0, LASER, 1)
+        self.pool.fire(0, 0, 0, 0, FIREBALL, 1)
+        laser, fireball = self.live()
+
+        # Lasers don't live as long as fireballs
+        for _ in range(Ammo.KINDS[LASER][2]):
+            self.pool.update(self.STEP)
+        self.assertEqual(self.live(), [fireball])
+
+        self.pool.fire(0, 0, 0, 0, FIREBALL, 1)
+        self.assertEqual(self.live(), [laser, fireball])
+        self.assertEqual(len(self.pool), 2)
+
+    def test_fire__past_capacity(self):
+        '''
+        The pool never grows, shots past its capacity get dropped until a slot frees up
+        '''
+        for _ in range(4):
+            self.assertTrue(self.pool.fire(0, 0, 0, 0, LASER, 1))
+        self.assertFalse(self.pool.fire(0, 0, 0, 0, LASER, 1))
+
+        self.assertEqual(len(self.pool), 4)
+        self.assertEqual(len(self.pool.x), 4)
+
+        for _ in range(Ammo.KINDS[LASER][2]):
+            self.pool.update(self.STEP)
+        self.assertEqual(len(self.pool), 0)
+        self.assertTrue(self.pool.fire(0, 0, 0, 0, LASER, 1))
+
+    def test_update__leaves_bounds(self):
+        self.pool.bounds = Rect(0, 0, 100, 100)
+        self.pool.fire(95, 50, 10, 0, FIREBALL, 1)
+        self.pool.fire(50, 50, 0, 0, FIREBALL, 1)
+        inside = self.live()[1]
+
+        self.pool.update(self.STEP)
+
+        self.assertEqual(self.live(), [inside])
+
+    def test_update__hits(self):
+        '''
+        Targets get hit by everyone else's projectiles, but not their owner's
+        '''
+        target = Target(50, 50, 10)
+        self.pool.add_target(target, owner=1)
+
+        self.pool.fire(40, 50, 1, 0, FIREBALL, 1)
+        self.pool.fire(40, 50, 2, 0, LASER, 2)
+        mine = self.live()[0]
+
+        self.pool.update(self.STEP)
+
+        self.assertEqual(self.hits, [(target, LASER, 2, 0)])
+        self.assertEqual(self.live(), [mine])
+
+    def test_update__hits_first_target_only(self):
+        '''
+        A projectile touching two targets at once only hits the one added first
+        '''
+        first = Target(50, 50, 10)
+        second = Target(60, 50, 10)
+        self.pool.add_target(first)
+        self.pool.add_target(second)
+
+        self.pool.fire(55, 50, 0, 0, FIREBALL, 1)
+        self.pool.update(self.STEP)
+
+        self.assertEqual(self.hits, [(first, FIREBALL, 0, 0)])
+        self.assertEqual(len(self.pool), 0)
+
+    def test_update__hits_across_cells(self):
+        '''
+        Targets get hit by projectiles in the cells around theirs, but not further away
+        '''
+        self.pool = ProjectilePool(30, capacity=8, on_hit=self.on_hit)
+        size = ProjectilePool.CELL_SIZE
+        target = Target(size, size, 10)
+        self.pool.add_target(target)
+
+        for x, y in [(size - 12, size), (size + 12, size), (size, size - 12), (size, size + 12)]:
+            self.pool.fire(x, y, 0, 0, FIREBALL, 1)
+        self.pool.fire(size - 17, size, 0, 0, FIREBALL, 1)
+        self.pool.fire(-size, -size, 0, 0, FIREBALL, 1)
+        missed = self.live()[-2:]
+
+        self.pool.update(self.STEP)
+
+        self.assertEqual(len(self.hits), 4)
+        self.assertEqual(self.live(), missed)
+
+    def test_set_state(self):
+        '''
+        Going back to a state brings back the projectiles and which slots are free
+        '''
+        self.pool.fire(0, 0, 1, 1, FIREBALL, 1)
+        self.pool.fire(5, 5, 1, 1, LASER, 2)
+        state = self.pool.get_state()
+
+        for _ in range(Ammo.KINDS[LASER][2]):
+            self.pool.update(self.STEP)
+        self.pool.fire(9, 9, 0, 0, FIREBALL, 3)
+        self.pool.fire(9, 9, 0, 0, FIREBALL, 3)
+
+        self.pool.set_state(state)
+
+        for array, saved in zip(self.pool.get_state(), state):
+            numpy.testing.assert_array_equal(array, saved)
+        self.assertEqual(len(self.pool), 2)
+
+        # The next shot goes where it would have gone before
+        self.pool.fire(1, 1, 0, 0, LASER, 1)
+        after = self.pool.get_state()
+        self.pool.set_state(state)
+        self.pool.fire(1, 1, 0, 0, LASER, 1)
+        for array, saved in zip(self.pool.get_state(), after):
+            numpy.testing.assert_array_equal(array, saved)
+
+
+if __name__ == '__main__':
+    unittest.main()